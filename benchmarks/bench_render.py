@@ -0,0 +1,66 @@
+"""Benchmark rendering character sheets
+
+Cold: the first sheet a fresh interpreter renders, which decodes the
+logo and sets up the text layout caches, and the second. Warm: each
+later sheet, and how it splits between the blank layer
+(SheetMaker._drawBlank), the character's content and writing the PDF.
+
+Run from the repository root:
+
+	python benchmarks/bench_render.py
+"""
+
+import os, random, subprocess, sys, timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+COLD = """
+import random, time
+from eoschar.generator import randomCharacter
+from eoschar.sheetmaker import SheetMaker
+maker = SheetMaker()
+maker.read(randomCharacter(random.Random(0)))
+t0 = time.perf_counter()
+maker.toBytes()
+t1 = time.perf_counter()
+maker.toBytes()
+t2 = time.perf_counter()
+print(t1-t0, t2-t1)
+"""
+
+
+def cold(runs=3) -> tuple:
+	"""Best (first sheet, second sheet) times over fresh interpreters, in seconds"""
+	env = dict(os.environ,PYTHONPATH=ROOT,LOGLEVEL="WARNING")
+	times = [tuple(map(float,subprocess.run([sys.executable,"-c",COLD],env=env,check=True,capture_output=True,text=True).stdout.split())) for i in range(runs)]
+	return min(t[0] for t in times), min(t[1] for t in times)
+
+
+def warm(number=20) -> dict:
+	"""Best time per sheet of rendering, and of each of its steps, in seconds"""
+	from eoschar.generator import randomCharacter
+	from eoschar.sheetmaker import SheetMaker
+	maker = SheetMaker()
+	maker.read(randomCharacter(random.Random(0)))
+	maker.toBytes()
+	def blank():
+		SheetMaker._drawBlank(SheetMaker._newDocument())
+	def drawn():
+		pdf = SheetMaker._newDocument()
+		SheetMaker._drawBlank(pdf)
+		maker._drawContent(pdf)
+	return {
+		name:min(timeit.repeat(function,number=number,repeat=3))/number
+		for name, function in [("whole sheet",maker.toBytes),("blank layer",blank),("blank and content",drawn)]
+	}
+
+
+if __name__ == '__main__':
+	import logging
+	logging.disable(logging.WARNING)
+	first, second = cold()
+	print(f"cold: first sheet         {first*1e3:8.1f} ms")
+	print(f"cold: second sheet        {second*1e3:8.1f} ms")
+	for name, t in warm().items():
+		print(f"warm: {name:<20}{t*1e3:8.1f} ms per sheet")
@@ -0,0 +1,56 @@
+"""Benchmark choice tree construction
+
+Cold: a fresh interpreter importing eoschar.command_line (which no
+longer builds any trees) and building the prototype trees on first
+use. Warm: getting the cached prototype, and the private copy each
+new character walks (cloneTrees), against building every tree from
+scratch as each character used to.
+
+Run from the repository root:
+
+	python benchmarks/bench_trees.py
+"""
+
+import os, subprocess, sys, timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+COLD = """
+import time
+t0 = time.perf_counter()
+import eoschar.command_line
+t1 = time.perf_counter()
+from eoschar import options
+built = options._trees is not None
+options.getTrees()
+t2 = time.perf_counter()
+print(t1-t0, t2-t1, int(built))
+"""
+
+
+def cold(runs=5) -> tuple:
+	"""Best (import, first getTrees) times over fresh interpreters, in seconds, and whether the import built trees"""
+	env = dict(os.environ,PYTHONPATH=ROOT,LOGLEVEL="WARNING")
+	times = [tuple(map(float,subprocess.run([sys.executable,"-c",COLD],env=env,check=True,capture_output=True,text=True).stdout.split())) for i in range(runs)]
+	return min(t[0] for t in times), min(t[1] for t in times), any(t[2] for t in times)
+
+
+def warm(number=200) -> dict:
+	"""Best time per call of each way of getting trees, in seconds"""
+	from eoschar.options import buildTrees, getTrees, cloneTrees
+	getTrees()
+	return {
+		name:min(timeit.repeat(function,number=number,repeat=5))/number
+		for name, function in [("getTrees",getTrees),("cloneTrees",cloneTrees),("buildTrees",buildTrees)]
+	}
+
+
+if __name__ == '__main__':
+	import logging
+	logging.disable(logging.WARNING)
+	import_time, build_time, built = cold()
+	print(f"cold: import eoschar.command_line {import_time*1e3:8.2f} ms ({'built' if built else 'did not build'} trees)")
+	print(f"cold: first getTrees()           {build_time*1e3:8.2f} ms")
+	for name, t in warm().items():
+		print(f"warm: {name+'()':<27}{t*1e6:8.1f} us")
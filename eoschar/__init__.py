@@ -24,6 +24,11 @@ eoschar new
 	Jumps directly to new character creation
 eoschar load {path}
 	Load saved character data from file {path}
+eoschar tree
+	Display the character creation choice trees
+eoschar bundle
+	Compile resources/ into a single rules bundle for
+	faster start-up
 """
 
 
@@ -31,4 +36,8 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-from ._version import __version__
\ No newline at end of file
+from ._version import __version__
+
+# load every rules model in one read if a current bundle exists
+from .bundle import primeModels
+primeModels()
@@ -0,0 +1,387 @@
+"""Append-only archive of many characters in one file
+
+A CharacterArchive keeps any number of saves in a single file instead
+of one file per character. Characters are only ever appended, with a
+small index of the batch after them, so existing bytes never change
+and readers can keep reading while another process appends. Reading
+one character maps the file and touches only that record, e.g.
+
+	archive = CharacterArchive("party.eosa")
+	archive.append(sheets)
+	sheet = archive.load("Ilsa")
+
+Layout (integers little-endian):
+
+	header   MAGIC, 2-byte format version
+	frames   kind (1 byte), payload length (4), CRC-32 of the payload (4),
+	         payload
+	trailer  8-byte offset of the last index frame, END_MAGIC
+
+A character frame (CHARACTER) holds the 2-byte length of the name, the
+UTF-8 name and the contents of a save file (CharacterSheet.toBytes).
+Each append ends with an index frame (INDEX) and a trailer. The index
+frame is JSON: the [offset, length] of each character frame appended
+(null for a character removed) and the offset of the previous index
+frame, so an append writes only its own entries and a reader that has
+already seen the earlier ones reads only the new ones. Replaced and
+removed characters stay in the file until compact() rewrites it.
+
+One writer at a time is enforced with an advisory lock where the
+platform has fcntl. An append that was interrupted leaves bytes
+after the last trailer; readers ignore them and the next writer
+truncates them.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import glob, json, mmap, struct, zlib
+from contextlib import contextmanager
+from .charactersheet import CharacterSheet
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+MAGIC = b"EOSA"
+END_MAGIC = b"EOSE"
+FORMAT_VERSION = 1
+HEADER = MAGIC + FORMAT_VERSION.to_bytes(2,'little')
+FRAME = struct.Struct("<cII")
+TRAILER = struct.Struct("<Q4s")
+NAME_LENGTH = struct.Struct("<H")
+CHARACTER = b"C"
+INDEX = b"I"
+
+
+def _frame(kind,payload) -> bytes:
+	return FRAME.pack(kind,len(payload),zlib.crc32(payload)) + payload
+
+
+def _indexFrame(previous,entries) -> bytes:
+	return _frame(INDEX,json.dumps({"previous":previous,"entries":entries},ensure_ascii=False,separators=(',',':')).encode('utf-8'))
+
+
+def _characterFrame(name,raw) -> bytes:
+	encoded = name.encode('utf-8')
+	return _frame(CHARACTER,NAME_LENGTH.pack(len(encoded)) + encoded + raw)
+
+
+def _readPayload(buffer,offset,kind) -> bytes:
+	"""Return the payload of the frame at offset, checking its kind and CRC"""
+	if offset + FRAME.size > len(buffer):
+		raise ValueError(f"No frame at offset {offset}")
+	frame_kind, length, crc = FRAME.unpack_from(buffer,offset)
+	start = offset + FRAME.size
+	if frame_kind != kind or start + length > len(buffer):
+		raise ValueError(f"No {kind} frame at offset {offset}")
+	payload = buffer[start:start+length]
+	if zlib.crc32(payload) != crc:
+		raise ValueError(f"Frame at offset {offset} is corrupt")
+	return payload
+
+
+def _committed(buffer) -> tuple:
+	"""Return (last index frame offset, end of the last trailer) of a mapped archive
+
+	Looks at the trailer at the very end first. If the file ends
+	in an unfinished append, steps through the frame headers from
+	the start to find the last complete index and trailer.
+	"""
+	size = len(buffer)
+	if buffer[:len(MAGIC)] != MAGIC:
+		raise ValueError("Not a character archive")
+	version = int.from_bytes(buffer[len(MAGIC):len(HEADER)],'little')
+	if version != FORMAT_VERSION:
+		raise ValueError(f"Unsupported character archive version {version}")
+	if size >= len(HEADER) + FRAME.size + TRAILER.size:
+		offset, magic = TRAILER.unpack_from(buffer,size-TRAILER.size)
+		if magic == END_MAGIC and offset + FRAME.size <= size:
+			kind, length, crc = FRAME.unpack_from(buffer,offset)
+			if kind == INDEX and offset + FRAME.size + length + TRAILER.size == size:
+				return offset, size
+	last = None
+	end = len(HEADER)
+	offset = len(HEADER)
+	while offset + FRAME.size <= size:
+		kind, length, crc = FRAME.unpack_from(buffer,offset)
+		next_offset = offset + FRAME.size + length
+		if kind == INDEX:
+			if next_offset + TRAILER.size > size or TRAILER.unpack_from(buffer,next_offset) != (offset,END_MAGIC):
+				break
+			last = offset
+			next_offset += TRAILER.size
+			end = next_offset
+		elif kind != CHARACTER:
+			break
+		offset = next_offset
+	return last, end
+
+
+class CharacterArchive:
+	"""Many saved characters in one append-only file
+
+	***
+
+	Attributes
+	----------
+	path: str
+		Path to the archive file; created if missing
+
+	Methods
+	-------
+	refresh: bool
+		Pick up appends and compactions made since the archive
+		was opened
+	names: list
+		Names of the characters in the archive
+	read: bytes
+		The save of one character
+	load: CharacterSheet
+		One character
+	append: int
+		Add or replace characters
+	appendBytes: int
+		Add or replace saves by name
+	importFiles: int
+		Add save files
+	remove: int
+		Drop characters
+	compact: int
+		Rewrite the file without replaced and removed characters
+	close: None
+	"""
+	def __init__(self,path):
+		self.path = path
+		self._file = None
+		self._map = None
+		self._ino = None
+		self._size = 0
+		self._end = 0
+		self._last_index = None
+		self._index = {}
+		try:
+			with open(path,'xb') as wf:
+				wf.write(HEADER + _indexFrame(None,{}) + TRAILER.pack(len(HEADER),END_MAGIC))
+		except FileExistsError:
+			pass
+		self.refresh()
+
+	def __repr__(self):
+		return f"<Instance of CharacterArchive | {len(self)} characters in {self.path}>"
+
+	def __len__(self):
+		return len(self._index)
+
+	def __contains__(self,name):
+		return name in self._index
+
+	def __iter__(self):
+		return iter(self.names())
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+	def close(self) -> None:
+		if self._map is not None:
+			self._map.close()
+			self._map = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		self._ino = None
+		self._size = 0
+
+	def refresh(self) -> bool:
+		"""Read index entries written since the archive was opened or last refreshed
+
+		Returns True if the archive changed. A compacted archive
+		is a new file, and is reopened.
+		"""
+		if self._ino != os.stat(self.path).st_ino:
+			self.close()
+			self._file = open(self.path,'rb')
+			self._ino = os.fstat(self._file.fileno()).st_ino
+			self._last_index = None
+			self._index = {}
+		size = os.fstat(self._file.fileno()).st_size
+		if size == self._size:
+			return False
+		new_map = mmap.mmap(self._file.fileno(),0,access=mmap.ACCESS_READ)
+		last, end = _committed(new_map)
+		# walk back to the newest index already read
+		chain = []
+		offset = last
+		while offset is not None and offset != self._last_index:
+			index = json.loads(_readPayload(new_map,offset,INDEX).decode('utf-8'))
+			chain.append(index["entries"])
+			offset = index["previous"]
+		if offset != self._last_index:
+			self._index = {}
+		for entries in reversed(chain):
+			for name, entry in entries.items():
+				if entry is None:
+					self._index.pop(name,None)
+				else:
+					self._index[name] = tuple(entry)
+		if self._map is not None:
+			self._map.close()
+		self._map = new_map
+		self._size = len(new_map)
+		self._end = end
+		self._last_index = last
+		return len(chain) > 0
+
+	def names(self) -> list:
+		return sorted(self._index)
+
+	def read(self,name) -> bytes:
+		"""Return the save file contents of a character, reading only its record"""
+		offset, length = self._index[name]
+		payload = _readPayload(self._map,offset,CHARACTER)
+		return payload[NAME_LENGTH.size+NAME_LENGTH.unpack_from(payload)[0]:]
+
+	def load(self,name) -> CharacterSheet:
+		"""Return a character from the archive, or None if it cannot be loaded"""
+		sheet = CharacterSheet()
+		if not sheet.loadBytes(self.read(name),source=f"{self.path}:{name}"):
+			return None
+		return sheet
+
+	@contextmanager
+	def _locked(self):
+		"""Hold the writer lock on an up-to-date archive; yields the file, positioned at its end"""
+		while True:
+			wf = open(self.path,'r+b')
+			if fcntl is not None:
+				fcntl.flock(wf.fileno(),fcntl.LOCK_EX)
+			if os.fstat(wf.fileno()).st_ino == os.stat(self.path).st_ino:
+				break
+			# compacted while we waited for the lock
+			wf.close()
+		try:
+			self.refresh()
+			if self._size > self._end:
+				log.warning(f"Discarding {self._size-self._end} bytes of an unfinished append to {self.path}")
+				self._map.close()
+				self._map = None
+				wf.truncate(self._end)
+				self._size = 0
+				self.refresh()
+			wf.seek(self._end)
+			yield wf
+		finally:
+			wf.close()
+
+	def _write(self,wf,frames,entries) -> None:
+		# frames are character frames, laid out from the current end
+		index_offset = self._end + sum(len(f) for f in frames)
+		wf.write(b"".join(frames) + _indexFrame(self._last_index,entries) + TRAILER.pack(index_offset,END_MAGIC))
+		wf.flush()
+		os.fsync(wf.fileno())
+
+	def appendBytes(self,records) -> int:
+		"""Append (name, save file contents) pairs in one batch
+
+		A name already in the archive is replaced. Returns the
+		number of characters written.
+		"""
+		frames = []
+		entries = {}
+		with self._locked() as wf:
+			offset = self._end
+			for name, raw in records:
+				frame = _characterFrame(name,raw)
+				entries[name] = [offset,len(frame)]
+				frames.append(frame)
+				offset += len(frame)
+			if len(frames) == 0:
+				return 0
+			self._write(wf,frames,entries)
+			self.refresh()
+		return len(frames)
+
+	def append(self,sheets) -> int:
+		"""Append characters in one batch, replacing any of the same name
+
+		Incomplete characters are skipped. Returns the number
+		written.
+		"""
+		records = []
+		for sheet in sheets:
+			raw = sheet.toBytes()
+			if raw is not None:
+				records.append((sheet.choice_names["Name"],raw))
+		return self.appendBytes(records)
+
+	def importFiles(self,paths,pattern="*.txt",batch_size=500) -> int:
+		"""Append save files; directories contribute files matching pattern
+
+		Legacy pickled saves are converted to the current format.
+		Saves that fail to load are logged and skipped. Returns
+		the number of characters written.
+		"""
+		files = []
+		for path in paths:
+			if os.path.isdir(path):
+				files += sorted(glob.glob(os.path.join(path,pattern)))
+			else:
+				files.append(path)
+		written = 0
+		for start in range(0,len(files),batch_size):
+			records = []
+			for path in files[start:start+batch_size]:
+				sheet = CharacterSheet()
+				try:
+					if not sheet.load(path):
+						continue
+				except:
+					log.exception(f"Failed to read {path}")
+					continue
+				records.append((sheet.choice_names["Name"],sheet.toBytes()))
+			written += self.appendBytes(records)
+		return written
+
+	def remove(self,names) -> int:
+		"""Drop characters by name; returns how many were in the archive"""
+		with self._locked() as wf:
+			entries = {name:None for name in names if name in self._index}
+			if len(entries) == 0:
+				return 0
+			self._write(wf,[],entries)
+			self.refresh()
+		return len(entries)
+
+	def compact(self) -> int:
+		"""Rewrite the archive with only its current characters
+
+		Open readers keep reading the old file until they
+		refresh. Returns the number of bytes reclaimed.
+		"""
+		with self._locked() as wf:
+			old_size = self._end
+			frames = []
+			entries = {}
+			offset = len(HEADER)
+			for name in sorted(self._index):
+				start, length = self._index[name]
+				frames.append(self._map[start:start+length])
+				entries[name] = [offset,length]
+				offset += length
+			tmp_path = f"{self.path}.{os.getpid()}.tmp"
+			try:
+				with open(tmp_path,'wb') as tf:
+					tf.write(HEADER + b"".join(frames) + _indexFrame(None,entries) + TRAILER.pack(offset,END_MAGIC))
+					tf.flush()
+					os.fsync(tf.fileno())
+				os.replace(tmp_path,self.path)
+			finally:
+				if os.path.exists(tmp_path):
+					os.remove(tmp_path)
+		self.refresh()
+		return old_size - self._end
@@ -0,0 +1,487 @@
+"""Counting and uniform sampling of the space of legal characters
+
+A character is the sequence of outcomes of every tree in
+eoschar.options, in order: a root-to-leaf path for each choice tree,
+a full spend of the Skills and Trivia point budgets, and an
+assignment of all abstract gear. BuildSpace counts these outcomes by
+dynamic programming over the trees instead of enumerating characters.
+
+Before each tree, the partially built character is reduced to the
+fields that the remaining trees can still read:
+
+* the names of earlier selections, while any later choice still has
+  prerequisites;
+* skill levels, until Skills is bought;
+* known trivia, until Trivia is bought;
+* abstract gear and raw weapons, until gear is assigned.
+
+Characters that agree on those fields have the same number of
+completions, so they are counted once.
+
+Two characters are considered the same if they make the same
+selections and purchases, carry the same multiset of weapons, where
+a weapon is its base profile plus the multiset of modifications added
+to it, and pick the same items at each abstract gear level. Free
+text (name, motivation, weapon names) is not counted, and neither
+are trivia topics outside model_trivia.json. Modifications may be
+left unassigned, as in the interactive creator, but every skill and
+trivia point must be spent.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import copy, itertools, random
+from collections import defaultdict
+from math import comb
+from .charactersheet import CharacterSheet, DERIVED_FIELDS
+from .choice import PointBuy, TextInput, AssignAbstractGear
+from .func import getModel
+from .options import getTrees
+from .weapon import Weapon, asWeapon
+from .weapontable import weaponTable
+
+ABSTRACT_FIELDS = ("_abstract_potions","_abstract_weapons","_abstract_modifications","_abstract_ammunition","_abstract_grenades","_abstract_kits")
+MOD_LEVELS = ("A","B","C")
+
+
+def _copySheet(sheet):
+	"""Copy a CharacterSheet's derived state, sharing its choices"""
+	new = copy.copy(sheet)
+	for field in DERIVED_FIELDS:
+		setattr(new,field,copy.deepcopy(getattr(sheet,field)))
+	new.data = list(sheet.data)
+	new.treePath = list(sheet.treePath)
+	return new
+
+
+def _asWeapon(w) -> Weapon:
+	return w if isinstance(w,Weapon) else Weapon(**w)
+
+
+def _weaponKey(w) -> tuple:
+	"""Identity of a weapon before any modifications are assigned"""
+	w = _asWeapon(w)
+	return (w.name,w.type,w.range,w.reach,w.accuracy,w.ap,w.heavy,tuple(w.special),tuple(tuple(w.modifications[l]) for l in MOD_LEVELS))
+
+
+def _multisets(items,n) -> int:
+	"""Number of multisets of size n drawn from len(items) items"""
+	return comb(len(items)+n-1,n) if len(items) > 0 else 1
+
+
+def _sampleMultiset(items,n,rng) -> list:
+	"""Draw a uniformly random multiset of size n, by stars and bars"""
+	if len(items) == 0 or n == 0:
+		return []
+	bars = sorted(rng.sample(range(len(items)+n-1),n))
+	return [items[b-i] for i,b in enumerate(bars)]
+
+
+def _weightedChoice(weights,rng) -> int:
+	"""Return an index drawn with probability proportional to weights"""
+	r = rng.randrange(sum(weights))
+	for i,w in enumerate(weights):
+		if r < w:
+			return i
+		r -= w
+	raise ValueError("weights must not all be zero")
+
+
+class _Budget:
+	"""Ways of spending exactly a point budget over categories
+
+	Each category i can be raised by 0..len(costs[i])-1 levels,
+	where costs[i][k] is the total cost of k levels.
+	"""
+	def __init__(self,names,costs,points):
+		self.names = names
+		self.costs = costs
+		self.points = points
+		# ways[i][p]: ways for categories i.. to spend exactly p
+		n = len(names)
+		self.ways = [[0]*(points+1) for i in range(n+1)]
+		self.ways[n][0] = 1
+		for i in range(n-1,-1,-1):
+			for p in range(points+1):
+				self.ways[i][p] = sum(self.ways[i+1][p-c] for c in costs[i] if c <= p)
+
+	def count(self) -> int:
+		return self.ways[0][self.points]
+
+	def sample(self,rng) -> dict:
+		"""Return {name: levels bought}, uniformly over all full spends"""
+		bought = {}
+		p = self.points
+		for i,name in enumerate(self.names):
+			options = [(k,c) for k,c in enumerate(self.costs[i]) if c <= p]
+			k,c = options[_weightedChoice([self.ways[i+1][p-c] for k,c in options],rng)]
+			if k > 0:
+				bought[name] = k
+			p -= c
+		return bought
+
+
+def _pointBudget(node,character_sheet,topics) -> _Budget:
+	"""Build the _Budget for a PointBuy stage, from the sheet so far"""
+	if node.name == "Skills":
+		base = {s:character_sheet.skills[s]['level'] for s in node.categories.keys()}
+	else:
+		base = {t:(1 if t in character_sheet.trivia else 0) for t in topics}
+	names = sorted(base.keys())
+	costs = []
+	for name in names:
+		levelCosts = [0]
+		for level in range(base[name]+1,node.max_level+1):
+			levelCosts.append(levelCosts[-1] + node.points_per_level[level])
+		costs.append(levelCosts)
+	return _Budget(names,costs,node.starting_points)
+
+
+class _GearSpace:
+	"""Every way of assigning the abstract gear owed by one sheet"""
+	def __init__(self,node,character_sheet):
+		self.node = node
+		self.owed_mods = tuple(character_sheet._abstract_modifications[l] for l in MOD_LEVELS)
+		fixed = list(character_sheet._raw_weapons)
+		# abstract weapons: one multiset per variety, merged
+		varieties = []
+		for variety,n in character_sheet._abstract_weapons.items():
+			options = node.ref_weapons["Melee"]+node.ref_weapons["Ranged"] if variety == "Any" else node.ref_weapons[variety]
+			if n > 0 and len(options) > 0:
+				varieties.append(list(itertools.combinations_with_replacement(options,n)))
+		self.weapon_sets = {} # sorted weapon keys : (weapon list, count)
+		for picks in itertools.product(*varieties):
+			weapons = fixed + [w for variety in picks for w in variety]
+			key = tuple(sorted(_weaponKey(w) for w in weapons))
+			if key not in self.weapon_sets:
+				self.weapon_sets[key] = (weapons,self._modCount(weapons))
+		# everything else: independent multisets per level
+		self.picks = []
+		for owed,options in [
+			(character_sheet._abstract_ammunition,node.ref_ammunition),
+			(character_sheet._abstract_potions,node.ref_potions),
+			(character_sheet._abstract_grenades,node.ref_grenades),
+			(character_sheet._abstract_kits,node.ref_kits)
+			]:
+			for level,n in owed.items():
+				self.picks.append((list(options.get(level,[])),n))
+
+	def _configs(self,weapon) -> list:
+		"""(mods, usage) for each way of modifying one weapon"""
+		weapon = _asWeapon(weapon)
+		table = weaponTable()
+		a_mods = list(table.compatible(weapon.type,"A"))
+		bc_mods = [m for l in ("B","C") for m in table.compatible(weapon.type,l)]
+		a_slots = max(0,3-len(weapon.modifications["A"]))
+		bc_slots = 1 if len(weapon.modifications["B"]) + len(weapon.modifications["C"]) == 0 else 0
+		a_choices = [c for n in range(min(a_slots,self.owed_mods[0])+1) for c in itertools.combinations_with_replacement(a_mods,n)]
+		bc_choices = [()] + ([(m,) for m in bc_mods] if bc_slots else [])
+		configs = []
+		for a in a_choices:
+			for bc in bc_choices:
+				usage = (len(a),sum(1 for m in bc if m.level == "B"),sum(1 for m in bc if m.level == "C"))
+				if all(u <= o for u,o in zip(usage,self.owed_mods)):
+					configs.append((a+bc,usage))
+		return configs
+
+	def _within(self,usage) -> bool:
+		return all(u <= o for u,o in zip(usage,self.owed_mods))
+
+	def _groupPoly(self,configs,k) -> list:
+		"""tables[l][(j,usage)]: multisets of size j from configs[l:]"""
+		tables = [None]*(len(configs)+1)
+		tables[len(configs)] = {(0,(0,0,0)):1}
+		for l in range(len(configs)-1,-1,-1):
+			u = configs[l][1]
+			table = defaultdict(int)
+			for (j,usage),ways in tables[l+1].items():
+				for m in range(0,k-j+1):
+					total = tuple(x+m*y for x,y in zip(usage,u))
+					if not self._within(total):
+						break
+					table[(j+m,total)] += ways
+			tables[l] = dict(table)
+		return tables
+
+	def _groups(self,weapons) -> list:
+		"""Group interchangeable weapons; [(members, configs, tables)]"""
+		members = defaultdict(list)
+		for w in weapons:
+			members[_weaponKey(w)].append(w)
+		groups = []
+		for key in sorted(members.keys()):
+			configs = self._configs(members[key][0])
+			groups.append((members[key],configs,self._groupPoly(configs,len(members[key]))))
+		return groups
+
+	def _suffixes(self,groups) -> list:
+		"""suffix[i][usage]: ways for groups[i:] to use exactly usage"""
+		suffix = [None]*(len(groups)+1)
+		suffix[len(groups)] = {(0,0,0):1}
+		for i in range(len(groups)-1,-1,-1):
+			members, configs, tables = groups[i]
+			k = len(members)
+			table = defaultdict(int)
+			for (j,u),ways in tables[0].items():
+				if j != k:
+					continue
+				for v,rest in suffix[i+1].items():
+					total = tuple(x+y for x,y in zip(u,v))
+					if self._within(total):
+						table[total] += ways*rest
+			suffix[i] = dict(table)
+		return suffix
+
+	def _modCount(self,weapons) -> int:
+		return sum(self._suffixes(self._groups(weapons))[0].values())
+
+	def count(self) -> int:
+		total = sum(n for weapons,n in self.weapon_sets.values())
+		for options,n in self.picks:
+			total *= _multisets(options,n)
+		return total
+
+	def sample(self,rng):
+		"""Return (weapon picks, [(weapon, mods)], gear), uniformly"""
+		keys = sorted(self.weapon_sets.keys())
+		weapons, ways = self.weapon_sets[keys[_weightedChoice([self.weapon_sets[k][1] for k in keys],rng)]]
+		groups = self._groups(weapons)
+		suffix = self._suffixes(groups)
+		# choose how much modification budget each group uses
+		budget = (0,0,0)
+		assigned = []
+		for i,(members,configs,tables) in enumerate(groups):
+			k = len(members)
+			options = [(u,ways) for (j,u),ways in tables[0].items() if j == k]
+			weights = []
+			for u,ways in options:
+				used = tuple(x+y for x,y in zip(budget,u))
+				completions = 0
+				for v,rest in suffix[i+1].items():
+					if self._within(tuple(x+y for x,y in zip(used,v))):
+						completions += rest
+				weights.append(ways*completions)
+			u = options[_weightedChoice(weights,rng)][0]
+			budget = tuple(x+y for x,y in zip(budget,u))
+			# then a uniform multiset of configs with exactly that usage
+			j, left = k, u
+			chosen = []
+			for l,(mods,cu) in enumerate(configs):
+				counts = []
+				for m in range(0,j+1):
+					rest = tuple(x-m*y for x,y in zip(left,cu))
+					counts.append(tables[l+1].get((j-m,rest),0) if min(rest) >= 0 else 0)
+				m = _weightedChoice(counts,rng)
+				chosen += [mods]*m
+				j -= m
+				left = tuple(x-m*y for x,y in zip(left,cu))
+			assigned += list(zip(members,chosen))
+		gear = []
+		for options,n in self.picks:
+			gear += _sampleMultiset(options,n,rng)
+		return weapons, assigned, gear
+
+
+class BuildSpace:
+	"""The set of all distinct legal characters
+
+	See the module docstring for what counts as distinct.
+
+	***
+
+	Attributes
+	----------
+	trees: list
+		Prototype choice trees, in creation order
+
+	Methods
+	-------
+	total: int
+		Number of distinct legal characters
+	treeCounts: dict
+		For each choice tree, the number of legal characters
+		making each possible selection
+	sample: CharacterSheet
+		Uniformly random legal character
+	"""
+	def __init__(self,trees=None):
+		self.trees = getTrees() if trees is None else trees
+		self._topics = getModel('model_trivia.json')
+		# which sheet fields each tree reads
+		self._reads = []
+		for tree in self.trees:
+			if isinstance(tree,PointBuy):
+				self._reads.append({"skills"} if tree.name == "Skills" else {"trivia"})
+			elif isinstance(tree,AssignAbstractGear):
+				self._reads.append({"_raw_weapons"} | set(ABSTRACT_FIELDS))
+			elif isinstance(tree,TextInput):
+				self._reads.append(set())
+			elif self._hasPrerequisites(tree):
+				self._reads.append({"data"})
+			else:
+				self._reads.append(set())
+		# fields still to be read before tree k
+		self._pending = [set().union(*self._reads[k:]) for k in range(len(self.trees)+1)]
+		self._memo = {}
+
+	def __repr__(self):
+		return f"<Instance of BuildSpace | {len(self.trees)} trees>"
+
+	@staticmethod
+	def _hasPrerequisites(tree) -> bool:
+		stack = list(tree.children)
+		while stack:
+			node = stack.pop()
+			if len(node.prerequisites) > 0:
+				return True
+			stack += node.children
+		return False
+
+	def _key(self,k,sheet) -> tuple:
+		"""Project sheet onto the fields trees k.. still read"""
+		pending = self._pending[k]
+		key = []
+		if "data" in pending:
+			key.append(tuple(c.name for c in sheet.data))
+		if "skills" in pending:
+			key.append(tuple(sorted((s,v['level']) for s,v in sheet.skills.items())))
+		if "trivia" in pending:
+			key.append(frozenset(sheet.trivia))
+		if "_raw_weapons" in pending:
+			key.append(tuple(tuple(sorted(getattr(sheet,f).items())) for f in ABSTRACT_FIELDS))
+			key.append(tuple(sorted(_weaponKey(w) for w in sheet._raw_weapons)))
+		return tuple(key)
+
+	def _paths(self,tree,sheet):
+		"""Yield (positions, nodes, sheet after) for each legal leaf path"""
+		stack = [((),(),tree,sheet)]
+		while stack:
+			positions, nodes, node, current = stack.pop()
+			if len(node.children) == 0:
+				yield positions, nodes, current
+				continue
+			for j in range(len(node.children)-1,-1,-1):
+				child = node.children[j]
+				if not child.checkPrerequisites(current):
+					continue
+				after = _copySheet(current)
+				after.apply(child)
+				after.data.append(child)
+				stack.append((positions+(j,),nodes+(child,),child,after))
+
+	def _stage(self,k,sheet):
+		"""Return (number of outcomes, [(weight, nodes, sheet after)]) for tree k
+
+		Outcomes of point-buy, gear and text trees are not
+		read by any later tree, so they are collapsed into a
+		single weighted transition.
+		"""
+		tree = self.trees[k]
+		if isinstance(tree,PointBuy):
+			n = _pointBudget(tree,sheet,self._topics).count()
+		elif isinstance(tree,AssignAbstractGear):
+			n = _GearSpace(tree,sheet).count()
+		elif isinstance(tree,TextInput) or len(tree.children) == 0:
+			n = 1
+		else:
+			transitions = [(1,nodes,after) for positions,nodes,after in self._paths(tree,sheet)]
+			return len(transitions), transitions
+		after = _copySheet(sheet)
+		after.data.append(tree)
+		return n, [(n,(),after)]
+
+	def _completions(self,k,sheet) -> int:
+		"""Number of ways to finish a character from tree k onwards"""
+		if k == len(self.trees):
+			return 1
+		key = (k,self._key(k,sheet))
+		if key not in self._memo:
+			n, transitions = self._stage(k,sheet)
+			self._memo[key] = sum(w*self._completions(k+1,after) for w,nodes,after in transitions)
+		return self._memo[key]
+
+	def total(self) -> int:
+		"""Return the number of distinct legal characters"""
+		return self._completions(0,CharacterSheet())
+
+	def treeCounts(self) -> dict:
+		"""Return, per choice tree, the number of characters making each selection
+
+		Maps tree name to {selection: count}, where selection
+		is the names along the chosen path joined by ' > '.
+		Point-buy, gear and text trees map to {'*': total}.
+		The counts for every tree sum to total().
+		"""
+		counts = {}
+		# forward pass: states before tree k, merged by key
+		states = {self._key(0,CharacterSheet()):[1,CharacterSheet()]}
+		for k,tree in enumerate(self.trees):
+			selections = defaultdict(int)
+			merged = {}
+			for prefixes, sheet in states.values():
+				n, transitions = self._stage(k,sheet)
+				for w,nodes,after in transitions:
+					label = " > ".join(node.name for node in nodes) if len(nodes) > 0 else "*"
+					selections[label] += prefixes*w*self._completions(k+1,after)
+					key = self._key(k+1,after)
+					if key in merged:
+						merged[key][0] += prefixes*w
+					else:
+						merged[key] = [prefixes*w,after]
+			counts[tree.name] = dict(selections)
+			states = merged
+		return counts
+
+	def sample(self,rng=None,name="Sampled Character",motivation="") -> CharacterSheet:
+		"""Return a uniformly random legal character
+
+		Each selection is made with probability proportional to
+		the number of legal characters that follow from it.
+
+		***
+
+		Parameters
+		----------
+		rng: random.Random
+		name: str
+		motivation: str
+		"""
+		rng = random.Random() if rng is None else rng
+		sheet = CharacterSheet()
+		sheet.options = [tree.clone() for tree in self.trees]
+		for k,tree in enumerate(sheet.options):
+			if isinstance(tree,PointBuy):
+				tree.load(sheet.trivia if tree.name == "Trivia" else sheet.skills)
+				for category, levels in _pointBudget(tree,sheet,self._topics).sample(rng).items():
+					for i in range(levels):
+						tree.levelUp(category)
+			elif isinstance(tree,AssignAbstractGear):
+				tree.assign(sheet)
+				weapons, assigned, gear = _GearSpace(tree,sheet).sample(rng)
+				tree.raw_weapons[:] = weapons
+				for w,mods in assigned:
+					weapon = asWeapon(w)
+					for mod in mods:
+						mod.apply(weapon)
+					tree.weapons.append(weapon)
+				tree.gear += gear
+			elif isinstance(tree,TextInput):
+				tree.value = name if tree.name == "Name" else motivation
+			elif len(tree.children) > 0:
+				paths = list(self._paths(tree,sheet))
+				weights = [self._completions(k+1,after) for positions,nodes,after in paths]
+				positions, nodes, after = paths[_weightedChoice(weights,rng)]
+				for j,node in zip(positions,nodes):
+					sheet.treePath.append(j)
+					sheet.apply(node)
+					sheet.data.append(node)
+				continue
+			else:
+				continue
+			sheet.apply(tree)
+			sheet.data.append(tree)
+		sheet.filled = True
+		sheet.flush()
+		return sheet
@@ -0,0 +1,144 @@
+"""Precompiled rules bundle
+
+Every model_*.json file in resources/ compiled into one binary file,
+read with a single read and no JSON parsing. The choice trees are
+not part of it: their effects and prerequisites are code, so they
+are always built by eoschar.options. The bundle is keyed by a hash of its source files, which include the
+modules that define what choices do (RULES_MODULES); when any of them
+has changed the bundle is considered stale and the JSON files are
+used instead. Rebuild with `eoschar bundle`.
+
+File layout: MAGIC, a 2-byte format version, the 40-character hex
+source key, then a marshal'ed payload dictionary.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import glob, hashlib, json, marshal
+from ._version import __version__
+from .func import RESOURCES, MODELS
+
+
+MAGIC = b"EOSB"
+FORMAT_VERSION = 1
+BUNDLE_PATH = os.path.join(RESOURCES,"rules.bundle")
+HEADER_LENGTH = len(MAGIC) + 2 + 40
+# modules whose code is part of the rules
+RULES_MODULES = ("options.py","choice.py","effect.py","weapon.py","gear.py")
+
+
+def sourceFiles() -> list:
+	"""Return the paths the bundle is compiled from, in a fixed order"""
+	sources = sorted(glob.glob(os.path.join(RESOURCES,"model_*.json")))
+	# tree layout, and what each choice, effect, weapon modification
+	# and gear line does, is defined in code, not in resources/
+	for module in RULES_MODULES:
+		sources.append(os.path.join(os.path.dirname(__file__),module))
+	return sources
+
+
+def _fileDigest(path) -> str:
+	with open(path,'rb') as rf:
+		return hashlib.sha1(rf.read()).hexdigest()
+
+
+def sourceKey(digests:dict) -> str:
+	"""Combine per-file digests into a single bundle key"""
+	h = hashlib.sha1(__version__.encode())
+	for name in sorted(digests.keys()):
+		h.update(f"{name}:{digests[name]};".encode())
+	return h.hexdigest()
+
+
+def compileBundle(out_path=BUNDLE_PATH) -> bool:
+	"""Compile resources/ into one bundle file
+
+	***
+
+	Parameters
+	----------
+	out_path: str
+		Destination of the bundle. Defaults to
+		resources/rules.bundle
+	"""
+	sources = {}
+	models = {}
+	for path in sourceFiles():
+		name = os.path.basename(path)
+		st = os.stat(path)
+		with open(path,'rb') as rf:
+			raw = rf.read()
+		sources[name] = (st.st_mtime_ns,st.st_size,hashlib.sha1(raw).hexdigest())
+		if name.endswith(".json"):
+			models[name] = json.loads(raw.decode('utf-8').replace('/u2019',"'"))
+	key = sourceKey({k:v[2] for k,v in sources.items()})
+	payload = {
+		"__version__":__version__,
+		"sources":sources,
+		"models":models
+	}
+	tmp_path = out_path + ".tmp"
+	try:
+		with open(tmp_path,'wb') as wf:
+			wf.write(MAGIC)
+			wf.write(FORMAT_VERSION.to_bytes(2,'little'))
+			wf.write(key.encode('ascii'))
+			wf.write(marshal.dumps(payload))
+		os.replace(tmp_path,out_path)
+	except OSError:
+		log.exception(f"Failed to write rules bundle to {out_path}")
+		return False
+	log.info(f"Compiled {len(models)} models into {out_path}")
+	return True
+
+
+def loadBundle(path=BUNDLE_PATH):
+	"""Read a rules bundle with a single read
+
+	Returns the payload dictionary, or None if the bundle is
+	missing, corrupt, or stale with respect to its sources.
+	"""
+	try:
+		with open(path,'rb') as rf:
+			raw = rf.read()
+	except FileNotFoundError:
+		return None
+	if raw[:len(MAGIC)] != MAGIC or int.from_bytes(raw[len(MAGIC):len(MAGIC)+2],'little') != FORMAT_VERSION:
+		log.warning(f"{path} is not a version {FORMAT_VERSION} rules bundle; ignoring it")
+		return None
+	key = raw[len(MAGIC)+2:HEADER_LENGTH].decode('ascii')
+	try:
+		payload = marshal.loads(raw[HEADER_LENGTH:])
+	except (EOFError,ValueError,TypeError):
+		log.warning(f"{path} is corrupt; ignoring it")
+		return None
+	# validate against sources: stat first, hash only what changed
+	digests = {}
+	for src in sourceFiles():
+		name = os.path.basename(src)
+		try:
+			st = os.stat(src)
+		except FileNotFoundError:
+			return None
+		stored = payload['sources'].get(name)
+		if stored is not None and stored[0] == st.st_mtime_ns and stored[1] == st.st_size:
+			digests[name] = stored[2]
+		else:
+			digests[name] = _fileDigest(src)
+	if set(digests.keys()) != set(payload['sources'].keys()) or sourceKey(digests) != key:
+		log.debug(f"Rules bundle {path} is stale; using JSON models")
+		return None
+	return payload
+
+
+def primeModels(path=BUNDLE_PATH) -> bool:
+	"""Load the bundle, if current, into the getModel registry"""
+	payload = loadBundle(path)
+	if payload is None:
+		return False
+	for name, model in payload['models'].items():
+		st = os.stat(os.path.join(RESOURCES,name))
+		MODELS.prime(name,st.st_mtime_ns,st.st_size,payload['sources'][name][2],model)
+	return True
@@ -4,11 +4,34 @@ log = logging.getLogger(__name__)
 
 import base64, json, pickle, sys
 from ._version import __version__
-from .choice import Choice,TextInput,PointBuy,AssignAbstractGear
+from .choice import Choice,TextInput,AssignAbstractGear
 from .dietype import DieType
+from .gear import GearInventory
 from .sheetmaker import SheetMaker
 from .func import getModel
-from .options import trees as TREES
+from .options import getTrees, getIndex
+from .treeindex import TreeIndex
+from . import savefile
+
+# attributes computed from self.data; reset by loadBlank()
+DERIVED_FIELDS = (
+	"choice_names",
+	"qualities",
+	"skills",
+	"combat_stats",
+	"trivia",
+	"traits",
+	"weapons",
+	"gear",
+	"money",
+	"_raw_weapons",
+	"_abstract_potions",
+	"_abstract_weapons",
+	"_abstract_modifications",
+	"_abstract_ammunition",
+	"_abstract_grenades",
+	"_abstract_kits"
+	)
 
 class CharacterSheet:
 	""" A class to represent an EoS character sheet
@@ -24,7 +47,8 @@ class CharacterSheet:
 		are made through an Interface object.
 	options: list
 		List of all creation trees. Each item is a Choice
-		object.
+		object. Defaults to the shared prototype trees in
+		eoschar.options, built on first access.
 	data: list
 		List of all user selections for given character
 	choice_names: dict
@@ -44,7 +68,8 @@ class CharacterSheet:
 		List of traits
 	weapons: list
 		List of weapons
-	gear: list
+	gear: GearInventory
+		Non-weapon gear and how many of each
 	money: int
 	_abstract_potions: dict
 		Tracks number of each level the character is
@@ -68,16 +93,37 @@ class CharacterSheet:
 	Methods
 	-------
 	load: bool
-		Read pickled data from text file
+		Read a save file
+	loadBytes: bool
+		Read the contents of a save file
 	save: bool
-		Write pickled data to text file
+		Write a save file
+	toBytes: bytes
+		The contents of a save file
+	record: dict
+		The player's selections, as saved
+	verify: bool
+		Check a loaded sheet against the rules
 	apply: bool
 		Apply a Choice to the character
 		sheet.
-	flush
+	flush: bool
+		Reset the sheet and re-apply every
+		choice in self.data.
+	recompute: bool
+		Reset and re-apply only some derived
+		fields.
+	addChoice: bool
+	removeChoice: bool
+	replaceChoice: bool
+		Edit self.data, recomputing only the
+		fields the edited choices touch.
 	output: bool
 		Print the character sheet to a
 		beautiful pdf file.
+	outputBook: bool
+		Print many character sheets to one
+		pdf file.
 	edit: bool
 		TODO
 
@@ -86,7 +132,8 @@ class CharacterSheet:
 	def __init__(self):
 		# blank options and data
 		self.__version__ = __version__
-		self.options=TREES
+		self._options = None
+		self._record = None
 		self.data=[]
 		self.treePath = []
 		self.filled = False
@@ -94,73 +141,128 @@ class CharacterSheet:
 		# initialize default game stats
 		self.loadBlank()
 
+	@property
+	def options(self):
+		if self._options is None:
+			return getTrees()
+		return self._options
+
+	@options.setter
+	def options(self,trees):
+		self._options = trees
+
+	@property
+	def data(self):
+		# a sheet loaded from a snapshot builds its choices on first use
+		if self._record is not None:
+			record, self._record = self._record, None
+			self._data = self._choicesFromRecord(record)
+		return self._data
+
+	@data.setter
+	def data(self,choices):
+		self._record = None
+		self._data = choices
+
 	def loadBlank(self):
+		"""Reset every derived field to its default value"""
+		for field in DERIVED_FIELDS:
+			setattr(self,field,self.blankField(field))
+
+	def blankField(self,field):
+		"""Return a fresh default value for one derived field
+
+		***
+
+		Parameters
+		----------
+		field: str
+			One of DERIVED_FIELDS
+		"""
 		## choice_names
-		self.choice_names = {
-			"Name":'',
-			"Species":'',
-			"Background":'',
-			"Motivation":'',
-			"Training":'',
-			"Focus":'',
-			"Combat Specialty":''
-		}
+		if field == "choice_names":
+			return {
+				"Name":'',
+				"Species":'',
+				"Background":'',
+				"Motivation":'',
+				"Training":'',
+				"Focus":'',
+				"Combat Specialty":''
+			}
 		## qualities
-		self.qualities = {}
-		for q in getModel('model_qualities.json'):
-			self.qualities[q] = DieType(10)
+		elif field == "qualities":
+			return {q:DieType(10) for q in getModel('model_qualities.json')}
 		## skills
-		self.skills = {}
-		for s in getModel('model_skills.json'):
-			self.skills[s['name']] = {"level":1,"quality":s['quality']}
+		elif field == "skills":
+			return {s['name']:{"level":1,"quality":s['quality']} for s in getModel('model_skills.json')}
 		## combat_stats
-		self.combat_stats = {
-			"Speed":"15 yards",
-			"AV":0,
-			"Toughness":20-int(self.qualities['Brawn']),
-			"Shooting Die":DieType(12),
-			"Fighting Die":DieType(12)
-		}
-		## trivia
-		self.trivia = []
-		## traits
-		self.traits = []
-		## weapons
-		self.weapons = []
+		elif field == "combat_stats":
+			return {
+				"Speed":"15 yards",
+				"AV":0,
+				"Toughness":20-int(DieType(10)), # Brawn before any choices
+				"Shooting Die":DieType(12),
+				"Fighting Die":DieType(12)
+			}
+		## trivia, traits, weapons, and weapons before modifications
+		elif field in ["trivia","traits","weapons","_raw_weapons"]:
+			return []
 		## gear
-		self.gear = []
+		elif field == "gear":
+			return GearInventory()
 		## money
-		self.money = 0
-		## weapons before modifications
-		self._raw_weapons = []
+		elif field == "money":
+			return 0
 		## abstract dictionaries
-		self._abstract_potions = {"A":0,"B":0,"C":0}
-		self._abstract_weapons = {"Melee":0,"Ranged":0,"Any":0}
-		self._abstract_modifications = {"A":0,"B":0,"C":0}
-		self._abstract_ammunition = {"A":0,"B":0,"C":0}
-		self._abstract_grenades = {"A":0,"B":0,"C":0}
-		self._abstract_kits = {"A":0,"B":0,"C":0}
+		elif field == "_abstract_weapons":
+			return {"Melee":0,"Ranged":0,"Any":0}
+		elif field in DERIVED_FIELDS:
+			return {"A":0,"B":0,"C":0}
+		raise KeyError(f"'{field}' is not a derived CharacterSheet field")
 
 	def load(self,file_path) -> bool:
-		"""Read data from text file"""
-		def autoTree(tree,path):
-			def doSelection(node,j) -> "node":
-				selection = node.children[j]
-				if not selection.checkPrerequisites(self):
-					log.warning("Prerequisites violation! Try again.")
-				self.apply(selection)
-				self.data.append(selection)
-				return selection
-			i = 0
-			node = tree
-			while len(node.children) > 0:
-				node = doSelection(node,path[i])
-				i += 1
-			return path[i:]
+		"""Read data from a save file
 
+		Saves in the current format (see eoschar.savefile) are
+		restored from their snapshot without replaying any
+		choices; self.data is rebuilt from the saved selections
+		only when it is first used. Use verify() to check the
+		snapshot against the rules. Older pickled saves are
+		replayed.
+		"""
 		file_path = file_path.strip("'").strip('"')
 		with open(file_path,'rb') as rf:
-			loadedPickle = pickle.loads(rf.read())
+			raw = rf.read()
+		return self.loadBytes(raw,source=file_path)
+
+	def loadBytes(self,raw,source="character") -> bool:
+		"""Read data from the contents of a save file; see load
+
+		source names the save in log messages.
+		"""
+		if not savefile.isSaveFile(raw):
+			return self._loadPickle(pickle.loads(raw))
+		try:
+			document = savefile.loads(raw)
+			record = document['record']
+			snapshot = {field:document['snapshot'][field] for field in DERIVED_FIELDS}
+		except (ValueError,KeyError,TypeError):
+			log.exception(f"Could not read save {source}")
+			return False
+		if self.__version__ != document['__version__']:
+			log.warning(f"Loaded character created in version {document['__version__']}, you are running version {self.__version__}. Potential compatibility issues.")
+		if document['rules'] != savefile.rulesKey():
+			log.warning(f"{source} was saved under different rules; call verify() to recompute it")
+		self.treePath = record['treePath']
+		for field in DERIVED_FIELDS:
+			setattr(self,field,snapshot[field])
+		self._record = record
+		self.filled=True
+		return True
+
+	def _loadPickle(self,loadedPickle) -> bool:
+		"""Replay a save written before the current format"""
 		if self.__version__ != loadedPickle['__version__']:
 			log.warning(f"Loaded character created in version {loadedPickle['__version__']}, you are running version {self.__version__}. Potential compatibility issues.")
 		self.treePath = loadedPickle['treePath']
@@ -170,50 +272,68 @@ class CharacterSheet:
 		self.data.append(TextInput(name="Motivation",value=loadedPickle['motivation']))
 
 		# run trees
-		treePath = self.treePath
+		index = getIndex() if self._options is None else TreeIndex(self._options)
 		try:
-			for t in TREES:
-				if t.name in ["Skills","Trivia","Name","Motivation","Assign Abstract Gear"]:
-					log.debug(f"Skipping {t.name}")
-				else:
-					treePath = autoTree(t,treePath)
+			selected = index.resolvePath(self.treePath)
 		except:
 			log.exception("Loaded tree path incompatible with options.trees")
 			return False
+		for node_id in selected:
+			selection = index.nodes[node_id]
+			if not selection.checkPrerequisites(self):
+				log.warning("Prerequisites violation! Try again.")
+			self.apply(selection)
+			self.data.append(selection)
+
+		# load skills, trivia and gear assignments
+		loadedPickle['weapons'] = [pickle.loads(w) for w in loadedPickle['weapon_pickles']]
+		self.data += self._purchaseChoices(loadedPickle,index)
+
+		# flush and return
+		self.filled=True
+		self.flush()
+		return True
 
-		# load skills
-		skills = PointBuy(name="Skills",max_level=3,starting_level=0,categories=getModel('model_skills.json'),starting_points=5,points_per_level = {1:0,2:1,3:3},root_id=6)
-		skills.categories = loadedPickle['skills']
-		self.data.append(skills)
+	def _purchaseChoices(self,record,index) -> list:
+		"""Skills, Trivia and Assign Abstract Gear choices of a saved record
 
-		# load trivia
-		trivia = PointBuy(name="Trivia",max_level=1,starting_level=0,point_per_level = {0:0,1:1},categories=getModel('model_trivia.json'),root_id=9)
-		trivia.categories = loadedPickle['trivia']
-		self.data.append(trivia)
+		index is the TreeIndex of the rules the record was made under.
+		"""
+		# load skills and trivia into copies of the rules' own
+		# trees, so their costs and remaining points are right
+		trees = {index.names[root]:index.nodes[root] for root in index.roots}
+		skills = trees["Skills"].clone()
+		skills.restore(record['skills'])
+		trivia = trees["Trivia"].clone()
+		trivia.restore(record['trivia'])
 
 		# load gear assignments
-		## TODO
 		assign_abstract_gear = AssignAbstractGear(name="Assign Abstract Gear")
 		assign_abstract_gear.assign(self)
-		assign_abstract_gear.gear += loadedPickle['assigned_gear']
-		for weapon_pickle in loadedPickle['weapon_pickles']:
-			assign_abstract_gear.weapons.append(pickle.loads(weapon_pickle))
-		self.data.append(assign_abstract_gear)
+		assign_abstract_gear.gear += record['assigned_gear']
+		assign_abstract_gear.weapons += record['weapons']
+		return [skills,trivia,assign_abstract_gear]
 
-		# flush and return
-		self.filled=True
-		self.flush()
-		return True
+	def _choicesFromRecord(self,record) -> list:
+		"""Rebuild self.data from a saved record, without applying it"""
+		choices = [
+			TextInput(name="Name",value=record['name']),
+			TextInput(name="Motivation",value=record['motivation'])
+		]
+		index = getIndex() if self._options is None else TreeIndex(self._options)
+		choices += [index.nodes[node_id] for node_id in index.resolvePath(record['treePath'])]
+		return choices + self._purchaseChoices(record,index)
 
-	def save(self,file_path) ->bool:
-		"""Write data to text file"""
-		if not self.filled:
-			log.warning("Cannot save incomplete character")
-			return False
-		# create dictionary of values
+	def record(self) -> dict:
+		"""Return the player's selections, as written to a save
+
+		Keys: treePath, name, motivation, skills, trivia,
+		assigned_gear, weapons.
+		"""
+		if self._record is not None:
+			return self._record
 		outDict = {}
-		outDict['__version__'] = self.__version__
-		outDict['treePath'] = self.treePath
+		outDict['treePath'] = list(self.treePath)
 		outDict['name'] = self.choice_names["Name"]
 		outDict['motivation'] = self.choice_names["Motivation"]
 		for node in self.data:
@@ -225,37 +345,43 @@ class CharacterSheet:
 				outDict["trivia"]=dict(node.categories)
 			elif node.name == "Assign Abstract Gear":
 				# non-weapon gear
-				outDict["assigned_gear"]=node.gear
-				# modded weapons
-				outDict["weapon_pickles"]=[]
-				for weapon in self.weapons:
-					outDict["weapon_pickles"].append(pickle.dumps(weapon))
+				outDict["assigned_gear"]=list(node.gear)
+				# modded weapons; weapons granted outright by
+				# other choices are not the node's to save
+				outDict["weapons"]=list(node.weapons)
+		return outDict
+
+	def toBytes(self) -> bytes:
+		"""Return the contents of a save file, or None if the character is incomplete"""
+		if not self.filled:
+			log.warning("Cannot save incomplete character")
+			return None
+		snapshot = {field:getattr(self,field) for field in DERIVED_FIELDS}
+		return savefile.dumps(self.__version__,self.record(),snapshot)
+
+	def save(self,file_path) ->bool:
+		"""Write the selections and the computed sheet to a save file"""
+		raw = self.toBytes()
+		if raw is None:
+			return False
 		with open(file_path,'wb') as wf:
-			# wf.write('{')
-			# # version
-			# wf.write(f'"__version__":"{self.__version__}"')
-			# # treePath
-			# wf.write(',"treePath":')
-			# wf.write(json.dumps(self.treePath))
-			# # text fields
-			# wf.write(f',"name":"{self.choice_names["Name"]}"')
-			# wf.write(f',"motivation":"{self.choice_names["Motivation"]}"')
-			# for node in self.data:
-			# 	if node.name == "Skills":
-			# 		# skills
-			# 		wf.write(f',"skills":{json.dumps(node.categories)}')
-			# 	elif node.name == "Trivia":
-			# 		# trivia
-			# 		wf.write(f',"trivia":{json.dumps(node.categories)}')
-			# 	elif node.name == "Assign Abstract Gear":
-			# 		# non-weapon gear
-			# 		wf.write(f',"assigned_gear":{json.dumps(node.gear)}')
-			# 		# modded weapons
-			# 		wf.write(f',"weapon_pickles":["')
-			# 		wf.write('","'.join(["weapon_pickled="+str(base64.b64encode(pickle.dumps(weapon))) for weapon in self.weapons]))
-			# 		wf.write(f'"]')
-			# wf.write('}')
-			pickle.dump(outDict,wf)
+			wf.write(raw)
+		return True
+
+	def verify(self) -> bool:
+		"""Recompute the sheet from its choices and compare it with the loaded snapshot
+
+		Returns True if every derived field is unchanged. Either
+		way the sheet is left as computed under the current rules.
+		"""
+		encoded = lambda field: savefile.encodeValue(getattr(self,field))
+		before = {field:encoded(field) for field in DERIVED_FIELDS}
+		if not self.flush():
+			return False
+		changed = [field for field in DERIVED_FIELDS if encoded(field) != before[field]]
+		if len(changed) > 0:
+			log.warning(f"Saved sheet does not match its choices under the current rules: {', '.join(changed)}")
+			return False
 		return True
 
 	def apply(self,option)->bool:
@@ -277,6 +403,88 @@ class CharacterSheet:
 			self.apply(c)
 		return True
 
+	def recompute(self,fields) -> bool:
+		"""Reset and re-apply only the given derived fields
+
+		Choices that can apply part of their effects (see
+		Choice.implementFields) only re-apply the ops targeting
+		these fields. Choices that cannot are re-applied whole,
+		so every field they touch is recomputed with them. If
+		any choice's fields are unknown, falls back to flush().
+
+		***
+
+		Parameters
+		----------
+		fields: iterable
+			Names from DERIVED_FIELDS
+		"""
+		touched = [(c,c.touches) for c in self.data]
+		if any(t is None for c,t in touched):
+			self.loadBlank()
+			for c in self.data:
+				self.apply(c)
+			return True
+		fields = set(fields)
+		# widen until closed under choices that apply all-or-nothing
+		widened = True
+		while widened:
+			widened = False
+			for c,t in touched:
+				if not c.partial and (t & fields) and not (t <= fields):
+					fields |= t
+					widened = True
+		for field in fields:
+			setattr(self,field,self.blankField(field))
+		for c,t in touched:
+			if t & fields:
+				try:
+					c.implementFields(self,fields)
+				except:
+					log.exception("Failed to apply")
+		return True
+
+	def addChoice(self,choice) -> bool:
+		"""Append a choice to self.data, recomputing only what it touches
+
+		Note that self.treePath is not updated.
+		"""
+		self.data.append(choice)
+		return self._update(choice.touches)
+
+	def removeChoice(self,choice) -> bool:
+		"""Remove a choice from self.data, recomputing only what it touched
+
+		Note that self.treePath is not updated.
+		"""
+		try:
+			self.data.remove(choice)
+		except ValueError:
+			log.warning(f"{choice} is not part of this character")
+			return False
+		return self._update(choice.touches)
+
+	def replaceChoice(self,old,new) -> bool:
+		"""Swap one choice in self.data for another, in place
+
+		Only the fields touched by either choice are recomputed.
+		Note that self.treePath is not updated.
+		"""
+		try:
+			self.data[self.data.index(old)] = new
+		except ValueError:
+			log.warning(f"{old} is not part of this character")
+			return False
+		old_touches, new_touches = old.touches, new.touches
+		if old_touches is None or new_touches is None:
+			return self._update(None)
+		return self._update(old_touches | new_touches)
+
+	def _update(self,fields) -> bool:
+		if fields is None:
+			return self.recompute(DERIVED_FIELDS)
+		return self.recompute(fields)
+
 	def output(self,pdf_path) -> bool:
 		"""Print the character sheet to a beautiful PDF file
 
@@ -284,11 +492,14 @@ class CharacterSheet:
 
 		Parameters
 		----------
-		pdf_path:str
+		pdf_path:str or binary stream
 			Path to output file. Must end in .pdf extension.
-			If file exists, it will be overwritten.
+			If file exists, it will be overwritten. An open
+			binary stream (e.g. io.BytesIO) is written to
+			instead.
 		"""
-		if not self.flush():
+		# a sheet restored from a snapshot is already up to date
+		if self._record is None and not self.flush():
 			log.warning("Failed to flush, cannot output sheet")
 			return False
 		maker = SheetMaker()
@@ -300,6 +511,43 @@ class CharacterSheet:
 			log.exception("Failed to output")
 			return False
 
+	@staticmethod
+	def outputBook(character_sheets,pdf_path,dropped=None) -> bool:
+		"""Print many character sheets to one PDF file, one page each
+
+		Sheets restored from a snapshot are printed as loaded;
+		others are flushed first, and those that fail to flush
+		are left out with a warning.
+
+		***
+
+		Parameters
+		----------
+		character_sheets: iterable
+			CharacterSheet objects, in page order
+		pdf_path:str
+			Path to output file. Must end in .pdf extension.
+			If file exists, it will be overwritten.
+		dropped: list
+			Optional. Sheets left out of the book are appended
+			to it, each before the next sheet is read.
+		"""
+		def flushed():
+			for sheet in character_sheets:
+				# a sheet restored from a snapshot is already up to date
+				if sheet._record is None and not sheet.flush():
+					log.warning("Failed to flush, leaving sheet out of the book")
+					if dropped is not None:
+						dropped.append(sheet)
+				else:
+					yield sheet
+		try:
+			SheetMaker.makeBook(flushed(),pdf_path)
+			return True
+		except:
+			log.exception("Failed to output book")
+			return False
+
 	def edit(self) -> bool:
 		"""TODO"""
 		return False
\ No newline at end of file
@@ -4,9 +4,10 @@ log = logging.getLogger(__name__)
 
 import copy, random, sys
 from collections import defaultdict
-from .func import getModel
-from .weapon import Weapon, Modification
-from .dietype import DieType
+from .func import getModel, FrozenDict
+from .effect import applyEffects, call, improve, add, setValue, newDie, append, union, addSkill
+from .weapon import Weapon
+from .gear import gearCatalog, parseGear, KINDS
 
 class Choice:
 	"""A class to represent an EoS character creation choice point
@@ -38,6 +39,9 @@ class Choice:
 		Name of the category of child choices. For example, 
 		for a Choice of species (e.g. 'Elek'), the subchoice
 		category would be 'Species Trait'
+	effects: list
+		Effects (see eoschar.effect) applied after the ones
+		implied by the type of this Choice.
 	name: str
 		Unique name of this Choice. e.g. 'Close Combat'
 	prerequisites: list
@@ -56,6 +60,12 @@ class Choice:
 	addChild: int
 		Append a child Choice to self.children. Returns
 		current number of children after appending.
+	clone: Choice
+		Copy of this tree that is safe to fill in for one
+		character. Only per-character state is copied; the
+		rest of the tree is shared with the original.
+	freeze: None
+		Make this Choice and its descendants immutable.
 	cascadeRootId: bool
 		Set all descendants to have the same root_id as this Choice.
 		Should only be manually called from a root node.
@@ -72,11 +82,34 @@ class Choice:
 		Generator that yields the name attribute for each child
 		in children.
 	implement(CharacterSheet): bool
-		Adds the Choice to a CharacterSheet object
+		Adds the Choice to a CharacterSheet object by applying
+		its compiled ops.
+	ops: tuple
+		Every Effect this Choice applies, compiled once from
+		baseEffects() and self.effects.
+	baseEffects: list
+		Effects implied by the type of this Choice. Overridden
+		by subclasses.
+	addEffect: bool
+		Append Effects to self.effects.
+	touches: frozenset
+		Names of the CharacterSheet fields this Choice writes.
+	implementFields(CharacterSheet,fields): bool
+		Apply only the ops that write to the given fields.
+	addImplementation: bool
+		Wrap an arbitrary function in a 'call' Effect. Prefer
+		addEffect.
 
 	
 	"""
 
+	# names of attributes holding per-character state. clone()
+	# copies these; everything else is shared between clones.
+	_state_attributes = ()
+	# whether implementFields can apply a subset of this Choice's
+	# effects; False for subclasses with a procedural implement()
+	partial = True
+
 	def __init__(self,**kwargs):
 		self.category = kwargs.get("category",None)
 		self.children = []
@@ -85,6 +118,7 @@ class Choice:
 		self.prerequisites = []
 		self.root_id = kwargs.get("root_id",None)
 		self.unique = kwargs.get("unique",{})
+		self.effects = list(kwargs.get("effects",[]))
 		try:
 			self.addImplementation(kwargs['implementation'])
 		except KeyError:
@@ -104,6 +138,11 @@ class Choice:
 			tree = f"tree {self.root_id}"
 		return f"<Instance of Choice, {tree} | {nodeType} : '{self.name}', {childType}>"
 
+	def __setattr__(self,name,value):
+		if self.__dict__.get("_frozen",False) and name not in self._state_attributes:
+			raise AttributeError(f"Cannot set '{name}' on frozen Choice '{self.name}'. Call clone() for a writable copy.")
+		super().__setattr__(name,value)
+
 	def display(self,level=0):
 		if level==0:
 			if self.category is not None:
@@ -135,7 +174,38 @@ class Choice:
 		"""
 		if not isinstance(new_child,Choice):
 			raise SyntaxError("new_child must be a Choice object")
-		self.children.append(copy.deepcopy(new_child))
+		if self.__dict__.get("_frozen",False):
+			raise AttributeError(f"Cannot add children to frozen Choice '{self.name}'")
+		# children are shared, not copied; see clone()
+		self.children.append(new_child)
+		return len(self.children)
+
+	def freeze(self) -> None:
+		"""Make this Choice and its descendants immutable
+
+		Called once a tree is fully built, so that nodes can be
+		shared safely between characters. Attributes listed in
+		_state_attributes stay writable.
+		"""
+		self.__dict__["_frozen"] = True
+		for child in self.children:
+			child.freeze()
+
+	def clone(self):
+		"""Return a copy of this tree that is safe to fill in for one character
+
+		Nodes without per-character state are shared with the
+		original; a node is copied only if it, or one of its
+		descendants, has _state_attributes.
+		"""
+		children = [child.clone() for child in self.children]
+		if not self._state_attributes and all(a is b for a,b in zip(children,self.children)):
+			return self
+		new = copy.copy(self)
+		new.__dict__["children"] = children
+		for attr in self._state_attributes:
+			new.__dict__[attr] = copy.deepcopy(self.__dict__.get(attr))
+		return new
 
 	def cascadeRootId(self,override_root=False) -> bool:
 		"""Set all children to have the same root_id as this Choice
@@ -156,18 +226,72 @@ class Choice:
 			child.cascadeRootId(override_root=True)
 		return True
 	
+	@property
+	def ops(self) -> tuple:
+		"""Every Effect this Choice applies, compiled on first use"""
+		ops = self.__dict__.get("_ops")
+		if ops is None:
+			ops = tuple(self.baseEffects()) + tuple(self.effects)
+			self.__dict__["_ops"] = ops
+		return ops
+
+	def baseEffects(self) -> list:
+		"""Effects implied by the type of this Choice
+
+		A plain Choice has none; subclasses override this.
+		"""
+		return []
+
 	def implement(self,character_sheet,*args,**kwargs) -> bool:
-		pass
+		applyEffects(self.ops,character_sheet)
+		return True
+
+	@property
+	def touches(self):
+		"""Names of the CharacterSheet fields this Choice writes
+
+		None if they cannot be known, i.e. if any op is a 'call'.
+		"""
+		if "_touches" not in self.__dict__:
+			touches = frozenset(op.target for op in self.ops)
+			if any(op.op == "call" for op in self.ops):
+				touches = None
+			self.__dict__["_touches"] = touches
+		return self.__dict__["_touches"]
+
+	def implementFields(self,character_sheet,fields) -> bool:
+		"""Apply only the ops that write to the given fields
+
+		Choices that are not partial apply everything.
+		"""
+		if not self.partial:
+			return self.implement(character_sheet)
+		applyEffects([op for op in self.ops if op.target in fields],character_sheet)
+		return True
+
+	def addEffect(self,*effects) -> bool:
+		"""Append Effects to the end of this Choice's implementation
+
+		***
+
+		Parameters
+		----------
+		*effects: eoschar.effect.Effect
+		"""
+		if self.__dict__.get("_frozen",False):
+			raise AttributeError(f"Cannot add effects to frozen Choice '{self.name}'")
+		self.effects.extend(effects)
+		self.__dict__.pop("_ops",None)
+		self.__dict__.pop("_touches",None)
+		return True
 
 	def addImplementation(self,new_function) -> bool:
 		"""Adds new behavior to end of implement() function
+
+		The function is wrapped in a 'call' Effect, which cannot
+		be inspected or pickled; prefer addEffect.
 		"""
-		oldImplement = self.implement
-		def newImplement(*args,**kwargs):
-			oldImplement(*args,**kwargs)
-			new_function(*args,**kwargs)
-		self.implement= newImplement
-		return True
+		return self.addEffect(call(new_function))
 
 	def getChildren(self) -> bool:
 		"""Returns a list of 'name' for each child in self.children"""
@@ -224,14 +348,14 @@ class Species(Choice):
 		self.base_qualities = base_qualities
 		self.speed=speed
 
-	def implement(self,character_sheet,*args,**kwargs) -> bool:
-		character_sheet.choice_names['Species'] = self.name
+	def baseEffects(self) -> list:
+		effects = [setValue("choice_names","Species",self.name)]
 		for q in self.base_qualities.keys():
 			if q not in ["Brawn","Grace","Wits","Spirit"]:
 				log.warning(f"Unknown quality '{q}' implemented by {self.name}")
-			character_sheet.qualities[q] = DieType(self.base_qualities[q])
-		character_sheet.combat_stats['Speed'] = self.speed
-		return True
+			effects.append(newDie("qualities",q,self.base_qualities[q]))
+		effects.append(setValue("combat_stats","Speed",self.speed))
+		return effects
 
 
 class Talent(Choice):
@@ -259,14 +383,13 @@ class Training(Choice):
 		self.skill = kwargs['skill'] # str
 		self.gear = kwargs.get('gear',[]) # list
 
-	def implement(self,character_sheet,*args,**kwargs) ->bool:
-		character_sheet.choice_names['Training'] = self.name
+	def baseEffects(self) -> list:
 		model = getModel('model_training.json')[self.name]
-		character_sheet.skills[self.skill]['level'] += 1
+		effects = [setValue("choice_names","Training",self.name),addSkill(self.skill)]
 		for item in self.gear:
-			character_sheet.gear.append(item)
-		character_sheet.traits.append({"Name":model["Training Trait"]["name"],"Description":model["Training Trait"]["description"]})
-		return True
+			effects.append(add("gear",*parseGear(item)))
+		effects.append(append("traits",FrozenDict(Name=model["Training Trait"]["name"],Description=model["Training Trait"]["description"])))
+		return effects
 
 
 class Focus(Choice):
@@ -276,11 +399,12 @@ class Focus(Choice):
 		self.skills = kwargs['skills']
 		self.trait = kwargs['trait']
 
-	def implement(self,character_sheet,*args,**kwargs):
-		character_sheet.choice_names['Focus'] = self.name
+	def baseEffects(self) -> list:
+		effects = [setValue("choice_names","Focus",self.name)]
 		for s in self.skills:
-			character_sheet.skills[s]['level'] += 1
-		character_sheet.traits.append({"Name":self.trait["name"],"Description":self.trait["description"]})
+			effects.append(addSkill(s))
+		effects.append(append("traits",FrozenDict(Name=self.trait["name"],Description=self.trait["description"])))
+		return effects
 
 
 class CombatSpecialty(Choice):
@@ -290,24 +414,25 @@ class CombatSpecialty(Choice):
 		self.traits = kwargs['traits']
 		self.gear = kwargs['gear']
 
-	def implement(self,character_sheet,*args,**kwargs):
-		character_sheet.choice_names['Combat Specialty'] = self.name
+	def baseEffects(self) -> list:
+		effects = [setValue("choice_names","Combat Specialty",self.name)]
 		for t in self.traits:
-			character_sheet.traits.append(t)
+			effects.append(append("traits",t))
 		for item in self.gear:
 			parts = item.split()
 			if parts[0] == "!":
 				if parts[1] == 'abstract':
 					if parts[2] == 'weapon':
-						character_sheet._abstract_weapons[parts[3]] += 1
+						effects.append(add("_abstract_weapons",parts[3],1))
 					else:
 						log.error(f"Failed to parse item in {self.name}.gear: {item}")
 				elif parts[1] == 'weapon':
-					character_sheet._raw_weapons.append(getModel('model_weapons.json')[parts[2]])
+					effects.append(append("_raw_weapons",getModel('model_weapons.json')[parts[2]]))
 				else:
-					log.warning(f"'{item}' failed to parse in CombatSpecialty.implement()")
+					log.warning(f"'{item}' failed to parse in CombatSpecialty.baseEffects()")
 			else:
-				character_sheet.gear.append(item)
+				effects.append(add("gear",*parseGear(item)))
+		return effects
 
 
 class Background(Choice):
@@ -319,27 +444,38 @@ class Background(Choice):
 		self.gear = kwargs['gear']
 		self.money = kwargs['money']
 
-	def implement(self,character_sheet,*args,**kwargs):
-		character_sheet.choice_names['Background'] = self.name
-		character_sheet.traits.append(self.trait)
-		character_sheet.trivia += self.trivia
-		character_sheet.trivia = list(set(character_sheet.trivia)) # delete duplicate trivia
+	def baseEffects(self) -> list:
+		effects = [
+			setValue("choice_names","Background",self.name),
+			append("traits",self.trait),
+			union("trivia",self.trivia) # no duplicate trivia
+			]
 		for item in self.gear:
 			parts = item.split()
 			if parts[0] == "!": # signals abstract gear choice
-				{
-				"potion":character_sheet._abstract_potions,
-				"grenade":character_sheet._abstract_grenades,
-				"ammunition":character_sheet._abstract_ammunition,
-				"modification":character_sheet._abstract_modifications,
-				"kit":character_sheet._abstract_kits
-				}[parts[1]][parts[2]] += int(parts[3])
+				target = {
+				"potion":"_abstract_potions",
+				"grenade":"_abstract_grenades",
+				"ammunition":"_abstract_ammunition",
+				"modification":"_abstract_modifications",
+				"kit":"_abstract_kits"
+				}[parts[1]]
+				effects.append(add(target,parts[2],int(parts[3])))
 			else:
-				character_sheet.gear.append(item)
-		character_sheet.money += self.money
+				effects.append(add("gear",*parseGear(item)))
+		effects.append(add("money",None,self.money))
+		return effects
 
 class TextInput(Choice):
 	"""A class to represent an EoS motivation."""
+	_state_attributes = ("value",)
+	partial = False
+
+	@property
+	def touches(self):
+		touches = super().touches
+		return None if touches is None else touches | {"choice_names"}
+
 	def __init__(self,**kwargs):
 		super().__init__(**kwargs)
 		self.value = kwargs.get("value","")
@@ -349,7 +485,9 @@ class TextInput(Choice):
 		self.value = input(prompt)
 
 	def implement(self,character_sheet,*args,**kwargs):
+		# value is per-character, so it is not compiled into ops
 		character_sheet.choice_names[self.name] = self.value
+		return super().implement(character_sheet)
 
 
 class Trait(Choice):
@@ -365,8 +503,8 @@ class Trait(Choice):
 		super().__init__(**kwargs)
 		self.description = description
 
-	def implement(self,character_sheet,*args,**kwargs):
-		character_sheet.traits.append({"Name":self.name,"Description":self.description})
+	def baseEffects(self) -> list:
+		return [append("traits",FrozenDict(Name=self.name,Description=self.description))]
 
 
 class Item(Choice):
@@ -381,26 +519,26 @@ class Item(Choice):
 		if self.gear_type == "weapon":
 			self.profile = Weapon(**getModel("model_weapons.json")[self.item_name])
 
-	def implement(self,character_sheet,*args,**kwargs):
+	def baseEffects(self) -> list:
 		if self.abstract:
 			if self.gear_type=="potion":
-				character_sheet._abstract_potions[self.level]+=self.n
+				return [add("_abstract_potions",self.level,self.n)]
 			elif self.gear_type == "ammunition":
-				character_sheet._abstract_ammunition[self.level]+=self.n
+				return [add("_abstract_ammunition",self.level,self.n)]
 			elif self.gear_type == "modification":
-				character_sheet._abstract_modifications[self.level]+=self.n
+				return [add("_abstract_modifications",self.level,self.n)]
 			elif self.gear_type == "weapon":
-				character_sheet._raw_weapons.append(self.profile)
+				return [append("_raw_weapons",self.profile)]
 			elif self.gear_type == "grenade":
-				character_sheet._abstract_grenades[self.level]+=self.n
+				return [add("_abstract_grenades",self.level,self.n)]
 			else:
 				raise SyntaxError(f"No such thing as an abstract '{self.gear_type}'. Must be one of 'potion', 'ammunition', 'weapon', or 'modification'.")
 		elif self.gear_type == "weapon":
-			character_sheet.weapons.append(self.profile)
+			return [append("weapons",self.profile)]
 		elif self.gear_type == "custom":
-			pass
+			return []
 		else:
-			character_sheet.gear.append(self.item_name)
+			return [add("gear",self.item_name,1)]
 
 
 class PointBuy(Choice):
@@ -438,12 +576,25 @@ class PointBuy(Choice):
 	load: bool
 		Pull in a category dictionary from an external 
 		CharacterSheet object.
+	restore: None
+		Set categories read from a save, charging the
+		points their bought levels cost.
 	levelUp: bool
 		Raise a given category by a single level.
 	levelDown: bool
 		Lower a given category by a single level.
 	"""
 
+	_state_attributes = ("categories","current_points")
+	partial = False
+
+	@property
+	def touches(self):
+		touches = super().touches
+		if touches is None:
+			return None
+		return touches | {{"Skills":"skills","Trivia":"trivia"}.get(self.name,"skills")}
+
 	def __init__(self,**kwargs):
 		super().__init__(**kwargs)
 		self.starting_points = kwargs.get('starting_points',0)
@@ -482,9 +633,11 @@ class PointBuy(Choice):
 			for topic in self.categories.keys():
 				if self.categories[topic]['bought_levels'] + self.categories[topic]['base_levels'] > 0:
 					character_sheet.trivia.append(topic)
-			character_sheet.trivia = list(set(character_sheet.trivia))
+			# drop duplicates, keeping the order topics were gained in
+			character_sheet.trivia = list(dict.fromkeys(character_sheet.trivia))
 		else:
 			log.error(f"PointBuy.name expected one of ['Skills','Trivia'], got '{self.name}'.")
+		return super().implement(character_sheet)
 
 	def load(self,category_obj):
 		"""Reads external skills or trivia levels
@@ -513,6 +666,23 @@ class PointBuy(Choice):
 		else:
 			log.error("PointBuy.load() 'category_obj' argument must be list or dict")
 
+	def restore(self,categories) -> None:
+		"""Set categories read from a save, charging the points their bought levels cost
+
+		***
+
+		Parameters
+		----------
+		categories: dict
+			{name:{bought_levels,base_levels}}, as saved
+		"""
+		self.categories = categories
+		spent = 0
+		for levels in categories.values():
+			for level in range(levels['base_levels']+1,levels['base_levels']+levels['bought_levels']+1):
+				spent += self.points_per_level[level]
+		self.current_points = self.starting_points - spent
+
 	def levelUp(self,category_name)->bool:
 		"""Robustly levels a category up by one level
 
@@ -581,6 +751,14 @@ class AssignAbstractGear(Choice):
 		abstract gear and converts it to real gear.
 	"""
 
+	_state_attributes = ("raw_weapons","abstract_potions","abstract_weapons","abstract_modifications","abstract_ammunition","abstract_grenades","abstract_kits","weapons","gear")
+	partial = False
+
+	@property
+	def touches(self):
+		touches = super().touches
+		return None if touches is None else touches | {"weapons","gear"}
+
 	def __init__(self,**kwargs):
 		super().__init__(**kwargs)
 		## weapons before modifications
@@ -592,100 +770,23 @@ class AssignAbstractGear(Choice):
 		self.abstract_ammunition = None
 		self.abstract_grenades = None
 		self.abstract_kits = None
-		# references
-		self.ref_potions = {"A":[],"B":[],"C":[]}
-		self.ref_modifications = {"A":[],"B":[],"C":[]}
-		self.ref_grenades = {"A":[],"B":[],"C":[]}
-		self.ref_ammunition = {"A":[],"B":[],"C":[]}
-		self.ref_weapons = {"Ranged":[],"Melee":[]}
-		self.ref_kits = {"A":[],"B":[],"C":[]}
 		# empty final weapon/gear list
 		self.weapons = []
 		self.gear = []
 
-		##### ACTUALLY DO THE ADDING
-
-		## add all POTIONS
-		potion_model = getModel('model_potions.json')
-		for p in potion_model:
-			self.ref_potions[p['level']].append(p['name'])
-
-		## add all MODIFICATIONS
-		## level A
-		modification_model = getModel('model_modifications.json')
-		### bolt_thrower
-		bolt_thrower = Modification(**modification_model["Bolt-Thrower"],range=lambda r: 50)
-		self.ref_modifications[bolt_thrower.level].append(bolt_thrower)
-		### breacher_muzzle
-		breacher_muzzle = Modification(**modification_model["Breacher Muzzle"],range=lambda r: 20)
-		self.ref_modifications[breacher_muzzle.level].append(breacher_muzzle)
-		### chem_pipes
-		chem_pipes = Modification(**modification_model["Chem-Pipes"])
-		self.ref_modifications[chem_pipes.level].append(chem_pipes)
-		### concealable
-		concealable = Modification(**modification_model["Concealable"])
-		self.ref_modifications[concealable.level].append(concealable)
-		### double_barrel
-		double_barrel = Modification(**modification_model["Double-Barrel"])
-		self.ref_modifications[double_barrel.level].append(double_barrel)
-		### gene_lock
-		gene_lock = Modification(**modification_model["Gene-Lock"])
-		self.ref_modifications[gene_lock.level].append(gene_lock)
-		### large
-		large = Modification(**modification_model["Large"],reach=lambda r: r+1)
-		self.ref_modifications[large.level].append(large)
-		### stealth_mod
-		stealth_mod = Modification(**modification_model["Stealth Mod"])
-		self.ref_modifications[stealth_mod.level].append(stealth_mod)
-		## level B
-		### auto_targeter
-		auto_targeter = Modification(**modification_model["Auto Targeter"],accuracy=lambda a: a+1)
-		self.ref_modifications[auto_targeter.level].append(auto_targeter)
-		### brutal
-		brutal = Modification(**modification_model["Brutal"],reach=lambda r: r+1)
-		self.ref_modifications[brutal.level].append(brutal)
-		### paired
-		paired = Modification(**modification_model["Paired"],reach=lambda r: 2)
-		self.ref_modifications[paired.level].append(paired)
-		### plas_core
-		plas_core = Modification(**modification_model["Plas-Core"],reach=lambda r: r+1)
-		self.ref_modifications[plas_core.level].append(plas_core)
-		### resin_tank
-		resin_tank = Modification(**modification_model["Resin Tank"])
-		self.ref_modifications[resin_tank.level].append(resin_tank)
-		### shock_wires
-		shock_wires = Modification(**modification_model["Shock Wires"])
-		self.ref_modifications[shock_wires.level].append(shock_wires)
-		### overcharged_plas_core
-		overcharged_plas_core = Modification(**modification_model["Overcharged Plas-Core"],ap=lambda a: 3)
-		self.ref_modifications[overcharged_plas_core.level].append(overcharged_plas_core)
-		### chemtrace_ammunition
-		chemtrace_ammunition = Modification(**modification_model["Chemtrace Ammunition"])
-		self.ref_modifications[chemtrace_ammunition.level].append(chemtrace_ammunition)
-
-		## add all GRENADES
-		grenade_model = getModel('model_grenades.json')
-		for level in grenade_model.keys():
-			self.ref_grenades[level] = grenade_model[level]
-
-		## add all AMMUNITION
-		ammunition_model = getModel('model_ammunition.json')
-		for level in ammunition_model.keys():
-			self.ref_ammunition[level] = ammunition_model[level]
-
-		## add all WEAPONS
-		weapon_model = getModel('model_weapons.json')
-		for wKey in weapon_model.keys():
-			weapon = weapon_model[wKey]
-			if weapon['range'] > 0:
-				self.ref_weapons['Ranged'].append(weapon)
-			elif weapon['reach'] >0:
-				self.ref_weapons['Melee'].append(weapon)
-
-		## add all KITS
-		kit_model = getModel('model_kits.json')
-		for level in kit_model.keys():
-			self.ref_kits[level] = kit_model[level]
+	def __setstate__(self,state):
+		# pickles made before the shared catalog carry their own ref_ lists
+		for kind in KINDS:
+			state.pop(f"ref_{kind}",None)
+		self.__dict__.update(state)
+
+	## references, read-only and shared by every instance (see eoschar.gear)
+	ref_potions = property(lambda self: gearCatalog().levels("potions"))
+	ref_modifications = property(lambda self: gearCatalog().levels("modifications"))
+	ref_grenades = property(lambda self: gearCatalog().levels("grenades"))
+	ref_ammunition = property(lambda self: gearCatalog().levels("ammunition"))
+	ref_weapons = property(lambda self: gearCatalog().levels("weapons"))
+	ref_kits = property(lambda self: gearCatalog().levels("kits"))
 
 	def assign(self,character_sheet):
 		## weapons before modifications
@@ -702,37 +803,8 @@ class AssignAbstractGear(Choice):
 		## add weapons to character_sheet.weapons
 		for w in self.weapons:
 			character_sheet.weapons.append(w)
-		## add gear to character_sheet.gear
+		## add gear to character_sheet.gear; assigned gear is
+		## catalog names, one of each
 		for item in self.gear:
-			character_sheet.gear.append(item)
-
-		## finally, count duplicate items in character_sheet.gear
-		## and format them appropriately
-		counted = defaultdict(int)
-		for item in character_sheet.gear:
-			parts = item.split()
-			try:
-				n = int(parts[0])
-				item = " ".join(parts[1:])
-			except ValueError:
-				n = 1
-			counted[item] += n
-		character_sheet.gear = []
-		for item in counted.keys():
-			if counted[item] > 1:
-				item = item + f" ({counted[item]})"
-			else: # certain item types should always have a number, even (1)
-				for level in self.ref_potions.keys():
-					for p in self.ref_potions[level]:
-						if p == item:
-							item = item + " (1)"
-				for level in self.ref_ammunition.keys():
-					for p in self.ref_ammunition[level]:
-						if p == item:
-							item = item + " (1)"
-				for level in self.ref_grenades.keys():
-					for p in self.ref_grenades[level]:
-						if p == item:
-							item = item + " (1)"
-			character_sheet.gear.append(item)
-		character_sheet.gear.sort()
+			character_sheet.gear.add(item)
+		return super().implement(character_sheet)
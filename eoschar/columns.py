@@ -0,0 +1,226 @@
+"""Columnar store for analytics over a library of saved characters
+
+CharacterColumns loads every save in a directory once and keeps the
+numbers worth aggregating as NumPy arrays, one row per character:
+
+* qualities and combat dice, as integer die codes: the number of
+  sides, so smaller is better and "Brawn d6 or better" is
+  quality("Brawn") <= 6;
+* skill levels;
+* money, AV and toughness;
+* species, background, training, focus and combat specialty, as
+  ids into a table of labels.
+
+The arrays are saved together as an uncompressed .npz file, so later
+queries are plain vectorized expressions and never replay the
+choice trees, e.g.
+
+	columns = CharacterColumns.load("library.npz")
+	(columns.quality("Brawn") <= 6).mean()
+
+NumPy is an optional dependency: pip install eoschar[analytics]
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import glob, time
+from concurrent.futures import ProcessPoolExecutor
+from .charactersheet import CharacterSheet
+from .func import getModel
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+CHOICE_COLUMNS = {
+	"species":"Species",
+	"background":"Background",
+	"training":"Training",
+	"focus":"Focus",
+	"combat_specialty":"Combat Specialty"
+}
+DIE_COLUMNS = {
+	"shooting_die":"Shooting Die",
+	"fighting_die":"Fighting Die"
+}
+
+
+def _requireNumpy() -> None:
+	if np is None:
+		raise ImportError("CharacterColumns requires numpy; install it with 'pip install eoschar[analytics]'")
+
+
+def _readRow(path) -> dict:
+	"""Load one save and pull out the values kept as columns"""
+	sheet = CharacterSheet()
+	if not sheet.load(path):
+		raise ValueError(f"Could not load {path}")
+	row = {
+		"filename":os.path.basename(path),
+		"name":sheet.choice_names["Name"],
+		"qualities":[int(sheet.qualities[q]) for q in getModel('model_qualities.json')],
+		"skills":[sheet.skills[s['name']]['level'] for s in getModel('model_skills.json')],
+		"money":sheet.money,
+		"av":sheet.combat_stats["AV"],
+		"toughness":sheet.combat_stats["Toughness"]
+	}
+	for column, field in DIE_COLUMNS.items():
+		row[column] = int(sheet.combat_stats[field])
+	for column, field in CHOICE_COLUMNS.items():
+		row[column] = sheet.choice_names[field]
+	return row
+
+
+def _readRows(paths) -> list:
+	"""Load a batch of saves, skipping (and logging) bad ones; runs in a worker"""
+	rows = []
+	for path in paths:
+		try:
+			rows.append(_readRow(path))
+		except:
+			log.exception(f"Failed to read {path}")
+	return rows
+
+
+class CharacterColumns:
+	"""NumPy columns describing a library of saved characters
+
+	***
+
+	Attributes
+	----------
+	columns: dict
+		Maps column name to a NumPy array. Every array has one
+		row per character. 'qualities' and 'skills' are two-
+		dimensional, with column labels in 'quality_names' and
+		'skill_names'; each choice id column (e.g. 'background')
+		has its labels in '<column>_labels'.
+
+	Methods
+	-------
+	build: CharacterColumns
+		Read every save in a directory
+	load: CharacterColumns
+		Read a store written by save
+	save: None
+		Write the store to an .npz file
+	quality: numpy.ndarray
+		Die codes of one quality
+	skill: numpy.ndarray
+		Levels of one skill
+	choice: numpy.ndarray
+		Boolean mask of characters who made a selection
+	labels: numpy.ndarray
+		Labels of a choice id column, one per character
+	"""
+	def __init__(self,columns):
+		_requireNumpy()
+		self.columns = columns
+
+	def __repr__(self):
+		return f"<Instance of CharacterColumns | {len(self)} characters>"
+
+	def __len__(self):
+		return len(self.columns["filename"])
+
+	def __getitem__(self,column):
+		return self.columns[column]
+
+	@classmethod
+	def build(cls,in_dir,pattern="*.txt",jobs=1,batch_size=200):
+		"""Read every save in in_dir matching pattern
+
+		Saves that fail to load are logged and left out.
+
+		***
+
+		Parameters
+		----------
+		in_dir: str
+		pattern: str
+			Glob pattern for save files within in_dir
+		jobs: int
+			Number of worker processes; None for the number
+			of CPUs
+		batch_size: int
+			Saves read per worker task
+		"""
+		_requireNumpy()
+		t0 = time.perf_counter()
+		paths = sorted(glob.glob(os.path.join(in_dir,pattern)))
+		batches = [paths[i:i+batch_size] for i in range(0,len(paths),batch_size)]
+		jobs = os.cpu_count() if jobs is None else jobs
+		if jobs <= 1:
+			rows = [row for batch in map(_readRows,batches) for row in batch]
+		else:
+			with ProcessPoolExecutor(max_workers=jobs) as executor:
+				rows = [row for batch in executor.map(_readRows,batches) for row in batch]
+
+		skill_names = [s['name'] for s in getModel('model_skills.json')]
+		quality_names = list(getModel('model_qualities.json'))
+		columns = {
+			"filename":np.array([r["filename"] for r in rows],dtype=str),
+			"name":np.array([r["name"] for r in rows],dtype=str),
+			"quality_names":np.array(quality_names,dtype=str),
+			"qualities":np.array([r["qualities"] for r in rows],dtype=np.int8).reshape(len(rows),len(quality_names)),
+			"skill_names":np.array(skill_names,dtype=str),
+			"skills":np.array([r["skills"] for r in rows],dtype=np.int8).reshape(len(rows),len(skill_names)),
+			"money":np.array([r["money"] for r in rows],dtype=np.int32),
+			"av":np.array([r["av"] for r in rows],dtype=np.int16),
+			"toughness":np.array([r["toughness"] for r in rows],dtype=np.int16)
+		}
+		for column in DIE_COLUMNS.keys():
+			columns[column] = np.array([r[column] for r in rows],dtype=np.int8)
+		for column in CHOICE_COLUMNS.keys():
+			labels, ids = np.unique(np.array([r[column] for r in rows],dtype=str),return_inverse=True)
+			columns[f"{column}_labels"] = labels
+			columns[column] = ids.astype(np.int16)
+		log.info(f"Read {len(rows)} of {len(paths)} characters from {in_dir} in {time.perf_counter()-t0:.1f}s")
+		return cls(columns)
+
+	@classmethod
+	def load(cls,file_path):
+		"""Read a store written by save"""
+		_requireNumpy()
+		with np.load(file_path,allow_pickle=False) as npz:
+			return cls({k:npz[k] for k in npz.files})
+
+	def save(self,file_path) -> None:
+		"""Write every column to an uncompressed .npz file"""
+		np.savez(file_path,**self.columns)
+
+	def quality(self,name):
+		"""Return the die code (number of sides) of quality 'name' for every character"""
+		return self.columns["qualities"][:,list(self.columns["quality_names"]).index(name)]
+
+	def skill(self,name):
+		"""Return the level of skill 'name' for every character"""
+		return self.columns["skills"][:,list(self.columns["skill_names"]).index(name)]
+
+	def choice(self,column,label):
+		"""Return a mask of the characters whose 'column' selection is 'label'
+
+		Labels that no character selected give an all-False mask.
+
+		***
+
+		Parameters
+		----------
+		column: str
+			One of 'species', 'background', 'training',
+			'focus', 'combat_specialty'
+		label: str
+			e.g. 'Confirmed'
+		"""
+		labels = self.columns[f"{column}_labels"]
+		matches = np.flatnonzero(labels == label)
+		if len(matches) == 0:
+			return np.zeros(len(self),dtype=bool)
+		return self.columns[column] == matches[0]
+
+	def labels(self,column):
+		"""Return the selection label of 'column' for every character"""
+		return self.columns[f"{column}_labels"][self.columns[column]]
@@ -5,10 +5,11 @@ log = logging.getLogger(__name__)
 import sys
 from .charactersheet import CharacterSheet
 from .choice import Choice, Item
-from .options import trees as TREES
+from . import options
 from .interface import Interface
 from .sheetmaker import SheetMaker
 from .func import clearScreen
+from . import bundle
 from ._version import __version__
 import argparse
 
@@ -21,6 +22,22 @@ def makeExample():
 	maker.make(os.path.join(os.path.dirname(os.path.dirname(__file__)),"temp","example_output_sheet.pdf"))
 
 
+def _requirement(text) -> tuple:
+	"""Parse a NAME=NUMBER command line requirement, e.g. Heal=3"""
+	name, sep, number = text.rpartition("=")
+	if not sep or not name:
+		raise argparse.ArgumentTypeError(f"expected NAME=NUMBER, got '{text}'")
+	try:
+		return name, int(number.lstrip("dD"))
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected NAME=NUMBER, got '{text}'")
+
+
+def _printCharacters(characters) -> None:
+	for c in characters:
+		print(" | ".join(str(c[column]) for column in ("name","species","background","training","focus","combat_specialty","path")))
+
+
 def main():
 	parser = argparse.ArgumentParser(description="Create, save, and export Era of Silence characters")
 	## use subparsers https://pymotw.com/3/argparse/#nesting-parsers
@@ -49,8 +66,311 @@ def main():
 		help='Display character creation choice trees and exit'
 		)
 
+	## rules bundle command
+	bundle_parser = subparsers.add_parser(
+		'bundle',
+		help='Compile resources/ into a single rules bundle and exit'
+		)
+
+	bundle_parser.add_argument('--output',
+		type=str,
+		default=bundle.BUNDLE_PATH,
+		help="Where to write the bundle (default: resources/rules.bundle)"
+		)
+
+	## random character generator command
+	generate_parser = subparsers.add_parser(
+		'generate',
+		help='Save randomly generated, rules-legal characters and exit'
+		)
+
+	generate_parser.add_argument('--count',
+		type=int,
+		default=1,
+		help="Number of characters to generate (default: 1)"
+		)
+
+	generate_parser.add_argument('--seed',
+		type=int,
+		default=0,
+		help="Random seed; the same seed always gives the same characters (default: 0)"
+		)
+
+	generate_parser.add_argument('--jobs',
+		type=int,
+		default=None,
+		help="Number of worker processes (default: number of CPUs)"
+		)
+
+	generate_parser.add_argument('--output-dir',
+		type=str,
+		default=".",
+		help="Directory to save the characters in (default: current directory)"
+		)
+
+	## batch PDF rendering command
+	render_parser = subparsers.add_parser(
+		'render',
+		help='Render every saved character in a directory to PDF and exit'
+		)
+
+	render_parser.add_argument('--input-dir',
+		type=str,
+		default=".",
+		help="Directory of saved characters (default: current directory)"
+		)
+
+	render_parser.add_argument('--output-dir',
+		type=str,
+		default=".",
+		help="Directory to write the PDFs in (default: current directory)"
+		)
+
+	render_parser.add_argument('--jobs',
+		type=int,
+		default=None,
+		help="Number of worker processes (default: number of CPUs)"
+		)
+
+	render_parser.add_argument('--timeout',
+		type=float,
+		default=60,
+		help="Seconds allowed per sheet before it is skipped (default: 60)"
+		)
+
+	render_parser.add_argument('--book',
+		type=str,
+		default=None,
+		help="Write every sheet into this one PDF, a page each, instead of one file per sheet"
+		)
+
+	## analytics store command
+	columns_parser = subparsers.add_parser(
+		'columns',
+		help='Build a columnar analytics store (.npz) from a directory of saves and exit; requires numpy'
+		)
+
+	columns_parser.add_argument('--input-dir',
+		type=str,
+		default=".",
+		help="Directory of saved characters (default: current directory)"
+		)
+
+	columns_parser.add_argument('--output',
+		type=str,
+		default="library.npz",
+		help="Where to write the store (default: library.npz)"
+		)
+
+	columns_parser.add_argument('--jobs',
+		type=int,
+		default=1,
+		help="Number of worker processes (default: 1)"
+		)
+
+	## character library commands
+	library_parser = subparsers.add_parser(
+		'library',
+		help='Index saved characters in a SQLite library and query it, then exit'
+		)
+
+	library_parser.add_argument('--db',
+		type=str,
+		default="library.db",
+		help="Library database file (default: library.db)"
+		)
+
+	library_subparsers = library_parser.add_subparsers(help='library commands',dest="library_command")
+
+	library_add_parser = library_subparsers.add_parser(
+		'add',
+		help='Add or refresh saves; unchanged files are skipped'
+		)
+
+	library_add_parser.add_argument('paths',
+		type=str,
+		nargs='+',
+		help="Save files, or directories of saves"
+		)
+
+	library_add_parser.add_argument('--jobs',
+		type=int,
+		default=None,
+		help="Number of worker processes (default: number of CPUs)"
+		)
+
+	library_add_parser.add_argument('--prune',
+		action='store_true',
+		help="Also drop characters whose save files no longer exist"
+		)
+
+	library_find_parser = library_subparsers.add_parser(
+		'find',
+		help='List characters matching every given criterion'
+		)
+
+	for option in ('name','species','background','training','focus','combat-specialty'):
+		library_find_parser.add_argument(f'--{option}',
+			type=str,
+			default=None,
+			help=f"Exact {option.replace('-',' ')}"
+			)
+
+	library_find_parser.add_argument('--quality',
+		type=_requirement,
+		action='append',
+		default=[],
+		help="QUALITY=DIE, e.g. Brawn=6 for Brawn d6 or better; may be repeated"
+		)
+
+	library_find_parser.add_argument('--skill',
+		type=_requirement,
+		action='append',
+		default=[],
+		help="SKILL=LEVEL, e.g. Heal=3 for Heal 3 or higher; may be repeated"
+		)
+
+	library_find_parser.add_argument('--weapon',
+		type=str,
+		default=None,
+		help="Name or type of a carried weapon"
+		)
+
+	library_list_parser = library_subparsers.add_parser(
+		'list',
+		help='List every character in the library'
+		)
+
+	## character archive commands
+	archive_parser = subparsers.add_parser(
+		'archive',
+		help='Keep many saved characters in one append-only archive file, then exit'
+		)
+
+	archive_parser.add_argument('archive',
+		type=str,
+		help="Archive file; created if missing"
+		)
+
+	archive_subparsers = archive_parser.add_subparsers(help='archive commands',dest="archive_command")
+
+	archive_add_parser = archive_subparsers.add_parser(
+		'add',
+		help='Append save files, replacing characters of the same name'
+		)
+
+	archive_add_parser.add_argument('paths',
+		type=str,
+		nargs='+',
+		help="Save files, or directories of saves"
+		)
+
+	archive_subparsers.add_parser(
+		'list',
+		help='List the characters in the archive'
+		)
+
+	archive_extract_parser = archive_subparsers.add_parser(
+		'extract',
+		help='Write one character out as a save file'
+		)
+
+	archive_extract_parser.add_argument('name',
+		type=str,
+		help="Character name"
+		)
+
+	archive_extract_parser.add_argument('--output',
+		type=str,
+		default=None,
+		help="Save file to write (default: NAME.txt)"
+		)
+
+	archive_remove_parser = archive_subparsers.add_parser(
+		'remove',
+		help='Drop characters from the archive'
+		)
+
+	archive_remove_parser.add_argument('names',
+		type=str,
+		nargs='+',
+		help="Character names"
+		)
+
+	archive_subparsers.add_parser(
+		'compact',
+		help='Rewrite the archive without replaced and removed characters'
+		)
+
 	args = parser.parse_args()
 
+	## commands that do not need the interactive interface
+	if args.command == "tree":
+		options.getIndex().display()
+		return
+	elif args.command == "bundle":
+		if not bundle.compileBundle(args.output):
+			sys.exit(1)
+		return
+	elif args.command == "generate":
+		from .generator import generate
+		if generate(args.count,args.output_dir,seed=args.seed,jobs=args.jobs) < args.count:
+			sys.exit(1)
+		return
+	elif args.command == "render":
+		from .render import render, renderBook
+		if args.book is not None:
+			summary = renderBook(args.input_dir,args.book)
+		else:
+			summary = render(args.input_dir,args.output_dir,jobs=args.jobs,timeout=args.timeout)
+		if len(summary["failed"]) > 0:
+			sys.exit(1)
+		return
+	elif args.command == "columns":
+		from .columns import CharacterColumns
+		CharacterColumns.build(args.input_dir,jobs=args.jobs).save(args.output)
+		return
+	elif args.command == "library":
+		from .library import CharacterLibrary
+		if args.library_command is None:
+			library_parser.print_help()
+			sys.exit(2)
+		with CharacterLibrary(args.db) as library:
+			if args.library_command == "add":
+				summary = library.add(args.paths,jobs=args.jobs)
+				if args.prune:
+					log.info(f"Dropped {library.remove()} characters whose saves are gone")
+				if len(summary["failed"]) > 0:
+					sys.exit(1)
+			elif args.library_command == "find":
+				selections = {key:getattr(args,key) for key in ("name","species","background","training","focus","combat_specialty") if getattr(args,key) is not None}
+				_printCharacters(library.find(qualities=dict(args.quality),skills=dict(args.skill),weapon=args.weapon,**selections))
+			else:
+				_printCharacters(library.list())
+		return
+	elif args.command == "archive":
+		from .archive import CharacterArchive
+		if args.archive_command is None:
+			archive_parser.print_help()
+			sys.exit(2)
+		with CharacterArchive(args.archive) as archive:
+			if args.archive_command == "add":
+				log.info(f"Added {archive.importFiles(args.paths)} characters to {args.archive}")
+			elif args.archive_command == "list":
+				for name in archive.names():
+					print(name)
+			elif args.archive_command == "extract":
+				if args.name not in archive:
+					log.warning(f"No character named {args.name} in {args.archive}")
+					sys.exit(1)
+				with open(args.output or f"{args.name}.txt",'wb') as wf:
+					wf.write(archive.read(args.name))
+			elif args.archive_command == "remove":
+				log.info(f"Removed {archive.remove(args.names)} characters from {args.archive}")
+			else:
+				log.info(f"Reclaimed {archive.compact()} bytes in {args.archive}")
+		return
+
 	## create interface object
 	interface = Interface()
 
@@ -72,7 +392,4 @@ def main():
 		# behavior for loading an existing character
 		print("") # blank line
 		interface.loadCharacter(args.file)
-		interface.menu()
-	elif args.command == "tree":
-		for t in TREES:
-			t.display()
\ No newline at end of file
+		interface.menu()
\ No newline at end of file
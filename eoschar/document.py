@@ -0,0 +1,111 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from fpdf import FPDF
+
+# default size of the pieces chunks() yields
+CHUNK_SIZE = 64*1024
+
+
+class Document(FPDF):
+	"""FPDF that assembles the finished file in a list of chunks
+
+	FPDF appends every line of the finished file to one string,
+	copying everything written so far each time, so output time
+	grows with the square of the document size. That does not show
+	on a single sheet, but dominates a book of hundreds of pages.
+	Here lines are appended to a list and only joined when the
+	whole buffer is read. Page content is still built by FPDF, one
+	page at a time.
+
+	***
+
+	Attributes
+	----------
+	buffer: str
+		The finished file so far, as FPDF expects it
+
+	Methods
+	-------
+	toBytes: bytes
+		The finished PDF file
+	chunks: iterator
+		The finished PDF file, in pieces
+	writeTo: int
+		Write the finished PDF file to a binary stream
+	"""
+	def __init__(self,*args,**kwargs):
+		self._chunks = []
+		self._length = 0
+		super().__init__(*args,**kwargs)
+
+	def __repr__(self):
+		return f"<Instance of Document | {self.page} pages>"
+
+	@property
+	def buffer(self) -> str:
+		if len(self._chunks) != 1:
+			self._chunks = [''.join(self._chunks)]
+		return self._chunks[0]
+
+	@buffer.setter
+	def buffer(self,value) -> None:
+		self._chunks = [value]
+		self._length = len(value)
+
+	def _out(self,s) -> None:
+		if self.state == 2:
+			# page content
+			super()._out(s)
+			return
+		if isinstance(s,bytes):
+			s = s.decode("latin1")
+		elif not isinstance(s,str):
+			s = str(s)
+		self._chunks.append(s)
+		self._chunks.append("\n")
+		self._length += len(s) + 1
+
+	def _newobj(self) -> None:
+		# same as FPDF._newobj, without measuring the joined buffer
+		self.n += 1
+		self.offsets[self.n] = self._length
+		self._out(str(self.n)+' 0 obj')
+
+	def toBytes(self) -> bytes:
+		"""Finish the document and return the PDF file as bytes"""
+		if self.state < 3:
+			self.close()
+		return self.buffer.encode("latin1")
+
+	def chunks(self,chunk_size=CHUNK_SIZE):
+		"""Finish the document and yield the PDF file in pieces of bytes
+
+		Each piece is encoded as it is yielded, so the whole file
+		is never held as bytes at once.
+
+		***
+
+		Parameters
+		----------
+		chunk_size: int
+			Most characters (bytes) per piece
+		"""
+		if self.state < 3:
+			self.close()
+		buffer = self.buffer
+		for start in range(0,len(buffer),chunk_size):
+			yield buffer[start:start+chunk_size].encode("latin1")
+
+	def writeTo(self,stream,chunk_size=CHUNK_SIZE) -> int:
+		"""Finish the document and write it to a binary stream
+
+		Returns the number of bytes written. The stream is not
+		closed.
+		"""
+		written = 0
+		for chunk in self.chunks(chunk_size):
+			stream.write(chunk)
+			written += len(chunk)
+		return written
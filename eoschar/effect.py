@@ -0,0 +1,122 @@
+"""Declarative character sheet effects
+
+Every change a Choice makes to a CharacterSheet is described by an
+Effect: an operation name, the sheet attribute it targets, an
+optional key within that attribute, and a value. Choices compile
+their effects once into a tuple of ops, and applyEffects runs such a
+tuple against a sheet. Effects are plain data, so they can be
+inspected, totalled and pickled.
+
+Operations
+----------
+improve
+	sheet.target[key].improve()
+add
+	sheet.target[key] += value; with key None,
+	sheet.target += value
+set
+	sheet.target[key] = value
+die
+	sheet.target[key] = DieType(value)
+append
+	sheet.target.append(value)
+union
+	Append each item of value to sheet.target unless it is
+	already present
+skill
+	sheet.skills[key]['level'] += value
+call
+	value(sheet); escape hatch for behaviour that cannot be
+	expressed as data. Not picklable.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from collections import defaultdict, namedtuple
+from .dietype import DieType
+
+Effect = namedtuple("Effect",["op","target","key","value"])
+
+OPERATIONS = ("improve","add","set","die","append","union","skill","call")
+
+
+def improve(target,key) -> Effect:
+	"""Improve the DieType at sheet.target[key] by one category"""
+	return Effect("improve",target,key,None)
+
+def add(target,key,n) -> Effect:
+	"""Add n to sheet.target[key], or to sheet.target if key is None"""
+	return Effect("add",target,key,n)
+
+def setValue(target,key,value) -> Effect:
+	"""Set sheet.target[key] to value"""
+	return Effect("set",target,key,value)
+
+def newDie(target,key,sides) -> Effect:
+	"""Set sheet.target[key] to a fresh DieType with the given sides"""
+	return Effect("die",target,key,sides)
+
+def append(target,value) -> Effect:
+	"""Append value to the list sheet.target"""
+	return Effect("append",target,None,value)
+
+def union(target,values) -> Effect:
+	"""Append each of values to sheet.target unless already present"""
+	return Effect("union",target,None,tuple(values))
+
+def addSkill(skill,n=1) -> Effect:
+	"""Raise the level of a skill by n"""
+	return Effect("skill","skills",skill,n)
+
+def call(function) -> Effect:
+	"""Wrap an arbitrary function of the character sheet"""
+	return Effect("call",None,None,function)
+
+
+def applyEffects(ops,character_sheet) -> None:
+	"""Apply a sequence of Effects to a character sheet, in order"""
+	for op, target, key, value in ops:
+		if op == "append":
+			getattr(character_sheet,target).append(value)
+		elif op == "add":
+			if key is None:
+				setattr(character_sheet,target,getattr(character_sheet,target) + value)
+			else:
+				getattr(character_sheet,target)[key] += value
+		elif op == "set":
+			getattr(character_sheet,target)[key] = value
+		elif op == "skill":
+			character_sheet.skills[key]['level'] += value
+		elif op == "improve":
+			getattr(character_sheet,target)[key].improve()
+		elif op == "die":
+			getattr(character_sheet,target)[key] = DieType(value)
+		elif op == "union":
+			current = getattr(character_sheet,target)
+			for v in value:
+				if v not in current:
+					current.append(v)
+		elif op == "call":
+			value(character_sheet)
+		else:
+			raise ValueError(f"Unknown effect operation '{op}'")
+
+
+def totals(ops) -> dict:
+	"""Sum the numeric effects in a sequence of Effects
+
+	Returns a dictionary mapping (target, key) to the total
+	amount added by 'add' and 'skill' effects, and the number
+	of times each (target, key) is improved by 'improve'
+	effects. Useful for comparing what different choices or
+	paths grant.
+	"""
+	summed = defaultdict(int)
+	for op, target, key, value in ops:
+		if op in ("add","skill"):
+			summed[(target,key)] += value
+		elif op == "improve":
+			summed[(target,key)] += 1
+	return dict(summed)
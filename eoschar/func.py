@@ -2,12 +2,150 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-import json
+import hashlib, json, threading
+
+RESOURCES = os.path.join(os.path.dirname(os.path.dirname(__file__)),"resources")
+
+
+class FrozenDict(dict):
+	"""A read-only dictionary handed out by ModelRegistry
+
+	Any attempt to mutate it raises TypeError. Copying returns the
+	same object, since there is nothing to protect; pickling writes
+	a plain dict.
+	"""
+	def _readOnly(self,*args,**kwargs):
+		raise TypeError("Model data is read-only; copy it before editing")
+
+	__setitem__ = __delitem__ = _readOnly
+	clear = pop = popitem = setdefault = update = _readOnly
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self,memo):
+		return self
+
+	def __reduce__(self):
+		return (dict,(dict(self),))
+
+
+def freeze(obj):
+	"""Recursively convert parsed JSON into read-only containers
+
+	dicts become FrozenDict and lists become tuples.
+	"""
+	if isinstance(obj,dict):
+		return FrozenDict((k,freeze(v)) for k,v in obj.items())
+	elif isinstance(obj,list):
+		return tuple(freeze(v) for v in obj)
+	return obj
+
+
+class ModelRegistry:
+	"""Process-wide cache of the JSON models in resources/
+
+	Each model file is parsed once and handed out as a read-only
+	view (see freeze). On every lookup the file is stat'ed; if its
+	mtime or size has changed the file is re-read, and only re-parsed
+	if its content hash differs from the cached one.
+
+	***
+
+	Attributes
+	----------
+	directory: str
+		Folder containing the model files
+	hits: int
+		Number of lookups answered from the cache
+	misses: int
+		Number of lookups that had to parse a file
+
+	Methods
+	-------
+	get: FrozenDict or tuple
+		Return the parsed contents of a model file
+	prime: None
+		Seed the cache with an already-parsed model
+	stats: dict
+		Return hit / miss counters and cached file names
+	clear: None
+		Drop all cached models and reset counters
+	"""
+	def __init__(self,directory=RESOURCES):
+		self.directory = directory
+		self.hits = 0
+		self.misses = 0
+		self._entries = {} # file_name : (mtime_ns, size, sha1, model)
+		self._lock = threading.Lock()
+
+	def __repr__(self):
+		return f"<Instance of ModelRegistry | {len(self._entries)} models, {self.hits} hits, {self.misses} misses>"
+
+	def get(self,file_name):
+		"""Return the read-only parsed contents of file_name
+
+		***
+
+		Parameters
+		----------
+		file_name: str
+			Name of a file in self.directory, e.g.
+			'model_weapons.json'
+		"""
+		modelFile = os.path.join(self.directory,file_name)
+		st = os.stat(modelFile)
+		with self._lock:
+			entry = self._entries.get(file_name)
+			if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+				self.hits += 1
+				return entry[3]
+			with open(modelFile,'rb') as rf:
+				raw = rf.read()
+			digest = hashlib.sha1(raw).hexdigest()
+			if entry is not None and entry[2] == digest:
+				# touched but unchanged
+				self._entries[file_name] = (st.st_mtime_ns,st.st_size,digest,entry[3])
+				self.hits += 1
+				return entry[3]
+			log.debug(f"Parsing {file_name}")
+			model = freeze(json.loads(raw.decode('utf-8').replace('/u2019',"'")))
+			self._entries[file_name] = (st.st_mtime_ns,st.st_size,digest,model)
+			self.misses += 1
+			return model
+
+	def prime(self,file_name,mtime_ns,size,digest,model) -> None:
+		"""Seed the cache with an already-parsed model
+
+		Used by eoschar.bundle to load every model from a single
+		precompiled file. The entry is validated like any other on
+		its next lookup.
+		"""
+		with self._lock:
+			self._entries[file_name] = (mtime_ns,size,digest,freeze(model))
+
+	def stats(self) -> dict:
+		"""Return hit / miss counters and cached file names"""
+		return {"hits":self.hits,"misses":self.misses,"models":sorted(self._entries.keys())}
+
+	def clear(self) -> None:
+		"""Drop all cached models and reset counters"""
+		with self._lock:
+			self._entries = {}
+			self.hits = 0
+			self.misses = 0
+
+
+MODELS = ModelRegistry()
+
 
 def getModel(file_name):
-	modelFile = os.path.join(os.path.dirname(os.path.dirname(__file__)),"resources",file_name)
-	with open(modelFile,'r') as rf:
-		return json.loads(rf.read().replace('/u2019',"'"))
+	"""Return the read-only contents of a model file in resources/
+
+	Served from the process-wide MODELS registry, so each file is
+	only parsed once.
+	"""
+	return MODELS.get(file_name)
 
 def getYesNo(message:str) -> bool:
 	response = input(message+"\n[Y/N]: ")
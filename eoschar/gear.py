@@ -0,0 +1,215 @@
+"""Gear: the shared catalog and a character's inventory
+
+Potions, grenades, ammunition, kits, weapons and weapon modifications
+are read from their model files once per process into a GearCatalog,
+which every AssignAbstractGear refers to instead of keeping its own
+lists. Nothing in it can be changed, so it is safe to share between
+characters and choice trees.
+
+A character's non-weapon gear is a GearInventory, a count per item
+name. Gear given by the choice trees as text ("3 Smoke Grenade") is
+split into name and count once, when the choice compiles its effects
+(see parseGear); the sheet's lines ("Smoke Grenade (3)") are only
+formatted when shown or saved.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from functools import lru_cache
+from .func import getModel, FrozenDict
+from .weapon import modificationCatalog
+
+LEVELS = ("A","B","C")
+KINDS = ("potions","modifications","grenades","ammunition","weapons","kits")
+# gear always listed with a count on the sheet, even (1)
+COUNTED_KINDS = ("potions","ammunition","grenades")
+
+
+class GearCatalog:
+	"""Read-only index of every concrete gear item
+
+	***
+
+	Attributes
+	----------
+	by_level: FrozenDict
+		Kind : {level : tuple of items}, for each of KINDS.
+		Weapons are grouped by variety ("Ranged", "Melee")
+		rather than level. Items are names, except weapons
+		(model profiles) and modifications (Modification)
+	by_name: FrozenDict
+		Kind : {name : item}
+	kinds: FrozenDict
+		Name : kind, the first of KINDS with an item of that name
+	counted: frozenset
+		Names of the COUNTED_KINDS items
+
+	Methods
+	-------
+	levels: FrozenDict
+		Level : items of one kind
+	find: object
+		An item by kind and name
+	"""
+	def __init__(self,catalog=None):
+		by_level = {kind:{level:[] for level in LEVELS} for kind in KINDS}
+		by_level["weapons"] = {"Ranged":[],"Melee":[]}
+		for p in getModel('model_potions.json'):
+			by_level["potions"][p['level']].append(p['name'])
+		for modification in (modificationCatalog() if catalog is None else catalog).values():
+			by_level["modifications"][modification.level].append(modification)
+		for kind in ("grenades","ammunition","kits"):
+			for level, items in getModel(f'model_{kind}.json').items():
+				by_level[kind][level] = items
+		for weapon in getModel('model_weapons.json').values():
+			if weapon['range'] > 0:
+				by_level["weapons"]["Ranged"].append(weapon)
+			elif weapon['reach'] > 0:
+				by_level["weapons"]["Melee"].append(weapon)
+		self.__dict__["by_level"] = FrozenDict(
+			(kind,FrozenDict((level,tuple(items)) for level,items in levels.items()))
+			for kind,levels in by_level.items()
+		)
+		self.__dict__["by_name"] = FrozenDict(
+			(kind,FrozenDict((self._name(item),item) for items in levels.values() for item in items))
+			for kind,levels in self.by_level.items()
+		)
+		self.__dict__["kinds"] = FrozenDict(
+			(name,kind) for kind in reversed(KINDS) for name in self.by_name[kind]
+		)
+		self.__dict__["counted"] = frozenset(name for kind in COUNTED_KINDS for name in self.by_name[kind])
+
+	def __repr__(self):
+		return f"<Instance of GearCatalog | {sum(len(names) for names in self.by_name.values())} items>"
+
+	def __setattr__(self,name,value):
+		raise TypeError("The gear catalog is read-only")
+
+	@staticmethod
+	def _name(item) -> str:
+		if isinstance(item,str):
+			return item
+		try:
+			return item.name
+		except AttributeError:
+			return item['name']
+
+	def levels(self,kind) -> FrozenDict:
+		"""Return {level : tuple of items} for one of KINDS"""
+		return self.by_level[kind]
+
+	def find(self,kind,name):
+		"""Return the item of kind called name, or None"""
+		return self.by_name[kind].get(name)
+
+
+@lru_cache(maxsize=1)
+def gearCatalog() -> GearCatalog:
+	"""Return the catalog for the loaded rules, built on first use"""
+	return GearCatalog()
+
+
+def parseGear(text) -> tuple:
+	"""Split gear text with an optional leading count, e.g. "3 Smoke Grenade", into (name, count)"""
+	parts = text.split()
+	try:
+		return " ".join(parts[1:]), int(parts[0])
+	except ValueError:
+		return " ".join(parts), 1
+
+
+class GearInventory:
+	"""A character's non-weapon gear, counted by item name
+
+	Choices add to it through 'add' effects on the sheet's gear
+	field (inventory[name] += n). Which catalog kind an item is
+	decides how it is shown: potions, ammunition and grenades
+	always carry a count.
+
+	***
+
+	Attributes
+	----------
+	counts: dict
+		Item name : number held, in the order first added
+
+	Methods
+	-------
+	add: None
+		Add n of an item
+	kind: str
+		The catalog kind of an item, or None
+	lines: list
+		The sheet's gear lines, sorted
+	fromLines: GearInventory
+		Rebuild an inventory from its lines
+	"""
+	def __init__(self,counts=None):
+		self._counts = {} if counts is None else dict(counts)
+		# sorted lines, kept until the counts change
+		self._lines = None
+
+	def __repr__(self):
+		return f"<Instance of GearInventory | {len(self)} items, {sum(self.counts.values())} in all>"
+
+	@property
+	def counts(self) -> dict:
+		if self._counts is None:
+			# read from lines; see fromLines
+			self._counts = {}
+			for line in self._lines:
+				name, bracket, n = line[:-1].rpartition(" (")
+				if line.endswith(")") and bracket and n.isdigit():
+					self._counts[name] = self._counts.get(name,0) + int(n)
+				else:
+					self._counts[line] = self._counts.get(line,0) + 1
+		return self._counts
+
+	def __len__(self):
+		return len(self.counts)
+
+	def __iter__(self):
+		return iter(self.counts)
+
+	def __contains__(self,name):
+		return name in self.counts
+
+	def __getitem__(self,name) -> int:
+		return self.counts.get(name,0)
+
+	def __setitem__(self,name,n):
+		self.counts[name] = n
+		self._lines = None
+
+	def __eq__(self,other):
+		return isinstance(other,GearInventory) and self.counts == other.counts
+
+	def items(self):
+		return self.counts.items()
+
+	def add(self,name,n=1) -> None:
+		self[name] += n
+
+	def kind(self,name) -> str:
+		"""Return the GearCatalog kind of an item, or None for other gear"""
+		return gearCatalog().kinds.get(name)
+
+	def lines(self) -> list:
+		"""Return the gear as shown on the sheet, e.g. "Smoke Grenade (3)", sorted"""
+		if self._lines is None:
+			counted = gearCatalog().counted
+			self._lines = sorted(
+				f"{name} ({n})" if n > 1 or name in counted else name
+				for name, n in self._counts.items()
+			)
+		return self._lines
+
+	@classmethod
+	def fromLines(cls,lines):
+		"""Return the inventory shown as lines; counts are only read back when needed"""
+		inventory = cls()
+		inventory._counts = None
+		inventory._lines = sorted(lines)
+		return inventory
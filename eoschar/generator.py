@@ -0,0 +1,211 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import random, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .charactersheet import CharacterSheet
+from .func import getModel
+from .options import cloneTrees
+from .weapon import asWeapon
+from .weapontable import weaponTable
+
+
+def _walkTree(node,character_sheet,rng) -> bool:
+	"""Randomly descend a choice tree, applying each selection
+
+	Only children whose prerequisites are met are offered. The
+	position of each selection is recorded in treePath, exactly
+	as Interface.runTree does.
+	"""
+	while len(node.children) > 0:
+		legal = [j for j,child in enumerate(node.children) if child.checkPrerequisites(character_sheet)]
+		if len(legal) == 0:
+			log.warning(f"No legal options under {node.name}")
+			return False
+		j = rng.choice(legal)
+		node = node.children[j]
+		character_sheet.treePath.append(j)
+		character_sheet.apply(node)
+		character_sheet.data.append(node)
+	return True
+
+
+def _spendPoints(node,rng) -> None:
+	"""Randomly spend all the points of a loaded PointBuy"""
+	while node.current_points > 0:
+		affordable = []
+		for name, levels in node.categories.items():
+			level = levels['bought_levels'] + levels['base_levels']
+			if level < node.max_level and node.points_per_level[level+1] <= node.current_points:
+				affordable.append(name)
+		if len(affordable) == 0:
+			return
+		node.levelUp(rng.choice(affordable))
+
+
+def _buySkills(node,character_sheet,rng) -> None:
+	node.load(character_sheet.skills)
+	_spendPoints(node,rng)
+
+
+def _buyTrivia(node,character_sheet,rng,topics) -> None:
+	node.load(character_sheet.trivia)
+	# trivia categories only exist once touched
+	for topic in topics:
+		node.categories[topic]
+	_spendPoints(node,rng)
+
+
+def _assignGear(node,character_sheet,rng) -> None:
+	"""Randomly convert abstract gear into concrete gear
+
+	Mirrors the 'Assign Abstract Gear' step of Interface.runTree.
+	"""
+	node.assign(character_sheet)
+	# abstract weapons -> raw weapons
+	for variety in node.abstract_weapons.keys():
+		if variety == "Any":
+			weaponOptions = node.ref_weapons["Melee"]+node.ref_weapons["Ranged"]
+		else:
+			weaponOptions = node.ref_weapons[variety]
+		while node.abstract_weapons[variety] > 0:
+			node.raw_weapons.append(rng.choice(weaponOptions))
+			node.abstract_weapons[variety] -= 1
+	# raw weapons -> Weapon objects; profiles shared with the
+	# choice trees are copied before being modified
+	weapons = []
+	for w in node.raw_weapons:
+		weapons.append(asWeapon(w))
+	# spread modifications over whichever weapons can take them
+	table = weaponTable()
+	while True:
+		legal = []
+		fitting = [table.options(weapon) for weapon in weapons]
+		for level, n in node.abstract_modifications.items():
+			if n < 1:
+				continue
+			for mod in node.ref_modifications[level]:
+				for weapon, options in zip(weapons,fitting):
+					if mod in options:
+						legal.append((mod,weapon))
+		if len(legal) == 0:
+			break
+		mod, weapon = rng.choice(legal)
+		if mod.apply(weapon):
+			node.abstract_modifications[mod.level] -= 1
+	node.weapons += weapons
+	# everything else is a pick from a list
+	for owed, options in [
+		(node.abstract_ammunition,node.ref_ammunition),
+		(node.abstract_potions,node.ref_potions),
+		(node.abstract_grenades,node.ref_grenades),
+		(node.abstract_kits,node.ref_kits)
+		]:
+		for level in owed.keys():
+			if owed[level] > 0 and len(options.get(level,[])) == 0:
+				log.warning(f"No level {level} options to assign; skipping")
+				continue
+			while owed[level] > 0:
+				node.gear.append(rng.choice(options[level]))
+				owed[level] -= 1
+
+
+def randomCharacter(rng=None,name="Random Character",motivation="") -> CharacterSheet:
+	"""Create a complete, rules-legal character without user input
+
+	Walks a private copy of the choice trees in the same order as
+	Interface.createNewCharacter, making every selection with rng.
+
+	***
+
+	Parameters
+	----------
+	rng: random.Random
+		Source of randomness. Defaults to a new, unseeded
+		random.Random.
+	name: str
+	motivation: str
+	"""
+	rng = random.Random() if rng is None else rng
+	sheet = CharacterSheet()
+	sheet.options = cloneTrees()
+	for tree in sheet.options:
+		if tree.name == "Skills":
+			_buySkills(tree,sheet,rng)
+		elif tree.name == "Trivia":
+			_buyTrivia(tree,sheet,rng,getModel('model_trivia.json'))
+		elif tree.name in ["Name","Motivation"]:
+			tree.value = name if tree.name == "Name" else motivation
+		elif tree.name == "Assign Abstract Gear":
+			_assignGear(tree,sheet,rng)
+		else:
+			_walkTree(tree,sheet,rng)
+			continue
+		sheet.apply(tree)
+		sheet.data.append(tree)
+	sheet.filled = True
+	sheet.flush()
+	return sheet
+
+
+def _generateBatch(seed,start,stop,out_dir,prefix) -> list:
+	"""Generate and save characters start..stop-1; runs in a worker"""
+	paths = []
+	for i in range(start,stop):
+		rng = random.Random(f"{seed}:{i}")
+		path = os.path.join(out_dir,f"{prefix}{i:06d}.txt")
+		try:
+			sheet = randomCharacter(rng,name=f"{prefix}{i:06d}")
+			if sheet.save(path):
+				paths.append(path)
+		except:
+			log.exception(f"Failed to generate character {i}")
+	return paths
+
+
+def generate(count,out_dir,seed=0,jobs=None,batch_size=100,prefix="character_") -> int:
+	"""Generate and save many random characters, in parallel
+
+	Character i is always built from the same random stream,
+	random.Random(f"{seed}:{i}"), so the output does not depend
+	on the number of jobs. Each save is written by the worker
+	that built it as soon as it is done.
+
+	Returns the number of characters saved.
+
+	***
+
+	Parameters
+	----------
+	count: int
+		Number of characters to generate
+	out_dir: str
+		Directory for the saved characters; created if it
+		does not exist
+	seed: int
+	jobs: int
+		Number of worker processes. Defaults to the number
+		of CPUs; 1 runs everything in this process.
+	batch_size: int
+		Characters generated per worker task
+	prefix: str
+		File name (and character name) prefix
+	"""
+	os.makedirs(out_dir,exist_ok=True)
+	jobs = os.cpu_count() if jobs is None else jobs
+	batches = [(seed,start,min(start+batch_size,count),out_dir,prefix) for start in range(0,count,batch_size)]
+	written = 0
+	t0 = time.perf_counter()
+	if jobs <= 1:
+		for batch in batches:
+			written += len(_generateBatch(*batch))
+	else:
+		with ProcessPoolExecutor(max_workers=jobs) as executor:
+			futures = [executor.submit(_generateBatch,*batch) for batch in batches]
+			for future in as_completed(futures):
+				written += len(future.result())
+				log.debug(f"{written}/{count} characters saved")
+	elapsed = time.perf_counter() - t0
+	log.info(f"Saved {written} of {count} characters to {out_dir} in {elapsed:.1f}s")
+	return written
@@ -0,0 +1,144 @@
+"""Decoded image cache
+
+FPDF parses PNG files in pure Python; the sheet logo takes about a
+third of a second. Decoded images (dimensions, colour space, palette and the
+deflated image and alpha streams, exactly as FPDF stores them) are
+kept per process, and in a sidecar file next to the image so that
+other processes, such as render workers, never decode it again. The
+image streams are already compressed, so FPDF embeds them as they
+are.
+
+Sidecar layout: MAGIC, a 2-byte format version, the 40-character
+hex key of the image and FPDF version, then a marshal'ed payload
+dictionary. A sidecar whose key does not match its image is
+ignored and rewritten.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import hashlib, marshal
+import fpdf
+from fpdf import FPDF
+from .func import RESOURCES
+
+
+MAGIC = b"EOSI"
+FORMAT_VERSION = 1
+SIDECAR_SUFFIX = ".decoded"
+HEADER_LENGTH = len(MAGIC) + 2 + 40
+LOGO_PATH = os.path.join(RESOURCES,"shrike_logo_1.png")
+
+# path : (PDF version the image needs, FPDF image info without 'i')
+_decoded = {}
+
+
+def sidecarPath(path) -> str:
+	return path + SIDECAR_SUFFIX
+
+
+def _imageKey(digest) -> str:
+	return hashlib.sha1(f"{fpdf.FPDF_VERSION}:{digest}".encode()).hexdigest()
+
+
+def _decode(path) -> tuple:
+	"""Parse an image with FPDF, returning (pdf_version, info)"""
+	pdf = FPDF()
+	extension = os.path.splitext(path)[1].lower()
+	if extension in (".jpg",".jpeg"):
+		info = pdf._parsejpg(path)
+	elif extension == ".png":
+		info = pdf._parsepng(path)
+	else:
+		info = pdf._parsegif(path)
+	return pdf.pdf_version, info
+
+
+def _readSidecar(path,st):
+	"""Return (pdf_version, info) from path's sidecar, or None if missing or stale"""
+	try:
+		with open(sidecarPath(path),'rb') as rf:
+			raw = rf.read()
+	except FileNotFoundError:
+		return None
+	if raw[:len(MAGIC)] != MAGIC or int.from_bytes(raw[len(MAGIC):len(MAGIC)+2],'little') != FORMAT_VERSION:
+		log.warning(f"{sidecarPath(path)} is not a version {FORMAT_VERSION} image cache; ignoring it")
+		return None
+	try:
+		key = raw[len(MAGIC)+2:HEADER_LENGTH].decode('ascii')
+		payload = marshal.loads(raw[HEADER_LENGTH:])
+	except (EOFError,ValueError,TypeError):
+		log.warning(f"{sidecarPath(path)} is corrupt; ignoring it")
+		return None
+	# stat first, hash only if the image looks changed
+	mtime_ns, size, digest = payload['source']
+	if mtime_ns != st.st_mtime_ns or size != st.st_size:
+		with open(path,'rb') as rf:
+			digest = hashlib.sha1(rf.read()).hexdigest()
+	if _imageKey(digest) != key:
+		log.debug(f"Image cache {sidecarPath(path)} is stale")
+		return None
+	return payload['pdf_version'], payload['info']
+
+
+def _writeSidecar(path,st,pdf_version,info) -> bool:
+	with open(path,'rb') as rf:
+		digest = hashlib.sha1(rf.read()).hexdigest()
+	payload = {
+		"source":(st.st_mtime_ns,st.st_size,digest),
+		"pdf_version":pdf_version,
+		"info":info
+	}
+	out_path = sidecarPath(path)
+	tmp_path = f"{out_path}.{os.getpid()}.tmp"
+	try:
+		with open(tmp_path,'wb') as wf:
+			wf.write(MAGIC)
+			wf.write(FORMAT_VERSION.to_bytes(2,'little'))
+			wf.write(_imageKey(digest).encode('ascii'))
+			wf.write(marshal.dumps(payload))
+		os.replace(tmp_path,out_path)
+	except OSError:
+		# e.g. a read-only install; the image is still cached in this process
+		log.debug(f"Could not write image cache {out_path}")
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+		return False
+	return True
+
+
+def decodedImage(path) -> tuple:
+	"""Return (pdf_version, info) for an image, decoding it at most once
+
+	Looks in the process cache, then the sidecar file, and only
+	then parses the image, writing a new sidecar. info is shared:
+	copy it before handing it to a document.
+
+	***
+
+	Parameters
+	----------
+	path: str
+		Path to a PNG, JPEG or GIF file
+	"""
+	if path not in _decoded:
+		st = os.stat(path)
+		decoded = _readSidecar(path,st)
+		if decoded is None:
+			decoded = _decode(path)
+			_writeSidecar(path,st,*decoded)
+		_decoded[path] = decoded
+	return _decoded[path]
+
+
+def placeImage(pdf,path,x=None,y=None,w=0,h=0,link='') -> None:
+	"""Draw an image exactly as pdf.image would, without decoding it again"""
+	if path not in pdf.images:
+		pdf_version, info = decodedImage(path)
+		info = dict(info)
+		info['i'] = len(pdf.images)+1
+		pdf.images[path] = info
+		if pdf.pdf_version < pdf_version:
+			pdf.pdf_version = pdf_version
+	pdf.image(path,x,y,w,h,link=link)
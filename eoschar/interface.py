@@ -6,10 +6,10 @@ import importlib, sys
 from collections import namedtuple
 from .func import getYesNo
 from .charactersheet import CharacterSheet
-from .choice import Choice, Weapon
-from .options import buildTrees
-
-TREES = buildTrees()
+from .choice import Choice
+from .weapon import asWeapon
+from .weapontable import weaponTable
+from .options import cloneTrees
 
 
 PROMPT = "# "
@@ -231,12 +231,9 @@ class Interface:
 				## TODO
 				print("Assign modifications.")
 				for w in node.raw_weapons:
-					try:
-						weapon = Weapon(**w)
-					# sometimes a weapon object sneaks in?
-					except TypeError:
-						log.debug(type(w))
-						weapon = w
+					# w is a model profile or a Weapon shared
+					# with the choice trees
+					weapon = asWeapon(w)
 					more = True
 					while more:
 						# if there are no mods left
@@ -259,9 +256,7 @@ class Interface:
 								more = False
 								continue
 							print(f"Choose a level {levelSelection} modification to add to your {weapon.name}:")
-							modOptions = None
-							modOptions = node.ref_modifications[levelSelection]
-							modOptions = [m for m in modOptions if any([(p == weapon.type) for p in m.prerequisites])]
+							modOptions = list(weaponTable().options(weapon,levelSelection))
 							modOptions.append("No modification")
 							i,modSelection = chooseOne(modOptions)
 							if modSelection == False:
@@ -353,9 +348,9 @@ class Interface:
 	def createNewCharacter(self)->bool:
 		"""Walks user through the steps of creating a new character from scratch"""
 		self.sheet = CharacterSheet()
-		TREES = buildTrees()
+		self.sheet.options = cloneTrees()
 		print("Creating new character from scratch.\n\nYou will be guided through the steps of character creations. At each step, you will be presented with a series of options.\nTo exit character creator, enter 'exit'")
-		for tree in TREES:
+		for tree in self.sheet.options:
 			if self.runTree(tree,self.sheet) == False:
 				print("Aborted character creation.")
 				return
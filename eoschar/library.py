@@ -0,0 +1,334 @@
+"""SQLite library of saved characters
+
+CharacterLibrary ingests save files into a local SQLite database, one
+row per file, with the selections, qualities, skill levels and
+weapons of each character in indexed tables. Queries are answered
+from the database and never load a save, e.g.
+
+	library = CharacterLibrary("library.db")
+	library.add(["saves/"],jobs=4)
+	library.find(species="Elek",focus="Healer",skills={"Heal":3})
+
+Ingestion is incremental: a file whose size and modification time
+match its row is skipped without being read, and one whose contents
+hash the same is only re-stamped. Changed and new files are read in
+parallel by worker processes; all writes happen in this process.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import glob, hashlib, sqlite3, time
+from concurrent.futures import ProcessPoolExecutor
+from .charactersheet import CharacterSheet
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+	id INTEGER PRIMARY KEY,
+	path TEXT UNIQUE NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	size INTEGER NOT NULL,
+	sha1 TEXT NOT NULL,
+	name TEXT,
+	motivation TEXT,
+	species TEXT,
+	background TEXT,
+	training TEXT,
+	focus TEXT,
+	combat_specialty TEXT,
+	money INTEGER,
+	av INTEGER,
+	toughness INTEGER,
+	shooting_die INTEGER,
+	fighting_die INTEGER
+);
+CREATE TABLE IF NOT EXISTS qualities (
+	character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+	quality TEXT NOT NULL,
+	die INTEGER NOT NULL,
+	PRIMARY KEY (character_id, quality)
+);
+CREATE TABLE IF NOT EXISTS skills (
+	character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+	skill TEXT NOT NULL,
+	level INTEGER NOT NULL,
+	PRIMARY KEY (character_id, skill)
+);
+CREATE TABLE IF NOT EXISTS weapons (
+	character_id INTEGER NOT NULL REFERENCES characters(id) ON DELETE CASCADE,
+	position INTEGER NOT NULL,
+	name TEXT NOT NULL,
+	type TEXT NOT NULL,
+	range INTEGER,
+	reach INTEGER,
+	accuracy INTEGER,
+	ap INTEGER,
+	heavy INTEGER,
+	modifications TEXT,
+	PRIMARY KEY (character_id, position)
+);
+CREATE INDEX IF NOT EXISTS characters_name ON characters(name);
+CREATE INDEX IF NOT EXISTS characters_species ON characters(species);
+CREATE INDEX IF NOT EXISTS characters_background ON characters(background);
+CREATE INDEX IF NOT EXISTS characters_training ON characters(training);
+CREATE INDEX IF NOT EXISTS characters_focus ON characters(focus);
+CREATE INDEX IF NOT EXISTS characters_combat_specialty ON characters(combat_specialty);
+CREATE INDEX IF NOT EXISTS qualities_die ON qualities(quality, die);
+CREATE INDEX IF NOT EXISTS skills_level ON skills(skill, level);
+CREATE INDEX IF NOT EXISTS weapons_name ON weapons(name);
+CREATE INDEX IF NOT EXISTS weapons_type ON weapons(type);
+"""
+# find() keyword : characters column
+CHOICE_COLUMNS = {
+	"name":"name",
+	"species":"species",
+	"background":"background",
+	"training":"training",
+	"focus":"focus",
+	"combat_specialty":"combat_specialty"
+}
+LIST_COLUMNS = ("path","name","species","background","training","focus","combat_specialty")
+
+
+def _fileDigest(path) -> str:
+	with open(path,'rb') as rf:
+		return hashlib.sha1(rf.read()).hexdigest()
+
+
+def _readCharacter(path) -> dict:
+	"""Load one save and pull out everything the library indexes"""
+	sheet = CharacterSheet()
+	if not sheet.load(path):
+		raise ValueError(f"Could not load {path}")
+	names = sheet.choice_names
+	return {
+		"name":names["Name"],
+		"motivation":names["Motivation"],
+		"species":names["Species"],
+		"background":names["Background"],
+		"training":names["Training"],
+		"focus":names["Focus"],
+		"combat_specialty":names["Combat Specialty"],
+		"money":sheet.money,
+		"av":sheet.combat_stats["AV"],
+		"toughness":sheet.combat_stats["Toughness"],
+		"shooting_die":int(sheet.combat_stats["Shooting Die"]),
+		"fighting_die":int(sheet.combat_stats["Fighting Die"]),
+		"qualities":{q:int(die) for q,die in sheet.qualities.items()},
+		"skills":{s:v["level"] for s,v in sheet.skills.items()},
+		"weapons":[(w.name,w.type,w.range,w.reach,w.accuracy,w.ap,int(bool(w.heavy)),", ".join(m for level in ("A","B","C") for m in w.modifications[level])) for w in sheet.weapons]
+	}
+
+
+def _readFiles(files) -> list:
+	"""Read a batch of (path, mtime_ns, size, known sha1); runs in a worker
+
+	Returns (path, mtime_ns, size, sha1, character) for each file,
+	where character is None if the contents are unchanged (sha1
+	matches the known one) or the file could not be read (sha1
+	is None too).
+	"""
+	results = []
+	for path, mtime_ns, size, known in files:
+		try:
+			sha1 = _fileDigest(path)
+			character = None if sha1 == known else _readCharacter(path)
+		except:
+			log.exception(f"Failed to read {path}")
+			sha1, character = None, None
+		results.append((path,mtime_ns,size,sha1,character))
+	return results
+
+
+class CharacterLibrary:
+	"""Indexed SQLite database of saved characters
+
+	***
+
+	Attributes
+	----------
+	db_path: str
+		Path of the database file; created if missing
+	connection: sqlite3.Connection
+
+	Methods
+	-------
+	add: dict
+		Ingest save files, skipping unchanged ones
+	remove: int
+		Drop characters whose files no longer exist
+	find: list
+		Characters matching selections, qualities, skills
+		and weapons
+	list: list
+		Every character in the library
+	close: None
+	"""
+	def __init__(self,db_path="library.db"):
+		self.db_path = db_path
+		self.connection = sqlite3.connect(db_path)
+		self.connection.row_factory = sqlite3.Row
+		self.connection.execute("PRAGMA foreign_keys = ON")
+		version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+		if version not in (0,SCHEMA_VERSION):
+			raise ValueError(f"{db_path} is a version {version} library; this eoschar reads version {SCHEMA_VERSION}")
+		with self.connection:
+			self.connection.executescript(SCHEMA)
+			self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+	def __repr__(self):
+		return f"<Instance of CharacterLibrary | {len(self)} characters in {self.db_path}>"
+
+	def __len__(self):
+		return self.connection.execute("SELECT COUNT(*) FROM characters").fetchone()[0]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+	def close(self) -> None:
+		self.connection.close()
+
+	@staticmethod
+	def _expand(paths,pattern) -> list:
+		"""Save files named by paths; directories contribute files matching pattern"""
+		files = []
+		for path in paths:
+			if os.path.isdir(path):
+				files += sorted(glob.glob(os.path.join(path,pattern)))
+			else:
+				files.append(path)
+		return [os.path.abspath(f) for f in files]
+
+	def _store(self,path,mtime_ns,size,sha1,character) -> None:
+		self.connection.execute("DELETE FROM characters WHERE path = ?",(path,))
+		cursor = self.connection.execute(
+			"INSERT INTO characters (path,mtime_ns,size,sha1,name,motivation,species,background,training,focus,combat_specialty,money,av,toughness,shooting_die,fighting_die) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+			(path,mtime_ns,size,sha1,character["name"],character["motivation"],character["species"],character["background"],character["training"],character["focus"],character["combat_specialty"],character["money"],character["av"],character["toughness"],character["shooting_die"],character["fighting_die"])
+		)
+		character_id = cursor.lastrowid
+		self.connection.executemany("INSERT INTO qualities VALUES (?,?,?)",[(character_id,q,die) for q,die in character["qualities"].items()])
+		self.connection.executemany("INSERT INTO skills VALUES (?,?,?)",[(character_id,s,level) for s,level in character["skills"].items()])
+		self.connection.executemany("INSERT INTO weapons VALUES (?,?,?,?,?,?,?,?,?,?)",[(character_id,i)+w for i,w in enumerate(character["weapons"])])
+
+	def add(self,paths,jobs=1,pattern="*.txt",batch_size=100) -> dict:
+		"""Ingest save files, re-reading only those that changed
+
+		Returns a summary dictionary with keys 'added',
+		'updated', 'unchanged' and 'failed' (list of paths).
+
+		***
+
+		Parameters
+		----------
+		paths: list
+			Save files and directories of save files
+		jobs: int
+			Number of worker processes; None for the number
+			of CPUs
+		pattern: str
+			Glob pattern for save files within directories
+		batch_size: int
+			Files read per worker task
+		"""
+		t0 = time.perf_counter()
+		known = {row["path"]:row for row in self.connection.execute("SELECT path, mtime_ns, size, sha1 FROM characters")}
+		summary = {"added":0,"updated":0,"unchanged":0,"failed":[]}
+		pending = []
+		for path in self._expand(paths,pattern):
+			try:
+				st = os.stat(path)
+			except OSError:
+				log.warning(f"Cannot read {path}")
+				summary["failed"].append(path)
+				continue
+			row = known.get(path)
+			if row is not None and row["mtime_ns"] == st.st_mtime_ns and row["size"] == st.st_size:
+				summary["unchanged"] += 1
+				continue
+			pending.append((path,st.st_mtime_ns,st.st_size,None if row is None else row["sha1"]))
+
+		batches = [pending[i:i+batch_size] for i in range(0,len(pending),batch_size)]
+		jobs = os.cpu_count() if jobs is None else jobs
+		if jobs <= 1 or len(batches) <= 1:
+			self._ingest(map(_readFiles,batches),known,summary)
+		else:
+			# the workers are shut down even if storing a batch fails
+			with ProcessPoolExecutor(max_workers=jobs) as executor:
+				self._ingest(executor.map(_readFiles,batches),known,summary)
+		log.info(f"Library {self.db_path}: {summary['added']} added, {summary['updated']} updated, {summary['unchanged']} unchanged, {len(summary['failed'])} failed in {time.perf_counter()-t0:.1f}s")
+		return summary
+
+	def _ingest(self,results,known,summary) -> None:
+		"""Store batches of _readFiles results in one transaction, counting them in summary"""
+		with self.connection:
+			for batch in results:
+				for path, mtime_ns, size, sha1, character in batch:
+					if sha1 is None:
+						summary["failed"].append(path)
+					elif character is None:
+						# same contents, new timestamp
+						self.connection.execute("UPDATE characters SET mtime_ns = ?, size = ? WHERE path = ?",(mtime_ns,size,path))
+						summary["unchanged"] += 1
+					else:
+						summary["updated" if path in known else "added"] += 1
+						self._store(path,mtime_ns,size,sha1,character)
+
+	def remove(self) -> int:
+		"""Drop every character whose save file no longer exists; returns how many"""
+		gone = [(row["path"],) for row in self.connection.execute("SELECT path FROM characters") if not os.path.exists(row["path"])]
+		with self.connection:
+			self.connection.executemany("DELETE FROM characters WHERE path = ?",gone)
+		return len(gone)
+
+	def find(self,qualities=None,skills=None,weapon=None,**selections) -> list:
+		"""Return the characters matching every given criterion
+
+		Each result is a dictionary of the characters table's
+		columns (path, name, species, background, ...), ordered
+		by name and path.
+
+		***
+
+		Parameters
+		----------
+		qualities: dict
+			Quality name : largest die code, e.g. {"Brawn":6}
+			for Brawn d6 or better
+		skills: dict
+			Skill name : lowest level, e.g. {"Heal":3}
+		weapon: str
+			Name or type of a weapon the character carries
+		**selections
+			Any of name, species, background, training,
+			focus, combat_specialty, matched exactly
+		"""
+		clauses = []
+		parameters = []
+		for key, value in selections.items():
+			if key not in CHOICE_COLUMNS:
+				raise TypeError(f"find() got an unexpected keyword argument '{key}'")
+			clauses.append(f"c.{CHOICE_COLUMNS[key]} = ?")
+			parameters.append(value)
+		for quality, die in (qualities or {}).items():
+			clauses.append("EXISTS (SELECT 1 FROM qualities q WHERE q.character_id = c.id AND q.quality = ? AND q.die <= ?)")
+			parameters += [quality,int(die)]
+		for skill, level in (skills or {}).items():
+			clauses.append("EXISTS (SELECT 1 FROM skills s WHERE s.character_id = c.id AND s.skill = ? AND s.level >= ?)")
+			parameters += [skill,level]
+		if weapon is not None:
+			clauses.append("EXISTS (SELECT 1 FROM weapons w WHERE w.character_id = c.id AND (w.name = ? OR w.type = ?))")
+			parameters += [weapon,weapon]
+		query = "SELECT c.* FROM characters c"
+		if len(clauses) > 0:
+			query += " WHERE " + " AND ".join(clauses)
+		query += " ORDER BY c.name, c.path"
+		return [dict(row) for row in self.connection.execute(query,parameters)]
+
+	def list(self) -> list:
+		"""Return every character in the library, ordered by name and path"""
+		return self.find()
@@ -7,6 +7,8 @@ from .choice import Choice, Species, Talent, Training, Focus, CombatSpecialty, B
 from .weapon import Weapon
 from .dietype import DieType
 from .func import getModel
+from .effect import improve, add, setValue, append
+from .treeindex import TreeIndex
 
 
 def buildTrees():
@@ -28,13 +30,13 @@ def buildTrees():
 	# 	# human.addChild(pwg)
 	# 	human.addChild(Trait(name=f"People of the Wandering God ({q})",description=f"Improve {q} die type by 1 (already included).",implementation=lambda character_sheet: character_sheet.qualities[f"{q}"].improve()))
 	### brawn
-	human.addChild(Trait(name=f"People of the Wandering God (Brawn)",description=f"Improve Brawn die type by 1 (already included).",implementation=lambda character_sheet: character_sheet.qualities["Brawn"].improve()))
+	human.addChild(Trait(name=f"People of the Wandering God (Brawn)",description=f"Improve Brawn die type by 1 (already included).",effects=[improve("qualities","Brawn")]))
 	### grace
-	human.addChild(Trait(name=f"People of the Wandering God (Grace)",description=f"Improve Grace die type by 1 (already included).",implementation=lambda character_sheet: character_sheet.qualities["Grace"].improve()))
+	human.addChild(Trait(name=f"People of the Wandering God (Grace)",description=f"Improve Grace die type by 1 (already included).",effects=[improve("qualities","Grace")]))
 	### wits
-	human.addChild(Trait(name=f"People of the Wandering God (Wits)",description=f"Improve Wits die type by 1 (already included).",implementation=lambda character_sheet: character_sheet.qualities["Wits"].improve()))
+	human.addChild(Trait(name=f"People of the Wandering God (Wits)",description=f"Improve Wits die type by 1 (already included).",effects=[improve("qualities","Wits")]))
 	### spirit
-	human.addChild(Trait(name=f"People of the Wandering God (Spirit)",description=f"Improve Spirit die type by 1 (already included).",implementation=lambda character_sheet: character_sheet.qualities["Spirit"].improve()))
+	human.addChild(Trait(name=f"People of the Wandering God (Spirit)",description=f"Improve Spirit die type by 1 (already included).",effects=[improve("qualities","Spirit")]))
 	## add as child to species
 	species.addChild(human)
 
@@ -88,13 +90,13 @@ def buildTrees():
 
 	# add individual talents
 	## brawn
-	talent.addChild(Talent(name="Brawn",implementation=lambda character_sheet: character_sheet.qualities["Brawn"].improve()))
+	talent.addChild(Talent(name="Brawn",effects=[improve("qualities","Brawn")]))
 	## grace
-	talent.addChild(Talent(name="Grace",implementation=lambda character_sheet: character_sheet.qualities["Grace"].improve()))
+	talent.addChild(Talent(name="Grace",effects=[improve("qualities","Grace")]))
 	## wits
-	talent.addChild(Talent(name="Wits",implementation=lambda character_sheet: character_sheet.qualities["Wits"].improve()))
+	talent.addChild(Talent(name="Wits",effects=[improve("qualities","Wits")]))
 	## spirit
-	talent.addChild(Talent(name="Spirit",implementation=lambda character_sheet: character_sheet.qualities["Spirit"].improve()))
+	talent.addChild(Talent(name="Spirit",effects=[improve("qualities","Spirit")]))
 
 	# cascade and append
 	talent.cascadeRootId()
@@ -109,10 +111,10 @@ def buildTrees():
 	shooting_fighting = Choice(name="Shooting and Fighting Dice",children_category="Die to Boost",root_id=3)
 
 	# shooting die
-	shooting_fighting.addChild(Choice(name="Shooting Die",implementation = lambda character_sheet: character_sheet.combat_stats["Shooting Die"].improve()))
+	shooting_fighting.addChild(Choice(name="Shooting Die",effects=[improve("combat_stats","Shooting Die")]))
 
 	# fighting die
-	shooting_fighting.addChild(Choice(name="Fighting Die",implementation = lambda character_sheet: character_sheet.combat_stats["Fighting Die"].improve()))
+	shooting_fighting.addChild(Choice(name="Fighting Die",effects=[improve("combat_stats","Fighting Die")]))
 
 	# cascade and append
 	shooting_fighting.cascadeRootId()
@@ -129,7 +131,7 @@ def buildTrees():
 	# martial
 	martial = Training(name="Martial",children_category="Gear Option",skill="Athletics")
 	## add default gear
-	martial.addImplementation(lambda character_sheet: character_sheet._abstract_potions.update({'B':character_sheet._abstract_potions['B']+1}))
+	martial.addEffect(add("_abstract_potions","B",1))
 	## add gear choices
 	martial.addChild(Item(name="Choose 3 rounds of alchemical ammunition",abstract=True,gear_type="ammunition",level="B",n=3))
 	martial.addChild(Item(name="Choose 1 level B grenade",abstract=True,gear_type="grenade",level="B",n=1))
@@ -140,15 +142,15 @@ def buildTrees():
 	# underworld
 	underworld = Training(name="Underworld",children_category="Gear Option",skill="Lie",gear=["Smoke Grenade"])
 	## add default gear
-	underworld.addImplementation(lambda character_sheet: character_sheet._abstract_potions.update({'B':character_sheet._abstract_potions['B']+3}))
+	underworld.addEffect(add("_abstract_potions","B",3))
 	## add gear choices
 	ugc1 = Item(name="A blade with the chem-pipes modification and choose 3 rounds of alchemical ammunition",abstract=False,gear_type="custom")
 	poison_blade = Weapon(**getModel('model_weapons.json')["Blade"])
 	poison_blade.name="Poison Blade"
 	poison_blade.special.append("This weapon may take alchemical ammunition as if it were a ranged weapon.")
 	poison_blade.modifications['A'].append("Chem-Pipes")
-	ugc1.addImplementation(lambda character_sheet: character_sheet._raw_weapons.append(poison_blade)) # blade with chem-pipes
-	ugc1.addImplementation(lambda character_sheet: character_sheet._abstract_ammunition.update({'B':character_sheet._abstract_ammunition['B']+3})) # 3 rounds of alchemical ammunition
+	ugc1.addEffect(append("_raw_weapons",poison_blade)) # blade with chem-pipes
+	ugc1.addEffect(add("_abstract_ammunition","B",3)) # 3 rounds of alchemical ammunition
 	underworld.addChild(ugc1) # add the complicated choice as a child
 	underworld.addChild(Item(name="Sniper Rifle",gear_type="weapon"))
 	## add as a child to training
@@ -165,14 +167,14 @@ def buildTrees():
 	# technology
 	technology = Training(name="Technology",children_category="Gear Option",skill="Interface")
 	## add default gear
-	technology.addImplementation(lambda character_sheet: character_sheet._abstract_potions.update({'B':character_sheet._abstract_potions['B']+1}))
-	technology.addImplementation(lambda character_sheet: character_sheet._abstract_grenades.update({'B':character_sheet._abstract_grenades['B']+1}))
+	technology.addEffect(add("_abstract_potions","B",1))
+	technology.addEffect(add("_abstract_grenades","B",1))
 	## add gear choices
 	technology.addChild(Item(name="A Personal Shield Generator",item_name="Personal Shield Generator"))
 	tgc2 = Choice(name="Choose a ranged weapon with 1 level B modification")
 	tgc2.addChild(Item(name="Pistol",gear_type="weapon"))
 	tgc2.addChild(Item(name="Long Arm",gear_type="weapon"))
-	tgc2.addImplementation(lambda character_sheet: character_sheet._abstract_modifications.update({'B':character_sheet._abstract_modifications['B']+1}))
+	tgc2.addEffect(add("_abstract_modifications","B",1))
 	technology.addChild(tgc2)
 
 	## add as child to training
@@ -224,7 +226,7 @@ def buildTrees():
 
 	# close combat
 	cso1 = CombatSpecialty(**model['Close Combat'],children_category= "Gear Option")
-	cso1.addImplementation(lambda character_sheet: character_sheet.combat_stats["Fighting Die"].improve())
+	cso1.addEffect(improve("combat_stats","Fighting Die"))
 	cso1.addChild(Item(name="2 level A modifications",level="A",n=2,gear_type="modification",abstract=True))
 	cso1.addChild(Item(name="1 level B modification",level="B",n=1,gear_type="modification",abstract=True))
 	# add as child to combat_specialty
@@ -232,7 +234,7 @@ def buildTrees():
 
 	# ranged
 	cso2 = CombatSpecialty(**model['Ranged'],children_category= "Gear Option")
-	cso2.addImplementation(lambda character_sheet: character_sheet.combat_stats["Shooting Die"].improve())
+	cso2.addEffect(improve("combat_stats","Shooting Die"))
 	# sub-option 1
 	cso2_o1 = Item(name="Long Arm and choice of modifications",n=1,gear_type="weapon",item_name="Long Arm",abstract=True,children_category= "Gear Sub-Option")
 	cso2_o1.addChild(Item(name="2 level A modifications",level="A",n=2,gear_type="modification",abstract=True))
@@ -245,7 +247,7 @@ def buildTrees():
 
 	# tactician
 	cso3 = CombatSpecialty(**model['Tactician'],children_category= "Gear Option")
-	cso3.addImplementation(lambda character_sheet: character_sheet._abstract_weapons.update({'Any':character_sheet._abstract_weapons['Any'] + 1}))
+	cso3.addEffect(add("_abstract_weapons","Any",1))
 	cso3.addChild(Item(name="2 level A modifications",level="A",n=2,gear_type="modification",abstract=True))
 	cso3.addChild(Item(name="1 level B modification",level="B",n=1,gear_type="modification",abstract=True))
 	# add as child to combat_specialty
@@ -255,7 +257,7 @@ def buildTrees():
 	cso4 = CombatSpecialty(**model['Healer'],children_category= "Gear Option")
 	cso4.addChild(Item(name="Long Arm",abstract=True,gear_type="weapon"))
 	cso4_o2 = Item(name="Melee Weapon (Blade or Hammer)",gear_type="custom")
-	cso4_o2.addImplementation(lambda character_sheet: character_sheet._abstract_weapons.update({'Melee':character_sheet._abstract_weapons['Melee'] + 1}))
+	cso4_o2.addEffect(add("_abstract_weapons","Melee",1))
 	cso4.addChild(cso4_o2)
 	# add as child to combat_specialty
 	combat_specialty.addChild(cso4)
@@ -277,7 +279,7 @@ def buildTrees():
 		background.addChild(Background(**b))
 	for b in background.children:
 		if b.name in ["Urchin","Corporate","Noble","Militia","Conscript"]:
-			b.addImplementation(lambda character_sheet: character_sheet.combat_stats.update({'AV':1}))
+			b.addEffect(setValue("combat_stats","AV",1))
 
 	# cascade and append
 	background.cascadeRootId()
@@ -327,4 +329,44 @@ def buildTrees():
 	return trees
 
 
-trees = buildTrees()
\ No newline at end of file
+# prototype trees, built on first access
+_trees = None
+
+def getTrees():
+	"""Return the shared prototype trees, building them on first use
+
+	The prototype must not be modified; call cloneTrees() to get a
+	copy that can be walked and filled in for one character.
+	"""
+	global _trees
+	if _trees is None:
+		log.debug("Building choice trees")
+		_trees = buildTrees()
+		for t in _trees:
+			t.freeze()
+	return _trees
+
+# flat index over the prototype trees, built on first access
+_index = None
+
+def getIndex():
+	"""Return a TreeIndex over the prototype trees"""
+	global _index
+	if _index is None:
+		_index = TreeIndex(getTrees())
+	return _index
+
+def cloneTrees():
+	"""Return a private copy of the prototype trees for one character
+
+	Only nodes with per-character state are copied (see
+	Choice.clone); the rest is shared with the prototype.
+	"""
+	return [t.clone() for t in getTrees()]
+
+def __getattr__(name):
+	# 'options.trees' is resolved lazily so that importing the
+	# package does not pay for a tree build
+	if name == "trees":
+		return getTrees()
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
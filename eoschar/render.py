@@ -0,0 +1,234 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import glob, signal, time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from .charactersheet import CharacterSheet
+
+
+class RenderTimeout(Exception):
+	pass
+
+
+def _timedOut(signum,frame):
+	raise RenderTimeout()
+
+
+def renderFile(in_path,out_path,timeout=None) -> tuple:
+	"""Load one save and render it to a PDF; runs in a worker
+
+	Never raises: failures are logged and reported in the result,
+	so one bad save cannot take down a batch. Where the platform
+	supports SIGALRM, a sheet that takes longer than timeout
+	seconds is abandoned and counted as a failure.
+
+	Returns (in_path, succeeded, seconds taken).
+	"""
+	t0 = time.perf_counter()
+	alarm = timeout is not None and hasattr(signal,"SIGALRM")
+	if alarm:
+		previous = signal.signal(signal.SIGALRM,_timedOut)
+	try:
+		# started inside the try, so an early alarm is still caught
+		if alarm:
+			signal.setitimer(signal.ITIMER_REAL,timeout)
+		sheet = CharacterSheet()
+		ok = sheet.load(in_path) and sheet.output(out_path)
+	except RenderTimeout:
+		ok = False
+	except:
+		log.exception(f"Failed to render {in_path}")
+		ok = False
+	finally:
+		if alarm:
+			signal.setitimer(signal.ITIMER_REAL,0)
+			signal.signal(signal.SIGALRM,previous)
+	seconds = time.perf_counter() - t0
+	# CharacterSheet.output catches the timeout itself, so check the clock
+	if alarm and not ok and seconds >= timeout:
+		log.warning(f"Timed out rendering {in_path} after {timeout}s")
+	return in_path, ok, seconds
+
+
+def _collect(done,pending,results,lost) -> bool:
+	"""Move finished futures out of pending; returns True if the pool broke
+
+	Results go to results. Work whose worker died, taking the
+	pool down with it, goes to lost instead.
+	"""
+	broken = False
+	for future in done:
+		in_path, out_path = pending.pop(future)
+		try:
+			results.append(future.result())
+		except BrokenProcessPool:
+			lost.append((in_path,out_path))
+			broken = True
+		except Exception:
+			log.exception(f"Failed to render {in_path}")
+			results.append((in_path,False,None))
+	return broken
+
+
+def _renderPool(work,jobs,max_pending,timeout,results) -> list:
+	"""Render (in_path, out_path) pairs on a pool of worker processes
+
+	When a worker dies (a crash, the OOM killer, os._exit) the
+	pool breaks and every sheet queued on it fails. Those sheets
+	are returned rather than counted, and the rest of work goes
+	on in a new pool.
+	"""
+	lost = []
+	i = 0
+	while i < len(work):
+		with ProcessPoolExecutor(max_workers=jobs) as executor:
+			pending = {}
+			broken = False
+			while i < len(work) and not broken:
+				if len(pending) >= max_pending:
+					done, not_done = wait(pending,return_when=FIRST_COMPLETED)
+					broken = _collect(done,pending,results,lost)
+					continue
+				try:
+					pending[executor.submit(renderFile,work[i][0],work[i][1],timeout)] = work[i]
+				except BrokenProcessPool:
+					broken = True
+					continue
+				i += 1
+			done, not_done = wait(pending)
+			_collect(done,pending,results,lost)
+	return lost
+
+
+def _percentile(ordered,fraction) -> float:
+	if len(ordered) == 0:
+		return 0.0
+	return ordered[min(len(ordered)-1,int(fraction*len(ordered)))]
+
+
+def render(in_dir,out_dir,jobs=None,pattern="*.txt",max_pending=None,timeout=60) -> dict:
+	"""Render every save in a directory to PDF, in parallel
+
+	Each save <name>.txt is written to out_dir as <name>.pdf. At
+	most max_pending files are queued on the worker pool at once,
+	so memory use does not grow with the size of the directory.
+	A summary of throughput and per-sheet latency is logged when
+	all sheets are done, and returned as a dictionary with keys
+	'rendered', 'failed' (list of paths), 'seconds',
+	'sheets_per_second', and 'latency' (mean, p50, p95, max).
+
+	A worker that dies takes down the sheets queued with it; each
+	of those is rendered again on its own, and a sheet that kills
+	its worker alone is counted as failed. With jobs=1 sheets
+	are rendered in this process, which has no such protection.
+
+	***
+
+	Parameters
+	----------
+	in_dir: str
+		Directory of saved characters
+	out_dir: str
+		Directory for the PDFs; created if it does not exist
+	jobs: int
+		Number of worker processes. Defaults to the number of
+		CPUs; 1 renders everything in this process.
+	pattern: str
+		Glob pattern for save files within in_dir
+	max_pending: int
+		Most files queued at once. Defaults to four per job.
+	timeout: float
+		Seconds allowed per sheet; None for no limit
+	"""
+	os.makedirs(out_dir,exist_ok=True)
+	jobs = os.cpu_count() if jobs is None else jobs
+	max_pending = 4*jobs if max_pending is None else max_pending
+	paths = sorted(glob.glob(os.path.join(in_dir,pattern)))
+	work = [(p,os.path.join(out_dir,os.path.splitext(os.path.basename(p))[0]+".pdf")) for p in paths]
+	results = []
+	t0 = time.perf_counter()
+	if jobs <= 1:
+		for in_path, out_path in work:
+			results.append(renderFile(in_path,out_path,timeout))
+	else:
+		lost = _renderPool(work,jobs,max_pending,timeout,results)
+		for in_path, out_path in lost:
+			if _renderPool([(in_path,out_path)],1,1,timeout,results):
+				log.error(f"A worker died rendering {in_path}")
+				results.append((in_path,False,None))
+	elapsed = time.perf_counter() - t0
+
+	# sheets whose worker died have no latency
+	latencies = sorted(seconds for path, ok, seconds in results if seconds is not None)
+	summary = {
+		"rendered":sum(1 for path, ok, seconds in results if ok),
+		"failed":sorted(path for path, ok, seconds in results if not ok),
+		"seconds":elapsed,
+		"sheets_per_second":len(results)/elapsed if elapsed > 0 else 0.0,
+		"latency":{
+			"mean":sum(latencies)/len(latencies) if len(latencies) > 0 else 0.0,
+			"p50":_percentile(latencies,0.5),
+			"p95":_percentile(latencies,0.95),
+			"max":_percentile(latencies,1.0)
+		}
+	}
+	log.info(f"Rendered {summary['rendered']} of {len(paths)} sheets to {out_dir} in {elapsed:.1f}s ({summary['sheets_per_second']:.1f} sheets/s with {jobs} jobs)")
+	log.info("Per-sheet latency: mean {mean:.3f}s, p50 {p50:.3f}s, p95 {p95:.3f}s, max {max:.3f}s".format(**summary['latency']))
+	for path in summary["failed"]:
+		log.warning(f"Failed to render {path}")
+	return summary
+
+
+def renderBook(in_dir,out_path,pattern="*.txt") -> dict:
+	"""Render every save in a directory into one PDF, a page per sheet
+
+	Saves that fail to load or to flush are logged and left out.
+	Returns a summary dictionary with keys 'rendered', 'failed'
+	(list of paths), 'seconds' and 'sheets_per_second'.
+
+	***
+
+	Parameters
+	----------
+	in_dir: str
+		Directory of saved characters
+	out_path: str
+		Path of the book PDF
+	pattern: str
+		Glob pattern for save files within in_dir
+	"""
+	paths = sorted(glob.glob(os.path.join(in_dir,pattern)))
+	failed = []
+	dropped = []
+	t0 = time.perf_counter()
+	def loaded():
+		for path in paths:
+			sheet = CharacterSheet()
+			try:
+				ok = sheet.load(path)
+			except:
+				log.exception(f"Failed to load {path}")
+				ok = False
+			if ok:
+				yield sheet
+				# outputBook has placed or dropped the sheet
+				# by the time it asks for the next one
+				if len(dropped) > 0 and dropped[-1] is sheet:
+					failed.append(path)
+			else:
+				failed.append(path)
+	ok = CharacterSheet.outputBook(loaded(),out_path,dropped)
+	elapsed = time.perf_counter() - t0
+	rendered = len(paths) - len(failed) if ok else 0
+	summary = {
+		"rendered":rendered,
+		"failed":failed if ok else paths,
+		"seconds":elapsed,
+		"sheets_per_second":rendered/elapsed if elapsed > 0 else 0.0
+	}
+	log.info(f"Rendered {rendered} of {len(paths)} sheets to {out_path} in {elapsed:.1f}s ({summary['sheets_per_second']:.1f} sheets/s)")
+	for path in failed:
+		log.warning(f"Failed to render {path}")
+	return summary
@@ -0,0 +1,183 @@
+"""Pickle-free save format
+
+A save is one compact JSON document, UTF-8 encoded, with its keys in
+a fixed order:
+
+	{"format":"eoschar-save","format_version":3,"__version__":...,
+	 "rules":...,"record":{...},"snapshot":{...}}
+
+'record' is what the player chose: the tree path, name, motivation,
+skill and trivia purchases (as [bought, base] level pairs), assigned
+gear and modified weapons.
+'snapshot' is the sheet those choices produced, one entry per
+derived CharacterSheet field, so a save can be shown or rendered
+without replaying the choice trees. 'rules' is the key of the rules
+(model files and the code that applies them; see bundle.sourceFiles)
+the snapshot was computed under; when the rules have changed since,
+CharacterSheet.verify() recomputes the sheet from the record.
+
+Values JSON cannot tell apart are tagged: a die is {"$die":sides},
+a weapon {"$weapon":{...}}, a gear inventory {"$gear":{name:count}},
+a read-only model dictionary {"$frozen":{...}} and a tuple
+{"$tuple":[...]}. A weapon is stored as its Weapon.record (base type,
+name if renamed, modifications in the order applied) and its stats
+are recomputed from the model files on load. Version 1 saves stored
+every weapon field, as do weapons the model files cannot rebuild;
+both are still read. Saves before version 3 stored gear as the lines
+shown on the sheet, e.g. "Smoke Grenade (3)"; those lines are parsed
+back into counts when first needed.
+
+Saves written before this format (pickles) are still read by
+CharacterSheet.load.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import json
+from functools import lru_cache
+from . import bundle
+from .dietype import DieType
+from .func import FrozenDict
+from .gear import GearInventory
+from .weapon import Weapon
+
+
+FORMAT = "eoschar-save"
+FORMAT_VERSION = 3
+READ_VERSIONS = (1,2,3)
+# first version to save gear as counts rather than sheet lines
+GEAR_COUNTS_VERSION = 3
+# every field of a full weapon record
+WEAPON_FIELDS = ("name","type","heavy","_range","_reach","_accuracy","_ap","range","reach","accuracy","ap","special","modifications")
+# (type, name, modifications) : Weapon
+_weapon_templates = {}
+
+
+@lru_cache(maxsize=1)
+def rulesKey() -> str:
+	"""Key of the rules on disk, computed once per process"""
+	return bundle.sourceKey({os.path.basename(p):bundle._fileDigest(p) for p in bundle.sourceFiles()})
+
+
+def isSaveFile(raw) -> bool:
+	"""Whether raw (bytes) looks like this format rather than a pickle"""
+	return raw.lstrip()[:1] == b"{"
+
+
+def _weaponTemplate(record) -> Weapon:
+	"""The weapon a Weapon.record describes, built once per distinct record"""
+	key = (record["type"],record.get("name"),tuple(record.get("modifications",())))
+	if key not in _weapon_templates:
+		_weapon_templates[key] = Weapon.fromRecord(record)
+	return _weapon_templates[key]
+
+
+def weaponFromRecord(record) -> Weapon:
+	"""Rebuild a Weapon from a Weapon.record or a full record of every field"""
+	if "_ap" not in record:
+		# a copy of the shared template; the strings stay shared
+		return _weaponTemplate(record).copy()
+	# live stats follow from the modifications, as for old pickles
+	weapon = Weapon.__new__(Weapon)
+	weapon.__setstate__({field:record[field] for field in WEAPON_FIELDS})
+	weapon.special = list(weapon.special)
+	weapon.modifications = {level:list(names) for level,names in weapon.modifications.items()}
+	return weapon
+
+
+def encodeValue(value):
+	"""Convert a derived field's value to plain JSON types"""
+	if isinstance(value,DieType):
+		return {"$die":int(value)}
+	elif isinstance(value,Weapon):
+		record = value.record()
+		if record is None:
+			record = {field:encodeValue(getattr(value,field)) for field in WEAPON_FIELDS}
+		return {"$weapon":record}
+	elif isinstance(value,GearInventory):
+		return {"$gear":{name:n for name,n in sorted(value.items())}}
+	elif isinstance(value,FrozenDict):
+		return {"$frozen":{k:encodeValue(v) for k,v in value.items()}}
+	elif isinstance(value,dict):
+		return {k:encodeValue(v) for k,v in value.items()}
+	elif isinstance(value,tuple):
+		return {"$tuple":[encodeValue(v) for v in value]}
+	elif isinstance(value,list):
+		return [encodeValue(v) for v in value]
+	elif value is None or isinstance(value,(str,int,float,bool)):
+		return value
+	raise TypeError(f"Cannot save a {type(value).__name__}")
+
+
+def _decodeObject(obj):
+	"""json object_hook undoing encodeValue's tags; inner values arrive decoded"""
+	if len(obj) == 1:
+		tag, inner = next(iter(obj.items()))
+		if tag == "$die":
+			return DieType(inner)
+		elif tag == "$weapon":
+			return weaponFromRecord(inner)
+		elif tag == "$gear":
+			return GearInventory(inner)
+		elif tag == "$frozen":
+			return FrozenDict(inner)
+		elif tag == "$tuple":
+			return tuple(inner)
+	return obj
+
+
+def _packPurchases(categories) -> dict:
+	# PointBuy categories as [bought_levels, base_levels] pairs
+	return {name:[c["bought_levels"],c["base_levels"]] for name,c in categories.items()}
+
+
+def _unpackPurchases(packed) -> dict:
+	return {name:{"bought_levels":bought,"base_levels":base} for name,(bought,base) in packed.items()}
+
+
+def dumps(version,record,snapshot) -> bytes:
+	"""Serialize a save; snapshot maps derived field names to values
+
+	***
+
+	Parameters
+	----------
+	version: str
+		eoschar version that made the save
+	record: dict
+		The player's selections, as returned by
+		CharacterSheet.record
+	snapshot: dict
+		Derived field name : current value
+	"""
+	document = {
+		"format":FORMAT,
+		"format_version":FORMAT_VERSION,
+		"__version__":version,
+		"rules":rulesKey(),
+		"record":encodeValue(dict(record,skills=_packPurchases(record["skills"]),trivia=_packPurchases(record["trivia"]))),
+		"snapshot":{field:encodeValue(value) for field,value in snapshot.items()}
+	}
+	return json.dumps(document,ensure_ascii=False,separators=(',',':')).encode('utf-8')
+
+
+def loads(raw) -> dict:
+	"""Parse a save written by dumps
+
+	Returns the document, with tagged values, purchases and
+	gear decoded. Raises ValueError if raw is not a save of a
+	supported version.
+	"""
+	document = json.loads(raw.decode('utf-8'),object_hook=_decodeObject)
+	if not isinstance(document,dict) or document.get("format") != FORMAT:
+		raise ValueError("Not an eoschar save")
+	if document.get("format_version") not in READ_VERSIONS:
+		raise ValueError(f"Unsupported save format version {document.get('format_version')}")
+	record = document["record"]
+	record["skills"] = _unpackPurchases(record["skills"])
+	record["trivia"] = _unpackPurchases(record["trivia"])
+	if document["format_version"] < GEAR_COUNTS_VERSION:
+		document["snapshot"]["gear"] = GearInventory.fromLines(document["snapshot"]["gear"])
+	return document
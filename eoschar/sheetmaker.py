@@ -3,57 +3,73 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
 import math
-from fpdf import FPDF
+from .document import Document, CHUNK_SIZE
+from .textfit import TextFitter, multiCell
+from .images import placeImage, LOGO_PATH
 
 class SheetMaker:
 	"""A class for producing beautiful character sheets
 
+	Each sheet is drawn in two layers: the blank sheet (logo,
+	boxes, labels and weapon column headers), which is the same
+	for every character, and the character's content on top.
+
 	***
 
 	Methods
 	-------
 	make: None
-		Saves a character sheet to 
+		Saves a character sheet to a PDF file or stream
+	toBytes: bytes
+		The character sheet as a PDF file in memory
+	chunks: iterator
+		The character sheet as a PDF file, in pieces
+	makeBook: int
+		Saves many character sheets to one PDF file
 	"""
+	# weapon table columns
+	W_TOTAL_WIDTH = 4.35
+	W_NAME_X = 0.62
+	W_NAME_WIDTH = 0.82
+	W_RANGE_X = W_NAME_X + W_NAME_WIDTH
+	W_RANGE_WIDTH = 0.48
+	W_ACCURACY_X = W_RANGE_X + W_RANGE_WIDTH
+	W_ACCURACY_WIDTH = 0.35
+	W_AP_X = W_ACCURACY_X+W_ACCURACY_WIDTH
+	W_AP_WIDTH = 0.17
+	W_SPECIAL_WIDTH = W_TOTAL_WIDTH - (W_NAME_WIDTH+W_RANGE_WIDTH+W_ACCURACY_WIDTH+W_AP_WIDTH)
+
 	def __init__(self):
 		self.sheet = None
 
 	def read(self,character_sheet):
 		self.sheet = character_sheet
 
-	def make(self,out_path) -> None:
-		"""Print self.sheet to a beautiful PDF file
-
-		***
-
-		Parameters
-		----------
-		out_path: str
-			Path on disk where sheet will be created.
-			Must end in .pdf extension. If the file
-			exists already, it will be overwritten.
-		"""
-
+	@staticmethod
+	def _newDocument() -> Document:
+		"""Return an empty one-page Letter document, ready to draw on"""
 		######
 		# meta
 		######
 
-		pdf = FPDF("p","in","Letter")
+		pdf = Document("p","in","Letter")
 		pdf.add_page()
 		pdf.set_margins(0,0,0)
 		pdf.set_fill_color(0,0,0)
 		pdf.set_auto_page_break(False)
 		pdf.set_font('Arial',size=12)
+		return pdf
 
-
-
+	@classmethod
+	def _drawBlank(cls,pdf) -> None:
+		"""Draw everything that does not depend on the character"""
 		#############
 		# blank sheet
 		#############
 
 		# add logo
 		pdf.set_xy(0.62,0.53)
-		pdf.image(os.path.join(os.path.dirname(os.path.dirname(__file__)),"resources","shrike_logo_1.png"),w=0.54)
+		placeImage(pdf,LOGO_PATH,w=0.54)
 
 		# add title
 		## set title font
@@ -197,34 +213,38 @@ class SheetMaker:
 		# add Weapons
 		## box
 		pdf.set_xy(0.62,7.18)
-		w_total_width = 4.35
-		pdf.cell(w_total_width,1.65,border=1)
+		pdf.cell(cls.W_TOTAL_WIDTH,1.65,border=1)
 		## label
 		pdf.set_xy(0.64,7.2)
 		pdf.cell(0.8,0.2,"Weapons")
 		## column_titles
 		pdf.set_font('Times',size=6,style="I")
 		pdf.set_y(7.45)
-		w_name_x = 0.62
-		w_name_width = 0.82
-		pdf.set_x(w_name_x)
-		pdf.cell(w_name_width,0.11,"Name")
-		w_range_x = w_name_x + w_name_width
-		w_range_width = 0.48
-		pdf.set_x(w_range_x)
-		pdf.cell(w_range_width,0.11,"Range/Reach",align="C")
-		w_accuracy_x = w_range_x + w_range_width
-		w_accuracy_width = 0.35
-		pdf.set_x(w_accuracy_x)
-		pdf.cell(w_accuracy_width,0.11,"Accuracy",align="C")
-		#w_ap_x = 2.28
-		w_ap_x = w_accuracy_x+w_accuracy_width
-		w_ap_width = 0.17
-		pdf.set_x(w_ap_x)
-		pdf.cell(w_ap_width,0.11,"AP",align="C")
+		pdf.set_x(cls.W_NAME_X)
+		pdf.cell(cls.W_NAME_WIDTH,0.11,"Name")
+		pdf.set_x(cls.W_RANGE_X)
+		pdf.cell(cls.W_RANGE_WIDTH,0.11,"Range/Reach",align="C")
+		pdf.set_x(cls.W_ACCURACY_X)
+		pdf.cell(cls.W_ACCURACY_WIDTH,0.11,"Accuracy",align="C")
+		pdf.set_x(cls.W_AP_X)
+		pdf.cell(cls.W_AP_WIDTH,0.11,"AP",align="C")
 		#pdf.set_x(2.34)
-		w_special_width = w_total_width - (w_name_width+w_range_width+w_accuracy_width+w_ap_width)
-		pdf.cell(w_special_width,0.11,"Special")
+		pdf.cell(cls.W_SPECIAL_WIDTH,0.11,"Special")
+		## make vertical lines
+		line_height = 1.26
+		pdf.set_y(7.57)
+		### name_border
+		pdf.set_x(cls.W_NAME_X)
+		pdf.cell(cls.W_NAME_WIDTH,line_height,border="R")
+		### range_border
+		pdf.set_x(cls.W_RANGE_X)
+		pdf.cell(cls.W_RANGE_WIDTH,line_height,border="R")
+		### accuracy_border
+		pdf.set_x(cls.W_ACCURACY_X)
+		pdf.cell(cls.W_ACCURACY_WIDTH,line_height,border="R")
+		### ap_border
+		pdf.set_x(cls.W_AP_X)
+		pdf.cell(cls.W_AP_WIDTH,line_height,border="R")
 
 		# reset box label font
 		pdf.set_font('Times',size=12,style="B")
@@ -253,20 +273,19 @@ class SheetMaker:
 		pdf.set_xy(5.26,2.04)
 		pdf.cell(0.8,0.2,"Traits")
 
-
-
+	def _drawContent(self,pdf) -> None:
+		"""Draw the character-specific parts of the sheet"""
 		#########
 		# Content
 		#########
 
 		# CHARACTER NAME
 		maxWidth = 2.65
-		fontSize = 20
-		pdf.set_font('Arial',size=fontSize,style="")
+		pdf.set_font('Arial',size=20,style="")
 		nameText = self.sheet.choice_names['Name']
-		while pdf.get_string_width(nameText) > maxWidth:
-			fontSize -= 0.1
-			pdf.set_font('Arial',size=fontSize,style="")
+		## largest of 20, 19.9, ... points that fits
+		fontSize = TextFitter(pdf).fitWidth(nameText,maxWidth,20,0.1)
+		pdf.set_font('Arial',size=fontSize,style="")
 		pdf.set_xy(0.62,1.23)
 		pdf.cell(2.76,0.36,nameText,align="C")
 
@@ -290,10 +309,8 @@ class SheetMaker:
 		# motivation
 		## font has to scale because user input
 		motivationText = self.sheet.choice_names['Motivation']
-		fontSize = 10
-		while pdf.get_string_width(motivationText) > 1.25:
-			fontSize -= 0.1
-			pdf.set_font('Arial',size=fontSize,style="U")
+		fontSize = TextFitter(pdf).fitWidth(motivationText,1.25,10,0.1)
+		pdf.set_font('Arial',size=fontSize,style="U")
 		## actually write the motivation text
 		pdf.set_xy(6.47,0.84)
 		pdf.cell(1.25,0.15,motivationText,align="C")
@@ -345,7 +362,7 @@ class SheetMaker:
 			sQual = self.sheet.skills[s]['quality']
 			sDie = str(self.sheet.qualities[sQual])
 			sContent = f"{s} ({sQual})"
-			pdf.cell(pdf.get_string_width(sContent),0.22,sContent)
+			pdf.cell(TextFitter(pdf).stringWidth(sContent,pdf.font_size_pt),0.22,sContent)
 			# add player dice
 			pdf.set_font('Arial',size=8)
 			pdf.set_x(3)
@@ -358,7 +375,7 @@ class SheetMaker:
 		pdf.set_y(5.82)
 		for t in self.sheet.trivia:
 			pdf.set_x(0.64)
-			pdf.multi_cell(0.83,0.11,"* "+t,align="L")
+			multiCell(pdf,0.83,0.11,"* "+t,align="L")
 			pdf.ln(.02)
 
 		# TRAITS
@@ -371,7 +388,7 @@ class SheetMaker:
 			# trait description
 			pdf.set_x(5.26)
 			pdf.set_font('Arial',size=10,style='')
-			pdf.multi_cell(2.35,0.15,t['Description'],align="L")
+			multiCell(pdf,2.35,0.15,t['Description'],align="L")
 			pdf.ln()
 
 		# GEAR
@@ -382,7 +399,7 @@ class SheetMaker:
 		# 	pdf.multi_cell(2.35,0.11,item,align="L")
 		# 	pdf.ln(.02)
 		pdf.set_xy(2.02,9.26)
-		pdf.multi_cell(2.85,0.19,", ".join(self.sheet.gear).strip(","),align="L")
+		multiCell(pdf,2.85,0.19,", ".join(self.sheet.gear.lines()).strip(","),align="L")
 
 		# MONEY
 		pdf.set_font('Arial',size=10,style='')
@@ -390,34 +407,21 @@ class SheetMaker:
 		pdf.cell(1.16,0.15,f"SA: {self.sheet.money}")
 
 		# WEAPONS
-		## make vertical lines
-		line_height = 1.26
 		pdf.set_y(7.57)
-		### name_border
-		pdf.set_x(w_name_x)
-		pdf.cell(w_name_width,line_height,border="R")
-		### range_border
-		pdf.set_x(w_range_x)
-		pdf.cell(w_range_width,line_height,border="R")
-		### accuracy_border
-		pdf.set_x(w_accuracy_x)
-		pdf.cell(w_accuracy_width,line_height,border="R")
-		### ap_border
-		pdf.set_x(w_ap_x)
-		pdf.cell(w_ap_width,line_height,border="R")
 		## add each weapon
 		pdf.set_font('Arial',size=8,style='')
 		### calculate how to share vertical space
 		size_index = [] # list of dicts: {"textLen":int,"textPct":int,"fontPoint":int,"cellY":int}
 		totalTextLen = 0
 		maxTotalHeight = 1.25
-		special_cell_width = w_special_width
+		special_cell_width = self.W_SPECIAL_WIDTH
+		fitter = TextFitter(pdf)
 		for weapon in self.sheet.weapons: # individual info
 			if len(weapon.special) > 0:
 				specials = " ".join(weapon.special) 
 			else:
 				specials = " "
-			textLen = pdf.get_string_width(specials)
+			textLen = fitter.stringWidth(specials,pdf.font_size_pt)
 			if textLen < special_cell_width:
 				textLen = special_cell_width
 			totalTextLen += textLen
@@ -425,54 +429,37 @@ class SheetMaker:
 		for d in size_index:
 			d['textPct'] = d['textLen']/totalTextLen
 			d['maxHeight'] = d['textPct'] * maxTotalHeight
+		### shrink each special until it fits its share (in steps of 0.01pt)
 		for d in size_index:
-			fits = False
-			while not fits:
-				fake_pdf = FPDF("p","in","Letter")
-				fake_pdf.add_page()
-				fake_pdf.set_margins(0,0,0)
-				fake_pdf.set_fill_color(0,0,0)
-				fake_pdf.set_auto_page_break(False)
-				fake_pdf.set_font('Arial',size=d["fontPoint"])
-				## DO CALC
-				fake_pdf.set_xy(1,1)
-				fake_pdf.multi_cell(special_cell_width,d['cellY'],d['text'])
-				if fake_pdf.get_y() - 1 <= d['maxHeight']:
-					fits = True
-				else:
-					d['fontPoint'] = d['fontPoint'] - 0.01
-				del fake_pdf
+			d['fontPoint'] = fitter.fitSize(d['text'],special_cell_width,d['cellY'],d['maxHeight'],start=d['fontPoint'])
 			d['cellY'] = d["fontPoint"] / 72
 
 		### do the writing
 		i = 0
 		for weapon in self.sheet.weapons: # each one is a Weapon object
 			# name
-			font_size = 8
+			font_size = fitter.fitWidth(weapon.name,self.W_NAME_WIDTH-0.1,8,0.05)
 			pdf.set_font('Arial',size=font_size,style='')
-			while pdf.get_string_width(weapon.name) > (w_name_width-0.1):
-				font_size -= 0.05
-				pdf.set_font('Arial',size=font_size,style='')
-			pdf.set_x(w_name_x)
-			pdf.cell(w_name_width,0.12,weapon.name,align="L",border="T")
+			pdf.set_x(self.W_NAME_X)
+			pdf.cell(self.W_NAME_WIDTH,0.12,weapon.name,align="L",border="T")
 			# range / reach
 			pdf.set_font('Arial',size=8,style='')
 			if (weapon.range is None) or (weapon.range <= 0):
 				r =weapon.reach
 			else:
 				r = weapon.range
-			pdf.set_x(w_range_x)
-			pdf.cell(w_range_width,0.12,str(r),align="C",border="T")
+			pdf.set_x(self.W_RANGE_X)
+			pdf.cell(self.W_RANGE_WIDTH,0.12,str(r),align="C",border="T")
 			# accuracy
 			if weapon.accuracy == 0:
 				acc = "NA"
 			else:
 				acc = weapon.accuracy
-			pdf.set_x(w_accuracy_x)
-			pdf.cell(w_accuracy_width,0.12,str(acc),align="C",border="T")
+			pdf.set_x(self.W_ACCURACY_X)
+			pdf.cell(self.W_ACCURACY_WIDTH,0.12,str(acc),align="C",border="T")
 			# ap
-			pdf.set_x(w_ap_x)
-			pdf.cell(w_ap_width,0.12,str(weapon.ap),align="C",border="T")
+			pdf.set_x(self.W_AP_X)
+			pdf.cell(self.W_AP_WIDTH,0.12,str(weapon.ap),align="C",border="T")
 			# special 
 			index = size_index[i] # get meta-info about size calculated above
 			specials = index['text']
@@ -514,14 +501,99 @@ class SheetMaker:
 			# 	row_height = row_height * 0.99
 			# 	pdf.set_font('Arial',size=font_size,style='')
 			# END METHODS
-			pdf.multi_cell(cell_width,row_height,specials,border="T")
+			multiCell(pdf,cell_width,row_height,specials,border="T")
 			pdf.ln(0.05)
 			i += 1
 
+	def document(self) -> Document:
+		"""Draw self.sheet on a new document, ready to output"""
+		pdf = self._newDocument()
+		self._drawBlank(pdf)
+		self._drawContent(pdf)
+		return pdf
+
+	@staticmethod
+	def _save(pdf,out) -> None:
+		"""Output pdf to a path, or to a writable binary stream"""
+		if hasattr(out,"write"):
+			pdf.writeTo(out)
+		else:
+			pdf.output(out)
+
+	def make(self,out_path) -> None:
+		"""Print self.sheet to a beautiful PDF file
+
+		***
+
+		Parameters
+		----------
+		out_path: str or binary stream
+			Path on disk where sheet will be created.
+			Must end in .pdf extension. If the file
+			exists already, it will be overwritten.
+			Anything with a write() method taking
+			bytes (an open file, io.BytesIO, a socket
+			file) is written to instead, and left open.
+		"""
+		self._save(self.document(),out_path)
+
+	def toBytes(self) -> bytes:
+		"""Return self.sheet as the bytes of a PDF file"""
+		return self.document().toBytes()
 
-		########	
-		# output
-		########
+	def chunks(self,chunk_size=CHUNK_SIZE):
+		"""Return an iterator over the bytes of self.sheet's PDF file, in pieces
 
-		# write result to file
-		pdf.output(out_path)
\ No newline at end of file
+		The sheet is drawn before this returns; the pieces are
+		encoded as they are consumed, e.g. by a streaming HTTP
+		response.
+		"""
+		return self.document().chunks(chunk_size)
+
+	@classmethod
+	def book(cls,character_sheets) -> Document:
+		"""Draw many characters on one new document, one page per sheet
+
+		Fonts and the logo are embedded once and shared by every
+		page, so the file grows only by each page's content.
+
+		***
+
+		Parameters
+		----------
+		character_sheets: iterable
+			CharacterSheet objects, in page order
+		"""
+		pdf = cls._newDocument()
+		pages = 0
+		for character_sheet in character_sheets:
+			if pages > 0:
+				pdf.add_page()
+			cls._drawBlank(pdf)
+			maker = cls()
+			maker.read(character_sheet)
+			maker._drawContent(pdf)
+			pages += 1
+		if pages == 0:
+			raise ValueError("Cannot make a book with no character sheets")
+		return pdf
+
+	@classmethod
+	def makeBook(cls,character_sheets,out_path) -> int:
+		"""Print many characters to one PDF file, one page per sheet
+
+		Returns the number of pages written.
+
+		***
+
+		Parameters
+		----------
+		character_sheets: iterable
+			CharacterSheet objects, in page order
+		out_path: str or binary stream
+			Path on disk where the book will be created,
+			or a writable binary stream, as for make.
+		"""
+		pdf = cls.book(character_sheets)
+		cls._save(pdf,out_path)
+		return pdf.page
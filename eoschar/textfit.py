@@ -0,0 +1,317 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import math
+from functools import lru_cache
+
+# entries kept in each text layout cache; the least recently
+# used are dropped first, so long-running processes stay bounded
+CACHE_SIZE = 4096
+# glyph width tables by font name, registered by each TextFitter
+_glyph_widths = {}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _units(font,text) -> int:
+	"""Width of text in thousandths of the font size"""
+	widths = _glyph_widths[font]
+	return sum(widths.get(c,0) for c in text)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _layout(font,k,c_margin,size,width,text) -> tuple:
+	"""Lines and justify word spacing multi_cell would print; see TextFitter.layout"""
+	widths = _glyph_widths[font]
+	font_size = size/k
+	wmax = (width - 2*c_margin)*1000.0/font_size
+	s = text.replace("\r",'')
+	nb = len(s)
+	if nb > 0 and s[nb-1] == "\n":
+		nb -= 1
+	lines = []
+	sep = -1
+	i = 0
+	j = 0
+	l = 0
+	ls = 0
+	ns = 0
+	while i < nb:
+		c = s[i]
+		if c == "\n":
+			lines.append((s[j:i],None))
+			i += 1
+			sep = -1
+			j = i
+			l = 0
+			ns = 0
+			continue
+		if c == ' ':
+			sep = i
+			ls = l
+			ns += 1
+		l += widths.get(c,0)
+		if l > wmax:
+			if sep == -1:
+				if i == j:
+					i += 1
+				lines.append((s[j:i],None))
+			else:
+				ws = (wmax-ls)/1000.0*font_size/(ns-1) if ns > 1 else 0
+				lines.append((s[j:sep],ws))
+				i = sep + 1
+			sep = -1
+			j = i
+			l = 0
+			ns = 0
+		else:
+			i += 1
+	lines.append((s[j:i],None))
+	return tuple(lines)
+
+
+def _bottom(lines,line_height,top) -> float:
+	# accumulated one line at a time, as FPDF does
+	y = top
+	for line in lines:
+		y += line_height
+	return y
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _fitSize(font,k,c_margin,text,width,line_height,max_height,start,step,minimum) -> float:
+	"""Largest candidate size at which text fits; see TextFitter.fitSize"""
+	sizes = _sizeGrid(start,step)
+	fits = lambda size: _bottom(_layout(font,k,c_margin,size,width,text),line_height,1.0) - 1 <= max_height
+	lo, hi = 0, len(sizes)
+	while lo < hi:
+		mid = (lo + hi) // 2
+		if fits(sizes[mid]):
+			hi = mid
+		else:
+			lo = mid + 1
+	if lo == len(sizes):
+		log.debug(f"'{text}' does not fit in {max_height}; using {minimum}pt")
+		return min(sizes,key=lambda size: abs(size-minimum))
+	return sizes[lo]
+
+
+def clearCache() -> None:
+	"""Forget every cached width, layout and fitted size"""
+	_units.cache_clear()
+	_layout.cache_clear()
+	_fitSize.cache_clear()
+
+
+def cacheInfo() -> dict:
+	"""Return the number of entries in each text layout cache"""
+	return {"widths":_units.cache_info().currsize,"layouts":_layout.cache_info().currsize,"fits":_fitSize.cache_info().currsize}
+
+
+@lru_cache(maxsize=None)
+def _sizeGrid(start,step) -> tuple:
+	"""Font sizes start, start-step, ... down to (not including) 0
+
+	Built by repeated subtraction, exactly as a shrink-until-it-fits
+	loop would produce them, so the chosen size is bit-for-bit the
+	one such a loop would stop on.
+	"""
+	sizes = []
+	size = start
+	while size > 0:
+		sizes.append(size)
+		size = size - step
+	return tuple(sizes)
+
+
+class TextFitter:
+	"""Wrap and fit text the way FPDF would, without drawing it
+
+	Widths come straight from the glyph width table of the
+	document's current (core) font, and line breaks use the same
+	greedy algorithm as FPDF.multi_cell, so the lines are identical
+	to what multi_cell would print. Widths, layouts and fitted sizes
+	are cached by font, units, cell margin, size, width and text,
+	up to CACHE_SIZE of each, so laying out the same model text
+	again (trait descriptions, weapon specials, skill labels) is a
+	dictionary lookup.
+
+	***
+
+	Attributes
+	----------
+	font: str
+		Name of the font the fitter measures
+	widths: dict
+		Glyph widths, in thousandths of the font size
+	c_margin: float
+		Cell padding on each side, in document units
+	k: float
+		Points per document unit
+
+	Methods
+	-------
+	stringWidth: float
+		Width of a string at a given font size
+	layout: tuple
+		Lines multi_cell would print, with justification spacing
+	lineBreaks: list
+		Lines that multi_cell would print
+	bottom: float
+		y position multi_cell would finish at
+	fitSize: float
+		Largest candidate font size whose lines fit a box
+	fitWidth: float
+		Largest candidate font size at which a string fits a width
+	"""
+	def __init__(self,pdf):
+		self.font = pdf.current_font['name']
+		self.widths = pdf.current_font['cw']
+		self.c_margin = pdf.c_margin
+		self.k = pdf.k
+		_glyph_widths.setdefault(self.font,self.widths)
+
+	def __repr__(self):
+		return f"<Instance of TextFitter | {self.font}>"
+
+	def stringWidth(self,text,size) -> float:
+		"""Return the width of text at font size 'size' (points)
+
+		Same arithmetic as FPDF.get_string_width.
+		"""
+		return _units(self.font,text)*(size/self.k)/1000.0
+
+	def layout(self,text,width,size) -> tuple:
+		"""Return the lines multi_cell(width,h,text) would print at 'size'
+
+		Each line is a pair (text, ws). ws is the word spacing
+		multi_cell would set before printing the line when
+		justifying (align='J'), or None if it would reset the
+		spacing to 0 instead.
+
+		***
+
+		Parameters
+		----------
+		text: str
+		width: float
+			Cell width, in document units
+		size: float
+			Font size, in points
+		"""
+		return _layout(self.font,self.k,self.c_margin,size,width,text)
+
+	def lineBreaks(self,text,width,size) -> list:
+		"""Return the text of each line multi_cell(width,h,text) would print"""
+		return [line for line, ws in self.layout(text,width,size)]
+
+	def bottom(self,text,width,size,line_height,top=0.0) -> float:
+		"""Return y after multi_cell(width,line_height,text) starting at y=top
+
+		Accumulated one line at a time, as FPDF does, so the
+		result matches get_y() exactly.
+		"""
+		return _bottom(self.layout(text,width,size),line_height,top)
+
+	def fitSize(self,text,width,line_height,max_height,start=8,step=0.01,minimum=4) -> float:
+		"""Return the largest of start, start-step, ... at which text fits
+
+		Text fits when multi_cell(width,line_height,text) would
+		be no taller than max_height. Smaller sizes never need
+		more lines, so the candidates are binary searched. If no
+		positive size fits (e.g. max_height is less than one
+		line), the candidate nearest 'minimum' is returned.
+
+		***
+
+		Parameters
+		----------
+		text: str
+		width: float
+			Cell width, in document units
+		line_height: float
+			Height of each line, in document units
+		max_height: float
+			Height of the box, in document units
+		start: float
+			Largest font size to try, in points
+		step: float
+			Difference between candidate sizes, in points
+		minimum: float
+			Fallback size when nothing fits, in points
+		"""
+		return _fitSize(self.font,self.k,self.c_margin,text,width,line_height,max_height,start,step,minimum)
+
+	def fitWidth(self,text,max_width,start,step) -> float:
+		"""Return the largest of start, start-step, ... at which text is no wider than max_width
+
+		Equivalent to shrinking the font by step until
+		get_string_width(text) <= max_width, but solved directly:
+		width is proportional to size, so the answer is read off
+		the candidate list and only checked against its
+		neighbours. If no positive size fits, the smallest
+		candidate is returned.
+
+		***
+
+		Parameters
+		----------
+		text: str
+		max_width: float
+			In document units
+		start: float
+			Largest font size to try, in points
+		step: float
+			Difference between candidate sizes, in points
+		"""
+		sizes = _sizeGrid(start,step)
+		units = _units(self.font,text)
+		if units == 0:
+			return sizes[0]
+		fits = lambda size: units*(size/self.k)/1000.0 <= max_width
+		exact = max_width*self.k*1000.0/units
+		i = min(len(sizes)-1,max(0,math.ceil((start-exact)/step)))
+		while i > 0 and fits(sizes[i-1]):
+			i -= 1
+		while i < len(sizes)-1 and not fits(sizes[i]):
+			i += 1
+		return sizes[i]
+
+
+def multiCell(pdf,w,h,txt='',border=0,align='J',fill=0) -> None:
+	"""Draw text exactly as pdf.multi_cell would, from the layout cache
+
+	Produces the same page content as FPDF.multi_cell(w,h,txt,
+	border,align,fill) with the document's current font, but
+	without recomputing the line breaks of text it has seen before.
+	"""
+	if w == 0:
+		w = pdf.w - pdf.r_margin - pdf.x
+	b = 0
+	b2 = ''
+	if border:
+		if border == 1:
+			border = 'LTRB'
+			b = 'LRT'
+			b2 = 'LR'
+		else:
+			if 'L' in border:
+				b2 += 'L'
+			if 'R' in border:
+				b2 += 'R'
+			b = b2 + 'T' if 'T' in border else b2
+	lines = TextFitter(pdf).layout(txt,w,pdf.font_size_pt)
+	for n, (line, ws) in enumerate(lines):
+		if ws is None:
+			if pdf.ws > 0:
+				pdf.ws = 0
+				pdf._out('0 Tw')
+		elif align == 'J':
+			pdf.ws = ws
+			pdf._out('%.3f Tw' % (ws*pdf.k))
+		if n == len(lines)-1 and border and 'B' in border:
+			b += 'B'
+		pdf.cell(w,h,line,b,2,align,fill)
+		if border and n == 0:
+			b = b2
+	pdf.x = pdf.l_margin
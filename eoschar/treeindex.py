@@ -0,0 +1,192 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from array import array
+
+class TreeIndex:
+	"""A flat, array-backed index over a list of Choice trees
+
+	Nodes are numbered in breadth-first order, so the children
+	of any node occupy a contiguous run of ids starting at
+	first_child. A separate preorder numbering makes every
+	subtree a contiguous run as well, so descendant queries
+	are slices rather than recursive walks.
+
+	***
+
+	Attributes
+	----------
+	nodes: list
+		Choice object for each node id
+	names: list
+		Name of each node id
+	category_names: list
+		Table of distinct category strings
+	category: array
+		Index into category_names for each node, or -1 if
+		the node has no category (i.e. a root node)
+	parent: array
+		Parent id of each node, or -1 for roots
+	first_child: array
+		Id of the first child of each node, or -1 for leaves
+	child_count: array
+		Number of children of each node
+	depth: array
+		Distance of each node from its root
+	tree: array
+		Position in the tree list of the tree each node
+		belongs to
+	roots: list
+		Id of the root of each tree
+	preorder: array
+		Node ids in depth-first preorder
+	rank: array
+		Position of each node id in preorder
+	size: array
+		Number of nodes in the subtree rooted at each node,
+		including the node itself
+
+	Methods
+	-------
+	resolvePath: list
+		Resolve a saved treePath into the selected node ids
+	children: range
+		Ids of the children of a node
+	descendants: array
+		Ids of all descendants of a node, in preorder
+	leaves: list
+		Ids of the leaves of a tree
+	height: int
+		Depth of the deepest node in a tree
+	display: None
+		Print every tree as Choice.display would
+	"""
+	def __init__(self,trees):
+		self.nodes = []
+		self.names = []
+		self.category_names = []
+		self.category = array('i')
+		self.parent = array('i')
+		self.first_child = array('i')
+		self.child_count = array('i')
+		self.depth = array('i')
+		self.tree = array('i')
+		self.roots = []
+
+		category_ids = {}
+		# breadth-first numbering; queue holds (node, parent id, depth, tree)
+		queue = [(t,-1,0,i) for i,t in enumerate(trees)]
+		head = 0
+		while head < len(queue):
+			node, parent, depth, tree = queue[head]
+			node_id = head
+			head += 1
+			if parent == -1:
+				self.roots.append(node_id)
+			self.nodes.append(node)
+			self.names.append(node.name)
+			if node.category is None:
+				self.category.append(-1)
+			else:
+				if node.category not in category_ids:
+					category_ids[node.category] = len(self.category_names)
+					self.category_names.append(node.category)
+				self.category.append(category_ids[node.category])
+			self.parent.append(parent)
+			self.child_count.append(len(node.children))
+			self.first_child.append(len(queue) if node.children else -1)
+			self.depth.append(depth)
+			self.tree.append(tree)
+			for child in node.children:
+				queue.append((child,node_id,depth+1,tree))
+
+		# preorder numbering, with an explicit stack
+		n = len(self.nodes)
+		self.preorder = array('i')
+		self.rank = array('i',[0]) * n
+		self.size = array('i',[1]) * n
+		stack = list(reversed(self.roots))
+		while stack:
+			node_id = stack.pop()
+			self.rank[node_id] = len(self.preorder)
+			self.preorder.append(node_id)
+			first = self.first_child[node_id]
+			for child in range(first + self.child_count[node_id] - 1,first - 1,-1):
+				stack.append(child)
+		# subtree sizes: children always have larger BFS ids than
+		# their parent, so one reverse pass accumulates them
+		for node_id in range(n-1,-1,-1):
+			if self.parent[node_id] != -1:
+				self.size[self.parent[node_id]] += self.size[node_id]
+
+	def __len__(self):
+		return len(self.nodes)
+
+	def __repr__(self):
+		return f"<Instance of TreeIndex | {len(self.roots)} trees, {len(self.nodes)} nodes>"
+
+	def resolvePath(self,tree_path) -> list:
+		"""Resolve a saved treePath into the selected node ids
+
+		Walks every tree in order, consuming one path element
+		per level, exactly as the path was recorded by
+		Interface.runTree. Root nodes are not included. Raises
+		IndexError if the path does not fit the trees.
+
+		***
+
+		Parameters
+		----------
+		tree_path: list
+			Child positions, as in CharacterSheet.treePath
+		"""
+		selected = []
+		i = 0
+		first_child = self.first_child
+		child_count = self.child_count
+		for node_id in self.roots:
+			while child_count[node_id] > 0:
+				j = tree_path[i]
+				if not 0 <= j < child_count[node_id]:
+					raise IndexError(f"Choice {j} out of range for '{self.names[node_id]}', which has {child_count[node_id]} options")
+				node_id = first_child[node_id] + j
+				selected.append(node_id)
+				i += 1
+		return selected
+
+	def children(self,node_id) -> range:
+		"""Return the ids of the children of node_id"""
+		first = self.first_child[node_id]
+		return range(first,first + self.child_count[node_id])
+
+	def descendants(self,node_id) -> array:
+		"""Return the ids of all descendants of node_id, in preorder"""
+		start = self.rank[node_id]
+		return self.preorder[start+1:start+self.size[node_id]]
+
+	def leaves(self,tree) -> list:
+		"""Return the ids of the leaves of the tree at position 'tree'"""
+		root = self.roots[tree]
+		if self.child_count[root] == 0:
+			return [root]
+		return [d for d in self.descendants(root) if self.child_count[d] == 0]
+
+	def height(self,tree) -> int:
+		"""Return the depth of the deepest node in the tree at position 'tree'"""
+		root = self.roots[tree]
+		return max((self.depth[d] for d in self.descendants(root)),default=0)
+
+	def display(self) -> None:
+		"""Print every tree in the same format as Choice.display"""
+		for node_id in self.preorder:
+			level = self.depth[node_id]
+			name = self.names[node_id]
+			category = self.category_names[self.category[node_id]] if self.category[node_id] != -1 else None
+			if level == 0:
+				outString = f"{name} ({category})" if category is not None else name
+				if self.nodes[node_id].root_id is not None:
+					outString += f" | <tree {self.nodes[node_id].root_id}>"
+			else:
+				outString = ("| " * (level-1)) + "|-" + (f"{name} ({category})" if category is not None else f"{name}")
+			print(outString)
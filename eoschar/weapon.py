@@ -2,6 +2,11 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
+from functools import lru_cache
+from .func import getModel
+
+MOD_LEVELS = ("A","B","C")
+
 class Weapon:
 	"""A class to represent an EoS weapon
 
@@ -17,6 +22,32 @@ class Weapon:
 	version of itself. The _attributes are the raw
 	values for this weapon, while the normal attributes
 	are those values after modifications.
+
+	range, reach, accuracy and ap are computed from the raw
+	values and the stack of modifications, when first read
+	after the stack changes. Results are shared by every
+	weapon with the same raw values and stack, so trying
+	out, adding and removing modifications is cheap.
+
+	stack: tuple
+		Names of the modifications, in the order applied
+	special: list
+	modifications: dict
+		Names of the modifications by level
+
+	Methods
+	-------
+	addModification: None
+	removeModification: bool
+	preview: tuple
+		Range, reach, accuracy and AP with more
+		modifications, without applying them
+	copy: Weapon
+	record: dict
+		Compact description: base type, name and
+		modifications
+	fromRecord: Weapon
+		Rebuild a weapon from its record
 	"""
 	def __init__(self,**kwargs):
 		# immutable version of paired attributes
@@ -26,11 +57,13 @@ class Weapon:
 			self._reach = 1
 		self._accuracy = kwargs.get('accuracy',0)
 		self._ap = kwargs.get("ap",1)
-		# live version of paired attribues
-		self.range = self._range
-		self.reach = self._reach
-		self.accuracy = self._accuracy
-		self.ap = self._ap
+		# modifications in the order applied; the live
+		# version of paired attributes follows from these
+		self._stack = []
+		self._stats = None
+		# live stats of old saves whose modifications
+		# were never recorded; the stack starts from these
+		self._unrecorded = None
 		# non-paired attributes
 		self.name = kwargs['name']
 		self.type = kwargs.get('type',self.name)
@@ -41,6 +74,179 @@ class Weapon:
 	def __repr__(self):
 		return f"<Instance of Weapon | name={self.name}>"
 
+	def __setstate__(self,state):
+		if "_stack" not in state:
+			# saved before the stack: live stats were stored,
+			# and modifications were kept by level, if at all
+			live = tuple(state.pop(field) for field in ("range","reach","accuracy","ap"))
+			state["_stack"] = [name for level in MOD_LEVELS for name in state["modifications"][level]]
+			raw = (state["_range"],state["_reach"],state["_accuracy"],state["_ap"])
+			state["_unrecorded"] = live if len(state["_stack"]) == 0 and live != raw else None
+		state["_stats"] = None
+		self.__dict__.update(state)
+
+	def _base(self) -> tuple:
+		if self._unrecorded is not None:
+			return self._unrecorded
+		return (self._range,self._reach,self._accuracy,self._ap)
+
+	def _live(self) -> tuple:
+		if self._stats is None:
+			self._stats = _effectiveStats(self._base(),tuple(self._stack))
+		return self._stats
+
+	@property
+	def range(self):
+		return self._live()[0]
+
+	@property
+	def reach(self):
+		return self._live()[1]
+
+	@property
+	def accuracy(self):
+		return self._live()[2]
+
+	@property
+	def ap(self):
+		return self._live()[3]
+
+	@property
+	def stack(self) -> tuple:
+		return tuple(self._stack)
+
+	def addModification(self,modification) -> None:
+		"""Push a modification onto the stack, without checking that it fits
+
+		The modification must be one of modificationCatalog();
+		see Modification.apply.
+		"""
+		self._stack.append(modification.name)
+		self._stats = None
+		if modification.special is not None:
+			self.special.append(modification.special)
+		self.modifications[modification.level].append(modification.name)
+
+	def removeModification(self,modification) -> bool:
+		"""Take the most recently applied copy of a modification off the weapon
+
+		Returns False if the weapon does not have it.
+		"""
+		names = self.modifications[modification.level]
+		if modification.name not in names:
+			return False
+		del names[len(names)-1-names[::-1].index(modification.name)]
+		if modification.name in self._stack:
+			del self._stack[len(self._stack)-1-self._stack[::-1].index(modification.name)]
+			self._stats = None
+		if modification.special is not None and modification.special in self.special:
+			del self.special[len(self.special)-1-self.special[::-1].index(modification.special)]
+		return True
+
+	def preview(self,modifications) -> tuple:
+		"""Return (range, reach, accuracy, ap) as if modifications (names) were applied on top"""
+		return _effectiveStats(self._base(),tuple(self._stack)+tuple(modifications))
+
+	def copy(self):
+		"""Return an independent copy; cheaper than copy.deepcopy"""
+		weapon = Weapon.__new__(Weapon)
+		weapon.__dict__.update(self.__dict__)
+		weapon._stack = list(self._stack)
+		weapon.special = list(self.special)
+		weapon.modifications = {level:list(names) for level,names in self.modifications.items()}
+		return weapon
+
+	def _state(self) -> tuple:
+		return (self.name,self.type,self.heavy,self._range,self._reach,self._accuracy,self._ap,self.range,self.reach,self.accuracy,self.ap,tuple(self.special),tuple(tuple(self.modifications[l]) for l in MOD_LEVELS))
+
+	def record(self) -> dict:
+		"""Return the weapon as its base type, name and modifications
+
+		Keys: 'type' (a key of model_weapons.json), 'name' if
+		the weapon is renamed, and 'modifications' (names, in
+		the order applied) if it has any. Everything else
+		follows from the model files; see fromRecord.
+
+		The order across levels matters (specials are listed,
+		and some effects set rather than add). It is the stack,
+		unless modifications were added to the weapon by hand;
+		then the first order that rebuilds this weapon exactly
+		is used. Returns None if no record rebuilds it, e.g. a
+		weapon edited by hand.
+		"""
+		orders = _interleavings([self.modifications[l] for l in MOD_LEVELS])
+		if sorted(self._stack) == sorted(name for l in MOD_LEVELS for name in self.modifications[l]):
+			orders = [tuple(self._stack)]
+		for order in orders:
+			record = {"type":self.type}
+			if self.name != self.type:
+				record["name"] = self.name
+			if len(order) > 0:
+				record["modifications"] = list(order)
+			try:
+				if Weapon.fromRecord(record)._state() == self._state():
+					return record
+			except ValueError:
+				return None
+		return None
+
+	@classmethod
+	def fromRecord(cls,record):
+		"""Build a weapon from Weapon.record, applying its modifications to the base profile
+
+		Raises ValueError if the base type or a modification is
+		unknown, or a modification does not fit.
+		"""
+		try:
+			weapon = cls(**getModel("model_weapons.json")[record["type"]])
+			catalog = modificationCatalog()
+			for name in record.get("modifications",[]):
+				if not catalog[name].fits(weapon) or not catalog[name].apply(weapon):
+					raise ValueError(f"Cannot apply {name} to {weapon.name}")
+		except KeyError as e:
+			raise ValueError(f"Unknown weapon or modification {e}")
+		weapon.name = record.get("name",weapon.name)
+		return weapon
+
+
+def _interleavings(sequences):
+	"""Yield every merge of sequences that keeps each one's own order, concatenation first"""
+	sequences = [s for s in sequences if len(s) > 0]
+	if len(sequences) == 0:
+		yield ()
+		return
+	for i, s in enumerate(sequences):
+		rest = sequences[:i] + [s[1:]] + sequences[i+1:]
+		for tail in _interleavings(rest):
+			yield (s[0],) + tail
+
+
+def asWeapon(w) -> Weapon:
+	"""Return a new Weapon from a model profile (dict) or a copy of a Weapon
+
+	Weapon lists hold both: profiles picked from model_weapons.json
+	and Weapons granted by the choice trees, which are shared with
+	the trees and must not be modified in place.
+	"""
+	if isinstance(w,Weapon):
+		return w.copy()
+	return Weapon(**w)
+
+
+@lru_cache(maxsize=4096)
+def _effectiveStats(base,stack) -> tuple:
+	"""(range, reach, accuracy, ap) of raw stats base after the named modifications in stack"""
+	weapon_range, reach, accuracy, ap = base
+	catalog = modificationCatalog()
+	for name in stack:
+		modification = catalog[name]
+		weapon_range = modification.range(weapon_range)
+		reach = modification.reach(reach)
+		accuracy = modification.accuracy(accuracy)
+		ap = modification.ap(ap)
+	return weapon_range, reach, accuracy, ap
+
+
 class Modification:
 	"""A class to represent an EoS modification
 
@@ -60,6 +266,9 @@ class Modification:
 		the weapon has insufficient slots or does
 		not meet the prerequisites, returns False.
 		Otherwise returns True.
+	fits: -> bool
+		Checks slots and prerequisites without
+		applying anything.
 	range: int
 		Takes input range and modifies it according
 		to how the mod works.
@@ -103,32 +312,44 @@ class Modification:
 			Weapon object to which the modification
 			is being applied.
 		"""
+		if not self.fits(weapon,warn=True):
+			return False
+		weapon.addModification(self)
+		return True
+
+	def fits(self,weapon:Weapon,warn=False) -> bool:
+		"""Checks whether the modification can be applied to a weapon
+
+		Returns False if the weapon has no free slot of this
+		level or does not meet the prerequisites.
+
+		***
+
+		Parameters
+		----------
+		weapon: Weapon
+		warn: bool
+			Default False. Whether to log the reason the
+			modification does not fit.
+		"""
 		# check if slots are available
 		if self.level in ["B","C"]:
 			if (len(weapon.modifications["B"]) + len(weapon.modifications["C"])) > 0:
-				log.warning(f"Cannot add a new level {self.level} modification; {weapon.name} already has a level B or C modification.")
+				if warn:
+					log.warning(f"Cannot add a new level {self.level} modification; {weapon.name} already has a level B or C modification.")
 				return False
 		elif self.level == "A":
 			nMods = len(weapon.modifications['A'])
 			if nMods > 2:
-				log.warning(f"Cannot add a new level {self.level} modification; {weapon.name} already has {nMods} level A modification(s).")
+				if warn:
+					log.warning(f"Cannot add a new level {self.level} modification; {weapon.name} already has {nMods} level A modification(s).")
 				return False
 		# check prerequisites
 		if len(self.prerequisites) != 0:
 			if not any([(p == weapon.type) for p in self.prerequisites]):
-				log.warning(f"Failed to meet prerequisites. Weapon must be one of {self.prerequisites}")
+				if warn:
+					log.warning(f"Failed to meet prerequisites. Weapon must be one of {self.prerequisites}")
 				return False
-		try:
-			# actually do the application
-			weapon.range = self.range(weapon.range)
-			weapon.reach = self.reach(weapon.reach)
-			weapon.ap = self.range(weapon.ap)
-			weapon.accuracy = self.range(weapon.accuracy)
-			if self.special is not None:
-				weapon.special.append(self.special)
-		except:
-			log.exception(f"Failed to apply {self.name} to {weapon.name}")
-			return False
 		return True
 
 	def remove(self,weapon:Weapon) -> bool:
@@ -143,8 +364,40 @@ class Modification:
 		----------
 		weapon: Weapon
 		"""
-		if self.name not in weapon.modifications[self.level]:
+		if not weapon.removeModification(self):
 			log.warning(f"{weapon.name} does not have {self.name} applied.")
 			return False
-		log.warning("Remove method not implemented because it's very hard. Reach/ap/accuracy functions are not guaranteed reversable.")
-		return False
\ No newline at end of file
+		return True
+
+
+@lru_cache(maxsize=1)
+def modificationCatalog() -> dict:
+	"""Return every modification by name, built once per process
+
+	The model file gives names, levels, specials and
+	prerequisites; the effects on range, reach, AP and accuracy
+	are defined here. Modifications are not changed by use, so
+	one set is shared by every AssignAbstractGear and weapon record.
+	"""
+	modification_model = getModel('model_modifications.json')
+	effects = {
+		## level A
+		"Bolt-Thrower":{"range":lambda r: 50},
+		"Breacher Muzzle":{"range":lambda r: 20},
+		"Chem-Pipes":{},
+		"Concealable":{},
+		"Double-Barrel":{},
+		"Gene-Lock":{},
+		"Large":{"reach":lambda r: r+1},
+		"Stealth Mod":{},
+		## level B
+		"Auto Targeter":{"accuracy":lambda a: a+1},
+		"Brutal":{"reach":lambda r: r+1},
+		"Paired":{"reach":lambda r: 2},
+		"Plas-Core":{"reach":lambda r: r+1},
+		"Resin Tank":{},
+		"Shock Wires":{},
+		"Overcharged Plas-Core":{"ap":lambda a: 3},
+		"Chemtrace Ammunition":{}
+	}
+	return {name:Modification(**modification_model[name],**effect) for name,effect in effects.items()}
@@ -0,0 +1,145 @@
+"""Precomputed weapon and modification table
+
+Every base weapon in model_weapons.json can take at most three level A
+modifications and one level B or C modification, each only if the
+weapon type meets its prerequisites (see Modification.fits). That is a
+few thousand legal modification sequences in all, so WeaponTable works
+them all out once and answers from dictionaries:
+
+* which modifications fit a weapon next depends only on its type and
+  how many A and B/C slots are taken;
+* the outcome (stats, specials) of a sequence is looked up by the
+  base type and the modification names, in the order applied, since
+  some effects set a value rather than add to it.
+
+weaponTable() builds the table for the loaded rules once per process.
+"""
+
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from collections import namedtuple
+from functools import lru_cache
+from .func import getModel, FrozenDict
+from .weapon import Weapon, MOD_LEVELS, modificationCatalog, _effectiveStats
+
+# slots, as in Modification.fits
+A_SLOTS = 3
+BC_SLOTS = 1
+
+Outcome = namedtuple("Outcome",("range","reach","accuracy","ap","special","modifications"))
+
+
+class WeaponTable:
+	"""Legal modifications and their outcomes for every base weapon
+
+	***
+
+	Attributes
+	----------
+	catalog: dict
+		Modification name : Modification
+
+	Methods
+	-------
+	options: tuple
+		Modifications that fit a weapon next
+	compatible: tuple
+		Modifications whose prerequisites a weapon type meets
+	fits: bool
+	legal: bool
+		Whether a sequence of modifications can be applied
+		to a base weapon
+	outcome: Outcome
+		Stats and specials after a sequence of modifications
+	combinations: iterator
+		Every legal sequence for a base weapon, with its outcome
+	"""
+	def __init__(self,weapon_model=None,catalog=None):
+		weapon_model = getModel('model_weapons.json') if weapon_model is None else weapon_model
+		self.catalog = modificationCatalog() if catalog is None else catalog
+		# (type, A slots taken, B/C slots taken) : {level or None : modifications}
+		self._options = {}
+		# (type, modification names) : Outcome
+		self._outcomes = {}
+		for profile in weapon_model.values():
+			weapon = Weapon(**profile)
+			compatible = [m for m in self.catalog.values() if len(m.prerequisites) == 0 or weapon.type in m.prerequisites]
+			for a in range(A_SLOTS+1):
+				for bc in range(BC_SLOTS+1):
+					fitting = tuple(m for m in compatible if (a < A_SLOTS if m.level == "A" else bc < BC_SLOTS))
+					self._options[(weapon.type,a,bc)] = {level:tuple(m for m in fitting if m.level == level) for level in MOD_LEVELS}
+					self._options[(weapon.type,a,bc)][None] = fitting
+			base = (weapon._range,weapon._reach,weapon._accuracy,weapon._ap)
+			self._build(weapon.type,base,(),tuple(weapon.special),((),(),()))
+
+	def __repr__(self):
+		return f"<Instance of WeaponTable | {len(self)} weapon outcomes>"
+
+	def __len__(self):
+		return len(self._outcomes)
+
+	@staticmethod
+	def _slots(weapon) -> tuple:
+		m = weapon.modifications
+		return (weapon.type,len(m["A"]),len(m["B"])+len(m["C"]))
+
+	def _build(self,weapon_type,base,names,special,by_level) -> None:
+		# what Weapon.addModification does, on tuples
+		self._outcomes[(weapon_type,names)] = Outcome(*_effectiveStats(base,names),special,FrozenDict(zip(MOD_LEVELS,by_level)))
+		for modification in self._options[(weapon_type,len(by_level[0]),len(by_level[1])+len(by_level[2]))][None]:
+			i = MOD_LEVELS.index(modification.level)
+			self._build(
+				weapon_type,base,names+(modification.name,),
+				special if modification.special is None else special+(modification.special,),
+				by_level[:i]+(by_level[i]+(modification.name,),)+by_level[i+1:]
+			)
+
+	def options(self,weapon,level=None) -> tuple:
+		"""Return the modifications that fit weapon next, in catalog order
+
+		***
+
+		Parameters
+		----------
+		weapon: Weapon
+		level: str
+			"A", "B" or "C"; default None for every level
+		"""
+		options = self._options.get(self._slots(weapon))
+		if options is None:
+			# not a base weapon type, or edited past the slot limits
+			return tuple(m for m in self.catalog.values() if (level is None or m.level == level) and m.fits(weapon))
+		return options[level]
+
+	def compatible(self,weapon_type,level=None) -> tuple:
+		"""Return the modifications whose prerequisites weapon_type meets, ignoring slots"""
+		options = self._options.get((weapon_type,0,0))
+		if options is None:
+			return tuple(m for m in self.catalog.values() if (level is None or m.level == level) and (len(m.prerequisites) == 0 or weapon_type in m.prerequisites))
+		return options[level]
+
+	def fits(self,weapon,modification) -> bool:
+		"""Same answer as modification.fits(weapon), for a modification in the catalog"""
+		return modification in self.options(weapon,modification.level)
+
+	def legal(self,weapon_type,names) -> bool:
+		"""Whether the modifications (names, in order) can all be applied to a new weapon_type"""
+		return (weapon_type,tuple(names)) in self._outcomes
+
+	def outcome(self,weapon_type,names) -> Outcome:
+		"""Return the Outcome of applying names, in order, to a new weapon_type, or None if not legal"""
+		return self._outcomes.get((weapon_type,tuple(names)))
+
+	def combinations(self,weapon_type):
+		"""Yield (names, Outcome) for every legal modification sequence of weapon_type, none first"""
+		for (t,names), outcome in self._outcomes.items():
+			if t == weapon_type:
+				yield names, outcome
+
+
+@lru_cache(maxsize=1)
+def weaponTable() -> WeaponTable:
+	"""Return the table for the loaded rules, building it on first use"""
+	return WeaponTable()
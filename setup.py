@@ -26,6 +26,10 @@ setup(name='eoschar',
 	install_requires=[
 		"fpdf"
 		],
+	# optional dependencies
+	extras_require={
+		"analytics":["numpy"]
+		},
 	# tests
 	test_suite='nose.collector',
 	tests_require=[
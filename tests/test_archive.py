@@ -0,0 +1,94 @@
+"""The character archive round-trips saves and survives unfinished appends"""
+
+import glob, os, tempfile, unittest
+from eoschar.archive import CharacterArchive, FRAME
+from eoschar.generator import generate
+
+
+class TestArchive(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.saves_dir = tempfile.TemporaryDirectory()
+		generate(6,cls.saves_dir.name,seed=13,jobs=1)
+		cls.saves = {}
+		for path in sorted(glob.glob(os.path.join(cls.saves_dir.name,"*.txt"))):
+			with open(path,'rb') as rf:
+				cls.saves[os.path.basename(path)[:-4]] = rf.read()
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.saves_dir.cleanup()
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name,"party.eosa")
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_round_trip(self):
+		with CharacterArchive(self.path) as archive:
+			self.assertEqual(archive.appendBytes(self.saves.items()),6)
+			self.assertEqual(archive.names(),sorted(self.saves))
+			for name, raw in self.saves.items():
+				self.assertEqual(archive.read(name),raw)
+			name = sorted(self.saves)[0]
+			self.assertEqual(archive.load(name).choice_names["Name"],name)
+			self.assertEqual(archive.remove([name,"nobody"]),1)
+			self.assertNotIn(name,archive)
+			self.assertGreater(archive.compact(),0)
+			self.assertEqual(len(archive),5)
+			for other, raw in self.saves.items():
+				if other != name:
+					self.assertEqual(archive.read(other),raw)
+		with CharacterArchive(self.path) as reopened:
+			self.assertEqual(reopened.names(),sorted(set(self.saves)-{name}))
+
+	def test_reader_sees_later_appends(self):
+		names = sorted(self.saves)
+		with CharacterArchive(self.path) as writer, CharacterArchive(self.path) as reader:
+			writer.appendBytes([(names[0],self.saves[names[0]])])
+			self.assertTrue(reader.refresh())
+			writer.appendBytes([(name,self.saves[name]) for name in names[1:]])
+			# replacing keeps the newest
+			writer.appendBytes([(names[0],self.saves[names[1]])])
+			self.assertTrue(reader.refresh())
+			self.assertFalse(reader.refresh())
+			self.assertEqual(reader.names(),names)
+			self.assertEqual(reader.read(names[0]),self.saves[names[1]])
+
+	def test_unfinished_append(self):
+		names = sorted(self.saves)
+		with CharacterArchive(self.path) as archive:
+			archive.appendBytes([(names[0],self.saves[names[0]])])
+			committed = os.path.getsize(self.path)
+			archive.appendBytes([(names[1],self.saves[names[1]])])
+		# cut the second append off halfway through its character frame
+		with open(self.path,'r+b') as wf:
+			wf.truncate(committed + FRAME.size + 10)
+		with CharacterArchive(self.path) as archive:
+			self.assertEqual(archive.names(),[names[0]])
+			self.assertEqual(archive.read(names[0]),self.saves[names[0]])
+			# the next writer discards the torn bytes
+			archive.appendBytes([(names[2],self.saves[names[2]])])
+			self.assertEqual(archive.names(),[names[0],names[2]])
+		with CharacterArchive(self.path) as reopened:
+			self.assertEqual(reopened.read(names[2]),self.saves[names[2]])
+
+	def test_corrupt_record(self):
+		name = sorted(self.saves)[0]
+		with CharacterArchive(self.path) as archive:
+			archive.appendBytes([(name,self.saves[name])])
+		with open(self.path,'r+b') as wf:
+			wf.seek(wf.read().index(self.saves[name]) + 5)
+			byte = wf.read(1)
+			wf.seek(-1,1)
+			wf.write(bytes([byte[0] ^ 0xFF]))
+		with CharacterArchive(self.path) as archive:
+			with self.assertRaises(ValueError):
+				archive.read(name)
+
+
+if __name__ == '__main__':
+	unittest.main()
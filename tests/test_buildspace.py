@@ -0,0 +1,220 @@
+"""BuildSpace counts agree with brute-force enumeration, and samples uniformly"""
+
+import itertools, math, random, unittest
+from collections import Counter
+from eoschar.buildspace import BuildSpace, _GearSpace, _pointBudget
+from eoschar.charactersheet import CharacterSheet
+from eoschar.choice import AssignAbstractGear
+from eoschar.func import getModel
+from eoschar.gear import gearCatalog
+from eoschar.options import getTrees
+from eoschar.weapon import Weapon, MOD_LEVELS, asWeapon
+
+
+def _after(sheet,choice):
+	"""A fresh sheet replaying sheet's choices and then choice"""
+	after = CharacterSheet()
+	after.data = sheet.data + [choice]
+	after.filled = True
+	after.flush()
+	return after
+
+
+def _leaves(node,sheet):
+	"""Yield the sheet at the end of every legal path through node"""
+	if len(node.children) == 0:
+		yield sheet
+		return
+	for child in node.children:
+		if child.checkPrerequisites(sheet):
+			yield from _leaves(child,_after(sheet,child))
+
+
+def _spends(node,sheet) -> int:
+	"""Ways of spending all of a Skills PointBuy's points, one skill at a time"""
+	skills = sorted(node.categories.keys())
+	def ways(i,points):
+		if i == len(skills):
+			return 1 if points == 0 else 0
+		total = 0
+		cost = 0
+		for level in range(sheet.skills[skills[i]]['level'],node.max_level+1):
+			if level > sheet.skills[skills[i]]['level']:
+				cost += node.points_per_level[level]
+			if cost <= points:
+				total += ways(i+1,points-cost)
+		return total
+	return ways(0,node.starting_points)
+
+
+def _trivia(node,sheet) -> set:
+	"""Every set of trivia known after spending all of a Trivia PointBuy's points"""
+	outcomes = set()
+	topics = sorted(getModel('model_trivia.json'))
+	for picks in itertools.combinations(topics,node.starting_points):
+		tree = node.clone()
+		tree.load(sheet.trivia)
+		if all(tree.levelUp(topic) for topic in picks) and tree.current_points == 0:
+			outcomes.add(frozenset(_after(sheet,tree).trivia))
+	return outcomes
+
+
+def _weaponKey(weapon) -> tuple:
+	"""A weapon as it was before any abstract modifications were assigned"""
+	return (weapon.name,weapon.type,tuple(tuple(weapon.modifications[l]) for l in MOD_LEVELS))
+
+
+def _modified(bases,weapons,owed,added):
+	"""Yield every multiset of weapons reachable by applying up to owed modifications
+
+	bases are the _weaponKey of each weapon before any were applied.
+	"""
+	yield tuple(sorted(zip(bases,(tuple(sorted(names)) for names in added))))
+	for i, level in enumerate(MOD_LEVELS):
+		if owed[i] == 0:
+			continue
+		for modification in gearCatalog().levels("modifications")[level]:
+			for j, weapon in enumerate(weapons):
+				if modification.fits(weapon):
+					applied = weapon.copy()
+					modification.apply(applied)
+					yield from _modified(
+						bases,
+						weapons[:j]+[applied]+weapons[j+1:],
+						owed[:i]+(owed[i]-1,)+owed[i+1:],
+						added[:j]+[added[j]+[modification.name]]+added[j+1:]
+					)
+
+
+def _gear(sheet) -> int:
+	"""Number of ways to assign sheet's abstract gear, by enumeration"""
+	weapons = gearCatalog().levels("weapons")
+	varieties = []
+	for variety, n in sheet._abstract_weapons.items():
+		options = weapons["Melee"]+weapons["Ranged"] if variety == "Any" else weapons[variety]
+		varieties.append(list(itertools.combinations_with_replacement(options,n)))
+	owed = tuple(sheet._abstract_modifications[l] for l in MOD_LEVELS)
+	armed = set()
+	for picks in itertools.product(*varieties):
+		held = [asWeapon(w) for w in sheet._raw_weapons] + [asWeapon(w) for variety in picks for w in variety]
+		armed |= set(_modified([_weaponKey(w) for w in held],held,owed,[[] for w in held]))
+	total = len(armed)
+	for kind in ("ammunition","potions","grenades","kits"):
+		for level, n in getattr(sheet,f"_abstract_{kind}").items():
+			total *= len(list(itertools.combinations_with_replacement(gearCatalog().levels(kind).get(level,()),n)))
+	return total
+
+
+def _chiSquare(counts,outcomes) -> float:
+	"""Pearson's statistic for counts against a uniform distribution over outcomes"""
+	expected = sum(counts.values())/outcomes
+	return sum((n-expected)**2/expected for n in counts.values()) + (outcomes-len(counts))*expected
+
+
+def _count(trees,sheet) -> int:
+	if len(trees) == 0:
+		return 1
+	tree, rest = trees[0], trees[1:]
+	if tree.name == "Skills":
+		return _spends(tree,sheet) * _count(rest,_after(sheet,tree))
+	if tree.name == "Trivia":
+		return len(_trivia(tree,sheet)) * _count(rest,_after(sheet,tree))
+	if tree.name == "Assign Abstract Gear":
+		return _gear(sheet) * _count(rest,_after(sheet,tree))
+	return sum(_count(rest,leaf) for leaf in _leaves(tree,sheet))
+
+
+class TestBuildSpace(unittest.TestCase):
+
+	def setUp(self):
+		self.trees = {tree.name:tree for tree in getTrees()}
+
+	def check(self,names):
+		trees = [self.trees[name] for name in names]
+		self.assertEqual(BuildSpace(trees=trees).total(),_count(trees,CharacterSheet()))
+
+	def test_choice_trees(self):
+		# Talent has prerequisites on Species
+		self.check(["Species","Talent","Shooting and Fighting Dice","Training"])
+
+	def test_point_buy(self):
+		self.check(["Species","Skills"])
+
+	def test_trivia(self):
+		# some backgrounds already teach trivia
+		self.check(["Background","Trivia"])
+
+	def test_gear(self):
+		self.check(["Background","Assign Abstract Gear"])
+
+	def _gearSheet(self,modifications,potions) -> CharacterSheet:
+		"""A sheet owing a small amount of abstract gear, with a pistol and a modified long arm"""
+		sheet = CharacterSheet()
+		sheet._raw_weapons = [getModel("model_weapons.json")["Pistol"],Weapon.fromRecord({"type":"Long Arm","modifications":["Auto Targeter"]})]
+		sheet._abstract_weapons["Ranged"] = 1
+		sheet._abstract_modifications.update(modifications)
+		sheet._abstract_potions["A"] = potions
+		return sheet
+
+	def test_weapons_and_modifications(self):
+		sheet = self._gearSheet({"A":2,"B":1},2)
+		self.assertEqual(_GearSpace(AssignAbstractGear(name="Assign Abstract Gear"),sheet).count(),_gear(sheet))
+
+	def test_sample_gear_uniformly(self):
+		sheet = self._gearSheet({"A":1},1)
+		space = _GearSpace(AssignAbstractGear(name="Assign Abstract Gear"),sheet)
+		outcomes = space.count()
+		rng = random.Random(1)
+		counts = Counter()
+		for i in range(60*outcomes):
+			weapons, assigned, gear = space.sample(rng)
+			counts[(tuple(sorted((_weaponKey(asWeapon(w)),tuple(sorted(m.name for m in mods))) for w,mods in assigned)),tuple(sorted(gear)))] += 1
+		self.assertEqual(len(counts),outcomes)
+		df = outcomes-1
+		self.assertLess(_chiSquare(counts,outcomes),df+5*math.sqrt(2*df))
+
+	def test_sample_trivia_uniformly(self):
+		background = self.trees["Background"]
+		sheet = next(leaf for leaf in _leaves(background,CharacterSheet()) if len(leaf.trivia) > 0)
+		budget = _pointBudget(self.trees["Trivia"],sheet,getModel('model_trivia.json'))
+		outcomes = budget.count()
+		rng = random.Random(2)
+		counts = Counter(frozenset(budget.sample(rng)) for i in range(60*outcomes))
+		self.assertEqual(len(counts),outcomes)
+		self.assertTrue(all(topic not in sheet.trivia for topics in counts for topic in topics))
+		df = outcomes-1
+		self.assertLess(_chiSquare(counts,outcomes),df+5*math.sqrt(2*df))
+
+	def test_sample_uniformly(self):
+		names = ["Species","Talent"]
+		space = BuildSpace(trees=[self.trees[name] for name in names])
+		outcomes = space.total()
+		rng = random.Random(3)
+		counts = Counter()
+		for i in range(20*outcomes):
+			sheet = space.sample(rng)
+			# only the trees that were counted are replayed
+			self.assertEqual([tree.name for tree in sheet.options],names)
+			counts[tuple(choice.name for choice in sheet.data)] += 1
+		legal = set(tuple(choice.name for choice in leaf.data) for species in _leaves(self.trees["Species"],CharacterSheet()) for leaf in _leaves(self.trees["Talent"],species))
+		self.assertLessEqual(set(counts),legal)
+		self.assertEqual(len(counts),outcomes)
+		df = outcomes-1
+		self.assertLess(_chiSquare(counts,outcomes),df+5*math.sqrt(2*df))
+
+	def test_tree_counts_sum_to_total(self):
+		space = BuildSpace(trees=[self.trees[name] for name in ["Species","Talent","Training"]])
+		for selections in space.treeCounts().values():
+			self.assertEqual(sum(selections.values()),space.total())
+
+	def test_sample_is_legal(self):
+		space = BuildSpace()
+		for seed in range(3):
+			sheet = space.sample(random.Random(seed))
+			loaded = CharacterSheet()
+			self.assertTrue(loaded.loadBytes(sheet.toBytes()))
+			self.assertTrue(loaded.verify())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,42 @@
+"""The rules bundle goes stale when any rules source changes"""
+
+import marshal, os, tempfile, unittest
+from eoschar import bundle
+
+
+class TestBundle(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.directory.name,"rules.bundle")
+		self.assertTrue(bundle.compileBundle(self.path))
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_current(self):
+		payload = bundle.loadBundle(self.path)
+		self.assertIsNotNone(payload)
+		# models only; the choice trees are always built from code
+		self.assertEqual(sorted(payload),["__version__","models","sources"])
+
+	def test_code_is_a_source(self):
+		names = [os.path.basename(p) for p in bundle.sourceFiles()]
+		for module in ("options.py","choice.py","effect.py"):
+			self.assertIn(module,names)
+
+	def test_edited_module_is_stale(self):
+		with open(self.path,'rb') as rf:
+			raw = rf.read()
+		payload = marshal.loads(raw[bundle.HEADER_LENGTH:])
+		for module in ("choice.py","effect.py"):
+			# as if the bundle had been compiled from an earlier version of module
+			sources = dict(payload['sources'],**{module:(0,0,"0"*40)})
+			key = bundle.sourceKey({name:source[2] for name,source in sources.items()})
+			with open(self.path,'wb') as wf:
+				wf.write(raw[:len(bundle.MAGIC)+2] + key.encode('ascii') + marshal.dumps(dict(payload,sources=sources)))
+			self.assertIsNone(bundle.loadBundle(self.path),module)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,62 @@
+"""The NumPy column store matches the saves it was built from"""
+
+import glob, os, tempfile, unittest
+from eoschar.charactersheet import CharacterSheet
+from eoschar.columns import CharacterColumns, CHOICE_COLUMNS
+from eoschar.generator import generate
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+@unittest.skipIf(np is None,"numpy is not installed")
+class TestColumns(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.saves = os.path.join(cls.directory.name,"saves")
+		generate(8,cls.saves,seed=11,jobs=1)
+		cls.sheets = []
+		for path in sorted(glob.glob(os.path.join(cls.saves,"*.txt"))):
+			sheet = CharacterSheet()
+			sheet.load(path)
+			cls.sheets.append(sheet)
+		cls.columns = CharacterColumns.build(cls.saves,jobs=1)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def test_values(self):
+		self.assertEqual(len(self.columns),8)
+		for i, sheet in enumerate(self.sheets):
+			self.assertEqual(self.columns["name"][i],sheet.choice_names["Name"])
+			self.assertEqual(self.columns.quality("Brawn")[i],int(sheet.qualities["Brawn"]))
+			self.assertEqual(self.columns["money"][i],sheet.money)
+			for column, field in CHOICE_COLUMNS.items():
+				self.assertEqual(self.columns.labels(column)[i],sheet.choice_names[field])
+				self.assertTrue(self.columns.choice(column,sheet.choice_names[field])[i])
+			for skill, values in sheet.skills.items():
+				self.assertEqual(self.columns.skill(skill)[i],values["level"])
+		self.assertFalse(self.columns.choice("species","No Such Species").any())
+
+	def test_save_load(self):
+		path = os.path.join(self.directory.name,"library.npz")
+		self.columns.save(path)
+		loaded = CharacterColumns.load(path)
+		self.assertEqual(sorted(loaded.columns),sorted(self.columns.columns))
+		for column, values in self.columns.columns.items():
+			self.assertEqual(loaded[column].dtype,values.dtype,column)
+			np.testing.assert_array_equal(loaded[column],values)
+
+	def test_parallel_build(self):
+		parallel = CharacterColumns.build(self.saves,jobs=2,batch_size=3)
+		for column, values in self.columns.columns.items():
+			np.testing.assert_array_equal(parallel[column],values)
+
+
+if __name__ == '__main__':
+	unittest.main()
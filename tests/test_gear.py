@@ -0,0 +1,93 @@
+"""Gear inventories count items and round-trip through their sheet lines"""
+
+import json, random, unittest
+from eoschar.charactersheet import CharacterSheet
+from eoschar.gear import GearInventory, COUNTED_KINDS, gearCatalog, parseGear
+from eoschar.generator import randomCharacter
+
+
+class TestGear(unittest.TestCase):
+
+	def setUp(self):
+		self.catalog = gearCatalog()
+		self.potion = self.catalog.levels("potions")["A"][0]
+		self.grenade = self.catalog.levels("grenades")["A"][0]
+		self.kit = self.catalog.levels("kits")["A"][0]
+
+	def test_catalog(self):
+		self.assertIs(gearCatalog(),self.catalog)
+		self.assertEqual(self.catalog.kinds[self.potion],"potions")
+		for name in self.catalog.counted:
+			self.assertIn(self.catalog.kinds[name],COUNTED_KINDS)
+		with self.assertRaises(TypeError):
+			self.catalog.counted = frozenset()
+
+	def test_parse_gear(self):
+		self.assertEqual(parseGear("3 Smoke Grenade"),("Smoke Grenade",3))
+		self.assertEqual(parseGear("Grappling Hook"),("Grappling Hook",1))
+		self.assertEqual(parseGear("  2   Ration Packs "),("Ration Packs",2))
+
+	def test_lines(self):
+		inventory = GearInventory()
+		for name in [self.kit,self.potion,self.grenade,"Rope","Rope"]:
+			inventory.add(name)
+		inventory.add(self.grenade,2)
+		# counted kinds show (1); other gear only shows counts above one
+		self.assertEqual(inventory.lines(),sorted([self.kit,f"{self.potion} (1)",f"{self.grenade} (3)","Rope (2)"]))
+		self.assertEqual(inventory["Rope"],2)
+		self.assertEqual(inventory["Lantern"],0)
+		self.assertEqual(inventory.kind(self.grenade),"grenades")
+		self.assertIsNone(inventory.kind("Rope"))
+		inventory.add(self.kit)
+		self.assertIn(f"{self.kit} (2)",inventory.lines())
+
+	def test_from_lines(self):
+		rng = random.Random(4)
+		names = sorted(self.catalog.kinds) + ["Rope","Lantern","Ration Packs"]
+		for i in range(50):
+			inventory = GearInventory()
+			for j in range(rng.randrange(12)):
+				inventory.add(rng.choice(names),rng.choice([1,1,2,5]))
+			loaded = GearInventory.fromLines(inventory.lines())
+			self.assertEqual(loaded,inventory)
+			self.assertEqual(loaded.lines(),inventory.lines())
+			loaded.add("Rope")
+			inventory.add("Rope")
+			self.assertEqual(loaded.lines(),inventory.lines())
+
+	def test_saved_characters(self):
+		for seed in range(5):
+			sheet = randomCharacter(random.Random(seed))
+			self.assertIsInstance(sheet.gear,GearInventory)
+			loaded = CharacterSheet()
+			self.assertTrue(loaded.loadBytes(sheet.toBytes()))
+			self.assertEqual(loaded.gear,sheet.gear)
+			self.assertEqual(loaded.gear.lines(),sheet.gear.lines())
+
+	def test_saved_as_counts(self):
+		for seed in range(5):
+			sheet = randomCharacter(random.Random(seed))
+			document = json.loads(sheet.toBytes())
+			self.assertEqual(document["snapshot"]["gear"],{"$gear":dict(sorted(sheet.gear.items()))})
+			loaded = CharacterSheet()
+			self.assertTrue(loaded.loadBytes(sheet.toBytes()))
+			# built from the saved counts, not from lines
+			self.assertIsNotNone(loaded.gear._counts)
+			self.assertEqual(loaded.gear.counts,sheet.gear.counts)
+
+	def test_version_2_saves(self):
+		# earlier saves hold gear as the lines shown on the sheet
+		for seed in range(5):
+			sheet = randomCharacter(random.Random(seed))
+			document = json.loads(sheet.toBytes())
+			document["format_version"] = 2
+			document["snapshot"]["gear"] = sheet.gear.lines()
+			loaded = CharacterSheet()
+			self.assertTrue(loaded.loadBytes(json.dumps(document).encode('utf-8')))
+			self.assertEqual(loaded.gear,sheet.gear)
+			self.assertTrue(loaded.verify())
+			self.assertEqual(loaded.toBytes(),sheet.toBytes())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,101 @@
+"""Random character generation is reproducible from its seed, and rules-legal"""
+
+import filecmp, glob, os, subprocess, sys, tempfile, unittest
+from eoschar.charactersheet import CharacterSheet
+from eoschar.choice import PointBuy, Talent
+from eoschar.generator import generate
+from eoschar.weapontable import weaponTable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GENERATE = "from eoschar.generator import generate; import sys; generate(12,sys.argv[1],seed=7,jobs=int(sys.argv[2]),batch_size=5)"
+
+
+def _generate(out_dir,hash_seed,jobs):
+	env = dict(os.environ,PYTHONHASHSEED=str(hash_seed),PYTHONPATH=ROOT,LOGLEVEL="WARNING")
+	subprocess.run([sys.executable,"-c",GENERATE,out_dir,str(jobs)],env=env,check=True)
+
+
+def _levels(tree,sheet) -> dict:
+	"""Levels a PointBuy starts from on sheet"""
+	if tree.name == "Skills":
+		return {name:skill['level'] for name,skill in sheet.skills.items()}
+	return {topic:1 for topic in sheet.trivia}
+
+
+class TestGenerate(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		generate(40,cls.directory.name,seed=3,jobs=1)
+		cls.sheets = {}
+		for path in sorted(glob.glob(os.path.join(cls.directory.name,"*.txt"))):
+			sheet = CharacterSheet()
+			assert sheet.load(path)
+			cls.sheets[os.path.basename(path)] = sheet
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def checkPointBuy(self,tree,sheet):
+		"""tree's purchases are affordable and within max_level, starting from sheet"""
+		base = _levels(tree,sheet)
+		spent = 0
+		for name, levels in tree.categories.items():
+			self.assertEqual(levels['base_levels'],base.get(name,0),name)
+			self.assertGreaterEqual(levels['bought_levels'],0)
+			if levels['bought_levels'] > 0:
+				self.assertLessEqual(levels['base_levels']+levels['bought_levels'],tree.max_level,name)
+			for level in range(levels['base_levels']+1,levels['base_levels']+levels['bought_levels']+1):
+				spent += tree.points_per_level[level]
+		self.assertGreaterEqual(tree.current_points,0)
+		self.assertLessEqual(spent,tree.starting_points)
+		self.assertEqual(tree.current_points,tree.starting_points-spent)
+
+	def test_rules_legal(self):
+		self.assertEqual(len(self.sheets),40)
+		for path, sheet in self.sheets.items():
+			# replay the choices in order: each must be legal when it was made
+			partial = CharacterSheet()
+			for choice in sheet.data:
+				if isinstance(choice,PointBuy):
+					self.checkPointBuy(choice,partial)
+				else:
+					self.assertTrue(choice.checkPrerequisites(partial),f"{path}: {choice.name}")
+				partial.apply(choice)
+				partial.data.append(choice)
+			for name, skill in sheet.skills.items():
+				self.assertLessEqual(skill['level'],3,name)
+			for weapon in sheet.weapons:
+				self.assertTrue(weaponTable().legal(weapon.type,weapon.stack),weapon.name)
+			self.assertTrue(sheet.verify())
+
+	def test_talent_is_not_the_wandering_god_quality(self):
+		# a Human who is People of the Wandering God (X) may not take the X Talent
+		wandering = 0
+		for path, sheet in self.sheets.items():
+			names = [choice.name for choice in sheet.data]
+			talents = [choice.name for choice in sheet.data if isinstance(choice,Talent)]
+			self.assertEqual(len(talents),1)
+			if f"People of the Wandering God ({talents[0]})" in names:
+				self.fail(f"{path} took the {talents[0]} Talent")
+			wandering += any(name.startswith("People of the Wandering God") for name in names)
+		self.assertGreater(wandering,0)
+
+	def test_same_seed_same_files(self):
+		# separate processes with different string hashing, and a
+		# different number of workers, must write the same bytes
+		with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+			_generate(a,1,1)
+			_generate(b,2,2)
+			names = sorted(os.listdir(a))
+			self.assertEqual(len(names),12)
+			self.assertEqual(names,sorted(os.listdir(b)))
+			match, mismatch, errors = filecmp.cmpfiles(a,b,names,shallow=False)
+			self.assertEqual(mismatch+errors,[])
+
+
+if __name__ == '__main__':
+	unittest.main()
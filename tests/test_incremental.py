@@ -0,0 +1,76 @@
+"""Incremental recomputation matches a full replay of the choices"""
+
+import random, unittest
+from eoschar import savefile
+from eoschar.charactersheet import CharacterSheet, DERIVED_FIELDS
+from eoschar.choice import TextInput
+from eoschar.generator import randomCharacter
+
+SEEDS = range(5)
+
+
+def _state(sheet) -> dict:
+	state = {field:savefile.encodeValue(getattr(sheet,field)) for field in DERIVED_FIELDS}
+	state["treePath"] = list(sheet.treePath)
+	return state
+
+
+def _replay(sheet) -> dict:
+	"""The state of a fresh sheet that flush()es the same choices"""
+	fresh = CharacterSheet()
+	fresh.options = sheet.options
+	fresh.data = list(sheet.data)
+	fresh.treePath = list(sheet.treePath)
+	fresh.filled = True
+	fresh.flush()
+	return _state(fresh)
+
+
+def _alternative(choice,parents):
+	"""Another choice that could stand in the same place"""
+	parent = parents.get(id(choice))
+	if parent is not None:
+		return next(c for c in parent.children if c is not choice)
+	if isinstance(choice,TextInput):
+		return TextInput(name=choice.name,value="Someone Else")
+	return choice.clone()
+
+
+class TestIncremental(unittest.TestCase):
+
+	def check(self,sheet,step):
+		self.assertEqual(_state(sheet),_replay(sheet),step)
+
+	def test_remove_add_replace(self):
+		for seed in SEEDS:
+			sheet = randomCharacter(random.Random(seed))
+			original = _state(sheet)
+			parents = {}
+			def walk(node):
+				for child in node.children:
+					parents[id(child)] = node
+					walk(child)
+			for tree in sheet.options:
+				walk(tree)
+			for choice in list(sheet.data):
+				self.assertTrue(sheet.removeChoice(choice))
+				self.check(sheet,f"seed {seed}, removed {choice.name}")
+				self.assertTrue(sheet.addChoice(choice))
+				self.check(sheet,f"seed {seed}, added {choice.name}")
+				other = _alternative(choice,parents)
+				self.assertTrue(sheet.replaceChoice(choice,other))
+				self.check(sheet,f"seed {seed}, replaced {choice.name} with {other.name}")
+				self.assertTrue(sheet.replaceChoice(other,choice))
+				self.check(sheet,f"seed {seed}, put back {choice.name}")
+			# every choice has been moved to the end once, in order,
+			# so the sheet is back where it started
+			self.assertEqual(_state(sheet),original)
+			# and matches a replay of its saved tree path
+			loaded = CharacterSheet()
+			loaded.loadBytes(sheet.toBytes())
+			loaded.flush()
+			self.assertEqual(_state(loaded),original)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,118 @@
+"""The character library ingests incrementally, answers queries as a scan would, and cleans up its workers"""
+
+import glob, multiprocessing, os, random, shutil, tempfile, unittest
+from unittest import mock
+from eoschar.charactersheet import CharacterSheet
+from eoschar.generator import generate
+from eoschar.library import CharacterLibrary
+
+
+class _FailingLibrary(CharacterLibrary):
+	def _store(self,*args):
+		raise RuntimeError("disk full")
+
+
+def _matches(sheet,qualities,skills,weapon,selections) -> bool:
+	"""Whether a loaded sheet meets find()'s criteria, checked directly"""
+	columns = {"species":"Species","background":"Background","training":"Training","focus":"Focus","combat_specialty":"Combat Specialty"}
+	return (
+		all(sheet.choice_names[columns[key]] == value for key, value in selections.items())
+		# smaller dice are better
+		and all(int(sheet.qualities[q]) <= die for q, die in qualities.items())
+		and all(sheet.skills[s]["level"] >= level for s, level in skills.items())
+		and (weapon is None or any(weapon in (w.name,w.type) for w in sheet.weapons))
+	)
+
+
+class TestLibrary(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.saves = os.path.join(cls.directory.name,"saves")
+		generate(6,cls.saves,seed=5,jobs=1)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def test_incremental(self):
+		with CharacterLibrary(os.path.join(self.directory.name,"incremental.db")) as library:
+			summary = library.add([self.saves],jobs=2,batch_size=2)
+			self.assertEqual((summary["added"],summary["unchanged"],summary["failed"]),(6,0,[]))
+			self.assertEqual(len(library),6)
+			summary = library.add([self.saves],jobs=2,batch_size=2)
+			self.assertEqual((summary["added"],summary["unchanged"]),(0,6))
+			name = library.list()[0]["name"]
+			self.assertEqual([row["name"] for row in library.find(name=name)],[name])
+
+	def test_find_matches_scan(self):
+		saves = os.path.join(self.directory.name,"many")
+		generate(40,saves,seed=8,jobs=1)
+		sheets = {}
+		for path in sorted(glob.glob(os.path.join(saves,"*.txt"))):
+			sheets[os.path.abspath(path)] = CharacterSheet()
+			self.assertTrue(sheets[os.path.abspath(path)].load(path))
+		weapons = sorted({w.name for sheet in sheets.values() for w in sheet.weapons} | {w.type for sheet in sheets.values() for w in sheet.weapons}) + ["Trebuchet"]
+		species = sorted({sheet.choice_names["Species"] for sheet in sheets.values()})
+		qualities, skills = list(CharacterSheet().qualities), list(CharacterSheet().skills)
+		rng = random.Random(9)
+		found = 0
+		with CharacterLibrary(os.path.join(self.directory.name,"find.db")) as library:
+			library.add([saves])
+			for i in range(300):
+				wanted_qualities = {q:rng.choice([4,6,8,10,12]) for q in rng.sample(qualities,rng.randrange(3))}
+				wanted_skills = {s:rng.randint(1,3) for s in rng.sample(skills,rng.randrange(3))}
+				weapon = rng.choice(weapons+[None]*len(weapons))
+				selections = {"species":rng.choice(species)} if rng.random() < 0.3 else {}
+				rows = library.find(qualities=wanted_qualities,skills=wanted_skills,weapon=weapon,**selections)
+				expected = sorted((sheet.choice_names["Name"],path) for path, sheet in sheets.items() if _matches(sheet,wanted_qualities,wanted_skills,weapon,selections))
+				self.assertEqual([(row["name"],row["path"]) for row in rows],expected,(wanted_qualities,wanted_skills,weapon,selections))
+				found += len(rows) > 0
+		# most queries match something, but not all
+		self.assertGreater(found,100)
+		self.assertLess(found,300)
+
+	def test_touched_and_rewritten_files(self):
+		saves = os.path.join(self.directory.name,"edited")
+		shutil.copytree(self.saves,saves)
+		paths = sorted(os.path.abspath(p) for p in glob.glob(os.path.join(saves,"*.txt")))
+		touched, rewritten, donor = paths[0], paths[1], paths[2]
+		with CharacterLibrary(os.path.join(self.directory.name,"edited.db")) as library:
+			library.add([saves])
+			# same contents, new timestamp: re-stamped without being read
+			st = os.stat(touched)
+			os.utime(touched,ns=(st.st_atime_ns,st.st_mtime_ns+10**9))
+			with mock.patch("eoschar.library._readCharacter",side_effect=AssertionError("read an unchanged file")):
+				summary = library.add([saves])
+			self.assertEqual((summary["added"],summary["updated"],summary["unchanged"],summary["failed"]),(0,0,6,[]))
+			stamp = library.connection.execute("SELECT mtime_ns FROM characters WHERE path = ?",(touched,)).fetchone()[0]
+			self.assertEqual(stamp,st.st_mtime_ns+10**9)
+			# new contents: read again and every table replaced
+			old_name = [row["name"] for row in library.list() if row["path"] == rewritten][0]
+			shutil.copyfile(donor,rewritten)
+			st = os.stat(rewritten)
+			os.utime(rewritten,ns=(st.st_atime_ns,st.st_mtime_ns+2*10**9))
+			summary = library.add([saves])
+			self.assertEqual((summary["added"],summary["updated"],summary["unchanged"],summary["failed"]),(0,1,5,[]))
+			self.assertEqual(len(library),6)
+			sheet = CharacterSheet()
+			self.assertTrue(sheet.load(donor))
+			self.assertNotIn(rewritten,[row["path"] for row in library.find(name=old_name)])
+			self.assertEqual(sorted(row["path"] for row in library.find(name=sheet.choice_names["Name"])),[rewritten,donor])
+			for table in ("qualities","skills","weapons"):
+				counts = library.connection.execute(f"SELECT c.path, COUNT(*) FROM {table} t JOIN characters c ON c.id = t.character_id WHERE c.path IN (?,?) GROUP BY c.path",(rewritten,donor)).fetchall()
+				self.assertEqual(counts[0][1],counts[1][1],table)
+			skills = {s:v["level"] for s,v in sheet.skills.items()}
+			self.assertIn(rewritten,[row["path"] for row in library.find(skills=skills,name=sheet.choice_names["Name"])])
+
+	def test_workers_shut_down_on_error(self):
+		with _FailingLibrary(os.path.join(self.directory.name,"failing.db")) as library:
+			with self.assertRaises(RuntimeError):
+				library.add([self.saves],jobs=2,batch_size=2)
+			self.assertEqual(len(library),0)
+		self.assertEqual(multiprocessing.active_children(),[])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,103 @@
+"""Batch rendering isolates failures per save and reports them"""
+
+import glob, os, pickle, shutil, tempfile, unittest
+from unittest import mock
+from eoschar.charactersheet import CharacterSheet
+from eoschar.generator import generate
+from eoschar.render import render, renderBook
+
+SUMMARY_KEYS = {"rendered","failed","seconds","sheets_per_second","latency"}
+LATENCY_KEYS = {"mean","p50","p95","max"}
+
+
+class _Crash:
+	"""Unpickles by killing the process, as a segfault or the OOM killer would"""
+	def __reduce__(self):
+		return (os._exit,(3,))
+
+
+class TestRender(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.saves = os.path.join(cls.directory.name,"saves")
+		generate(6,cls.saves,seed=17,jobs=1)
+		cls.good = sorted(glob.glob(os.path.join(cls.saves,"*.txt")))
+		cls.corrupt = os.path.join(cls.saves,"corrupt.txt")
+		with open(cls.corrupt,'wb') as wf:
+			wf.write(b'{"format":"eoschar-save","version":2,"rec')
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def setUp(self):
+		self.out = tempfile.mkdtemp(dir=self.directory.name)
+
+	def check(self,summary,rendered,failed):
+		self.assertEqual(set(summary),SUMMARY_KEYS)
+		self.assertEqual(set(summary["latency"]),LATENCY_KEYS)
+		self.assertEqual(summary["rendered"],rendered)
+		self.assertEqual(summary["failed"],failed)
+		self.assertGreater(summary["sheets_per_second"],0)
+		self.assertLessEqual(summary["latency"]["p50"],summary["latency"]["max"])
+
+	def test_corrupt_save(self):
+		for jobs in (1,2):
+			out = os.path.join(self.out,str(jobs))
+			self.check(render(self.saves,out,jobs=jobs),len(self.good),[self.corrupt])
+			for path in self.good:
+				with open(os.path.join(out,os.path.basename(path)[:-4]+".pdf"),'rb') as rf:
+					self.assertEqual(rf.read(5),b"%PDF-")
+
+	def test_worker_dies(self):
+		saves = os.path.join(self.out,"saves")
+		shutil.copytree(self.saves,saves)
+		crash = os.path.join(saves,"crash.txt")
+		with open(crash,'wb') as wf:
+			wf.write(pickle.dumps(_Crash()))
+		summary = render(saves,os.path.join(self.out,"pdfs"),jobs=2,max_pending=3)
+		self.check(summary,len(self.good),sorted([crash,os.path.join(saves,"corrupt.txt")]))
+
+	def test_timeout(self):
+		summary = render(self.saves,self.out,jobs=2,timeout=1e-6)
+		self.check(summary,0,sorted(self.good+[self.corrupt]))
+
+	def test_book(self):
+		out_path = os.path.join(self.out,"book.pdf")
+		# loaded sheets are printed from their snapshots, not replayed
+		with mock.patch.object(CharacterSheet,"flush",side_effect=AssertionError("flushed a loaded sheet")):
+			summary = renderBook(self.saves,out_path)
+		self.assertEqual(summary["rendered"],len(self.good))
+		self.assertEqual(summary["failed"],[self.corrupt])
+		with open(out_path,'rb') as rf:
+			self.assertEqual(rf.read().count(b"/Type /Page\n"),len(self.good))
+
+	def test_book_drops_unflushable_sheets(self):
+		unflushable = self.good[1]
+		load = CharacterSheet.load
+		def loadOrLeaveBlank(sheet,path):
+			# an incomplete sheet loads but cannot be flushed
+			return True if path == unflushable else load(sheet,path)
+		out_path = os.path.join(self.out,"book.pdf")
+		with mock.patch.object(CharacterSheet,"load",loadOrLeaveBlank):
+			summary = renderBook(self.saves,out_path)
+		self.assertEqual(summary["rendered"],len(self.good)-1)
+		self.assertEqual(sorted(summary["failed"]),sorted([unflushable,self.corrupt]))
+		with open(out_path,'rb') as rf:
+			self.assertEqual(rf.read().count(b"/Type /Page\n"),len(self.good)-1)
+
+	def test_output_book_reports_dropped_sheets(self):
+		sheets = [CharacterSheet() for path in self.good[:3]]
+		for sheet, path in zip(sheets,self.good):
+			self.assertTrue(sheet.load(path))
+		blank = CharacterSheet()
+		dropped = []
+		self.assertTrue(CharacterSheet.outputBook([sheets[0],blank,sheets[1],sheets[2]],os.path.join(self.out,"book.pdf"),dropped))
+		self.assertEqual(len(dropped),1)
+		self.assertIs(dropped[0],blank)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,73 @@
+"""Saves round-trip byte for byte, in any process"""
+
+import glob, os, subprocess, sys, tempfile, unittest
+from eoschar import savefile
+from eoschar.charactersheet import CharacterSheet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GENERATE = "from eoschar.generator import generate; import sys; generate(20,sys.argv[1],seed=3,jobs=1)"
+# load, verify and save again; prints the saves that changed
+RESAVE = """
+import glob, os, sys
+from eoschar.charactersheet import CharacterSheet
+for path in sorted(glob.glob(os.path.join(sys.argv[1],'*.txt'))):
+	with open(path,'rb') as rf:
+		raw = rf.read()
+	sheet = CharacterSheet()
+	if not (sheet.loadBytes(raw) and sheet.verify() and sheet.toBytes() == raw):
+		print(path)
+"""
+
+
+def _run(code,arg,hash_seed) -> str:
+	env = dict(os.environ,PYTHONHASHSEED=str(hash_seed),PYTHONPATH=ROOT,LOGLEVEL="WARNING")
+	return subprocess.run([sys.executable,"-c",code,arg],env=env,check=True,capture_output=True,text=True).stdout
+
+
+class TestSaveRoundTrip(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		_run(GENERATE,cls.directory.name,1)
+		cls.saves = []
+		for path in sorted(glob.glob(os.path.join(cls.directory.name,"*.txt"))):
+			with open(path,'rb') as rf:
+				cls.saves.append(rf.read())
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def test_dumps_loads(self):
+		self.assertEqual(len(self.saves),20)
+		for raw in self.saves:
+			document = savefile.loads(raw)
+			self.assertEqual(savefile.dumps(document["__version__"],document["record"],document["snapshot"]),raw)
+
+	def test_load_verify_save(self):
+		for raw in self.saves:
+			sheet = CharacterSheet()
+			self.assertTrue(sheet.loadBytes(raw))
+			self.assertTrue(sheet.verify())
+			self.assertEqual(sheet.toBytes(),raw)
+
+	def test_load_verify_save_other_process(self):
+		# string hashing differs from the process that wrote the saves
+		self.assertEqual(_run(RESAVE,self.directory.name,2),"")
+
+	def test_weapons_and_gear(self):
+		for raw in self.saves:
+			loaded = CharacterSheet()
+			loaded.loadBytes(raw)
+			replayed = CharacterSheet()
+			replayed.loadBytes(raw)
+			replayed.flush()
+			self.assertEqual([w.record() for w in loaded.weapons],[w.record() for w in replayed.weapons])
+			self.assertEqual(loaded.gear.lines(),replayed.gear.lines())
+			self.assertEqual(loaded.gear,replayed.gear)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,134 @@
+"""TextFitter and multiCell lay text out exactly as FPDF does"""
+
+import random, unittest
+from fpdf import FPDF
+from eoschar import textfit
+from eoschar.textfit import TextFitter, multiCell
+
+WORDS = ["a","an","the","weapon","Two-handed.","fires","Plas-Core","AP","+1","accuracy,","(see","below)","Supercalifragilisticexpialidocious","x"*40,"1/2","TN 4"]
+FONTS = [("Arial",""),("Arial","B"),("Times","I"),("Courier","")]
+
+
+def _text(rng) -> str:
+	text = " ".join(rng.choice(WORDS) for i in range(rng.randrange(40)))
+	if rng.random() < 0.2:
+		text = text.replace(" ","\n",2)
+	if rng.random() < 0.1:
+		text += "\n"
+	return text
+
+
+def _document(unit="in",c_margin=None) -> FPDF:
+	pdf = FPDF("p",unit,"Letter")
+	pdf.add_page()
+	pdf.set_margins(0,0,0)
+	pdf.set_auto_page_break(False)
+	if c_margin is not None:
+		pdf.c_margin = c_margin
+	return pdf
+
+
+def _shrinkToFit(text,width,line_height,max_height,start,step) -> float:
+	"""The loop SheetMaker used to fit weapon specials: shrink until multi_cell fits
+
+	Returns None where that loop would have run past zero.
+	"""
+	pdf = _document()
+	size = start
+	while size > 0:
+		pdf.set_font('Arial',size=size)
+		pdf.set_xy(1,1)
+		pdf.multi_cell(width,line_height,text)
+		if pdf.get_y() - 1 <= max_height:
+			return size
+		size = size - step
+	return None
+
+
+def _shrinkToWidth(pdf,text,max_width,start,step) -> float:
+	"""The loop SheetMaker used to fit names: shrink until the string is narrow enough"""
+	size = start
+	pdf.set_font('Arial',size=size)
+	while size > 0 and pdf.get_string_width(text) > max_width:
+		size -= step
+		pdf.set_font('Arial',size=size)
+	return size
+
+
+class TestTextFit(unittest.TestCase):
+
+	def setUp(self):
+		self.rng = random.Random(6)
+
+	def check(self,unit,c_margin,widths,count=150):
+		expected, actual = _document(unit,c_margin), _document(unit,c_margin)
+		for i in range(count):
+			family, style = self.rng.choice(FONTS)
+			size = self.rng.choice([4,6.5,8,10,12.25])
+			text = _text(self.rng)
+			arguments = (self.rng.choice(widths),self.rng.choice(widths)/5,text,self.rng.choice([0,1,"T","LR","B"]),self.rng.choice("LJCR"))
+			x = self.rng.choice(widths)/10
+			for pdf in (expected,actual):
+				pdf.set_font(family,style=style,size=size)
+				pdf.set_xy(x,0)
+			expected.multi_cell(*arguments)
+			multiCell(actual,*arguments)
+			self.assertEqual(actual.pages[1],expected.pages[1],text)
+			self.assertEqual((actual.x,actual.y,actual.ws),(expected.x,expected.y,expected.ws))
+			self.assertEqual(TextFitter(actual).lineBreaks(text,arguments[0],size),[l for l, ws in TextFitter(expected).layout(text,arguments[0],size)])
+
+	def test_multi_cell(self):
+		self.check("in",None,[0.83,1.5,2.35,2.85,4])
+
+	def test_other_units_and_margins(self):
+		# same widths, fonts and text as in inches: cached inch layouts must not be reused
+		self.check("in",None,[1,2,3],30)
+		self.rng.seed(6)
+		self.check("mm",None,[1,2,3],30)
+		self.rng.seed(6)
+		self.check("in",0.2,[1,2,3],30)
+
+	def test_fit_size(self):
+		pdf = _document()
+		pdf.set_font('Arial',size=8)
+		fitter = TextFitter(pdf)
+		for i in range(25):
+			text = _text(self.rng)
+			width = self.rng.choice([1.5,2.5,3])
+			# the height text takes at a size the old loop reaches quickly
+			max_height = fitter.bottom(text,width,self.rng.uniform(6,8),0.11,top=1.0) - 1 + self.rng.choice([0,0.05])
+			expected = _shrinkToFit(text,width,0.11,max_height,8,0.01)
+			if expected is not None:
+				self.assertEqual(fitter.fitSize(text,width,0.11,max_height,start=8,step=0.01),expected,text)
+
+	def test_fit_width(self):
+		pdf = _document()
+		pdf.set_font('Arial',size=8)
+		for i in range(200):
+			text = _text(self.rng)[:60]
+			max_width = self.rng.uniform(0.5,3)
+			start, step = self.rng.choice([(20,0.1),(10,0.1),(8,0.05)])
+			if pdf.get_string_width(text) == 0:
+				continue
+			expected = _shrinkToWidth(pdf,text,max_width,start,step)
+			if expected <= 0:
+				continue
+			pdf.set_font('Arial',size=start)
+			self.assertEqual(TextFitter(pdf).fitWidth(text,max_width,start,step),expected,text)
+
+	def test_caches_are_bounded(self):
+		pdf = _document()
+		pdf.set_font('Arial',size=8)
+		fitter = TextFitter(pdf)
+		for i in range(textfit.CACHE_SIZE+10):
+			fitter.stringWidth(f"text {i}",8)
+			fitter.layout(f"text {i}",1,8)
+		info = textfit.cacheInfo()
+		self.assertEqual(info["widths"],textfit.CACHE_SIZE)
+		self.assertEqual(info["layouts"],textfit.CACHE_SIZE)
+		textfit.clearCache()
+		self.assertEqual(textfit.cacheInfo(),{"widths":0,"layouts":0,"fits":0})
+
+
+if __name__ == '__main__':
+	unittest.main()
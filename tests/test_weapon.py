@@ -0,0 +1,185 @@
+"""Weapons compute stats from their modification stack and rebuild from their records"""
+
+import json, random, unittest
+from eoschar import savefile
+from eoschar.func import getModel
+from eoschar.weapon import Weapon, modificationCatalog
+
+
+def _modified(rng,weapon_type) -> Weapon:
+	"""A weapon with a random legal sequence of modifications applied"""
+	weapon = Weapon(**getModel("model_weapons.json")[weapon_type])
+	catalog = modificationCatalog()
+	for i in range(rng.randrange(5)):
+		fitting = [m for m in catalog.values() if m.fits(weapon)]
+		if len(fitting) == 0:
+			break
+		rng.choice(fitting).apply(weapon)
+	return weapon
+
+
+def _stats(weapon) -> tuple:
+	return (weapon.name,weapon.type,weapon.range,weapon.reach,weapon.accuracy,weapon.ap,weapon.special,weapon.modifications)
+
+
+def _legacy(weapon_type,live,modifications) -> Weapon:
+	"""A weapon unpickled from a save made before the stack, which stored live stats"""
+	state = dict(Weapon(**getModel("model_weapons.json")[weapon_type]).__dict__)
+	for field in ("_stack","_stats","_unrecorded"):
+		del state[field]
+	state.update(zip(("range","reach","accuracy","ap"),live))
+	state["modifications"] = {"A":[],"B":[],"C":[],**modifications}
+	weapon = Weapon.__new__(Weapon)
+	weapon.__setstate__(state)
+	return weapon
+
+
+def _saved(weapon) -> Weapon:
+	"""weapon after a trip through the save file encoding"""
+	return json.loads(json.dumps(savefile.encodeValue(weapon)),object_hook=savefile._decodeObject)
+
+
+class TestWeaponRecord(unittest.TestCase):
+
+	def setUp(self):
+		self.rng = random.Random(5)
+		self.weapons = [_modified(self.rng,weapon_type) for weapon_type in getModel("model_weapons.json") for i in range(8)]
+
+	def test_from_record(self):
+		for weapon in self.weapons:
+			record = weapon.record()
+			self.assertEqual(record["type"],weapon.type)
+			self.assertNotIn("name",record)
+			self.assertEqual(record.get("modifications",[]),list(weapon.stack))
+			self.assertEqual(_stats(Weapon.fromRecord(record)),_stats(weapon))
+
+	def test_renamed(self):
+		weapon = self.weapons[0]
+		weapon.name = "Old Faithful"
+		record = weapon.record()
+		self.assertEqual(record["name"],"Old Faithful")
+		self.assertEqual(_stats(Weapon.fromRecord(record)),_stats(weapon))
+
+	def test_added_by_hand(self):
+		# no stack, and the specials list B before A: record() finds the order
+		weapon = Weapon(**getModel("model_weapons.json")["Long Arm"])
+		catalog = modificationCatalog()
+		for name in ["Resin Tank","Double-Barrel"]:
+			weapon.modifications[catalog[name].level].append(name)
+			weapon.special.append(catalog[name].special)
+		record = weapon.record()
+		self.assertEqual(record["modifications"],["Resin Tank","Double-Barrel"])
+		self.assertEqual(_stats(Weapon.fromRecord(record)),_stats(weapon))
+
+	def test_save_round_trip(self):
+		for weapon in self.weapons:
+			encoded = savefile.encodeValue(weapon)["$weapon"]
+			self.assertNotIn("_ap",encoded)
+			self.assertEqual(_stats(_saved(weapon)),_stats(weapon))
+		# a copy, not the shared template
+		first, second = _saved(self.weapons[0]), _saved(self.weapons[0])
+		first.modifications["A"].append("Gene-Lock")
+		self.assertNotEqual(first.modifications,second.modifications)
+
+	def test_edited_by_hand(self):
+		weapon = self.weapons[0]
+		weapon._accuracy += 3
+		weapon._stats = None
+		self.assertIsNone(weapon.record())
+		encoded = savefile.encodeValue(weapon)["$weapon"]
+		self.assertEqual(encoded["_accuracy"],weapon._accuracy)
+		self.assertEqual(_stats(_saved(weapon)),_stats(weapon))
+
+	def test_bad_records(self):
+		with self.assertRaises(ValueError):
+			Weapon.fromRecord({"type":"Trebuchet"})
+		with self.assertRaises(ValueError):
+			Weapon.fromRecord({"type":"Pistol","modifications":["Laser Sights"]})
+		with self.assertRaises(ValueError):
+			# Bolt-Thrower is for long arms
+			Weapon.fromRecord({"type":"Pistol","modifications":["Bolt-Thrower"]})
+		with self.assertRaises(ValueError):
+			# one level B or C modification
+			Weapon.fromRecord({"type":"Long Arm","modifications":["Auto Targeter","Resin Tank"]})
+
+
+class TestWeaponStack(unittest.TestCase):
+
+	def setUp(self):
+		self.rng = random.Random(8)
+		self.catalog = modificationCatalog()
+
+	def test_preview(self):
+		for weapon_type in getModel("model_weapons.json"):
+			for i in range(8):
+				weapon = _modified(self.rng,weapon_type)
+				for modification in self.catalog.values():
+					if modification.fits(weapon):
+						applied = weapon.copy()
+						modification.apply(applied)
+						self.assertEqual(weapon.preview([modification.name]),(applied.range,applied.reach,applied.accuracy,applied.ap))
+
+	def test_remove(self):
+		for weapon_type in getModel("model_weapons.json"):
+			for i in range(8):
+				weapon = _modified(self.rng,weapon_type)
+				before = weapon.copy()
+				fitting = [m for m in self.catalog.values() if m.fits(weapon)]
+				if len(fitting) == 0:
+					continue
+				modification = self.rng.choice(fitting)
+				self.assertTrue(modification.apply(weapon))
+				self.assertTrue(modification.remove(weapon))
+				self.assertEqual(_stats(weapon),_stats(before))
+				self.assertEqual(weapon.stack,before.stack)
+		weapon = Weapon(**getModel("model_weapons.json")["Pistol"])
+		self.assertFalse(self.catalog["Gene-Lock"].remove(weapon))
+
+	def test_remove_in_any_order(self):
+		weapon = Weapon(**getModel("model_weapons.json")["Long Arm"])
+		base = _stats(weapon)
+		names = ["Bolt-Thrower","Double-Barrel","Stealth Mod","Auto Targeter"]
+		for name in names:
+			self.assertTrue(self.catalog[name].apply(weapon))
+		for name in ["Double-Barrel","Auto Targeter","Bolt-Thrower","Stealth Mod"]:
+			self.catalog[name].remove(weapon)
+			names.remove(name)
+			self.assertEqual(_stats(weapon),_stats(Weapon.fromRecord({"type":"Long Arm","modifications":names})))
+		self.assertEqual(_stats(weapon),base)
+
+	def test_copy(self):
+		weapon = Weapon(**getModel("model_weapons.json")["Long Arm"])
+		copy = weapon.copy()
+		self.catalog["Auto Targeter"].apply(copy)
+		self.assertEqual(weapon.accuracy,5)
+		self.assertEqual(weapon.stack,())
+		self.assertEqual(weapon.modifications["B"],[])
+
+	def test_effects(self):
+		# AP and accuracy used to be run through the range function,
+		# and Auto Targeter's accuracy was dropped
+		pistol = Weapon.fromRecord({"type":"Pistol","modifications":["Auto Targeter"]})
+		self.assertEqual((pistol.range,pistol.accuracy,pistol.ap),(50,5,1))
+		bolt = Weapon.fromRecord({"type":"Long Arm","modifications":["Bolt-Thrower"]})
+		self.assertEqual((bolt.range,bolt.accuracy,bolt.ap),(50,5,1))
+		breacher = Weapon.fromRecord({"type":"Long Arm","modifications":["Breacher Muzzle","Overcharged Plas-Core"]})
+		self.assertEqual((breacher.range,breacher.accuracy,breacher.ap),(20,5,3))
+		blade = Weapon.fromRecord({"type":"Blade","modifications":["Large","Plas-Core"]})
+		self.assertEqual(blade.reach,Weapon(**getModel("model_weapons.json")["Blade"]).reach+2)
+
+	def test_legacy_pickles(self):
+		# modifications recorded by level: stats follow from them
+		weapon = _legacy("Long Arm",(50,0,50,50),{"A":["Bolt-Thrower"]})
+		self.assertEqual(weapon.stack,("Bolt-Thrower",))
+		self.assertEqual((weapon.range,weapon.accuracy,weapon.ap),(50,5,1))
+		# none recorded but the stats changed: the saved stats are kept
+		weapon = _legacy("Pistol",(50,0,6,2),{})
+		self.assertEqual((weapon.range,weapon.accuracy,weapon.ap),(50,6,2))
+		self.catalog["Auto Targeter"].apply(weapon)
+		self.assertEqual(weapon.accuracy,7)
+		self.catalog["Auto Targeter"].remove(weapon)
+		self.assertEqual(weapon.accuracy,6)
+
+
+if __name__ == '__main__':
+	unittest.main()
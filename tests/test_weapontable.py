@@ -0,0 +1,74 @@
+"""The weapon table agrees with applying modifications one at a time"""
+
+import random, unittest
+from eoschar.func import getModel
+from eoschar.weapon import Weapon, MOD_LEVELS, modificationCatalog
+from eoschar.weapontable import weaponTable
+
+
+def _sequences(weapon,names=()):
+	"""Yield every sequence of modifications Modification.apply accepts on weapon, none first"""
+	yield names, weapon
+	for modification in modificationCatalog().values():
+		if modification.fits(weapon):
+			applied = weapon.copy()
+			modification.apply(applied)
+			yield from _sequences(applied,names+(modification.name,))
+
+
+class TestWeaponTable(unittest.TestCase):
+
+	def setUp(self):
+		self.table = weaponTable()
+		self.catalog = modificationCatalog()
+		self.model = getModel("model_weapons.json")
+
+	def test_cached(self):
+		self.assertIs(weaponTable(),self.table)
+
+	def test_options(self):
+		rng = random.Random(3)
+		for weapon_type, profile in self.model.items():
+			for i in range(20):
+				weapon = Weapon(**profile)
+				while True:
+					fitting = tuple(m for m in self.catalog.values() if m.fits(weapon))
+					self.assertEqual(self.table.options(weapon),fitting)
+					for level in MOD_LEVELS:
+						self.assertEqual(self.table.options(weapon,level),tuple(m for m in fitting if m.level == level))
+					for modification in self.catalog.values():
+						self.assertEqual(self.table.fits(weapon,modification),modification.fits(weapon))
+					if len(fitting) == 0:
+						break
+					rng.choice(fitting).apply(weapon)
+
+	def test_outcomes(self):
+		for weapon_type, profile in self.model.items():
+			applied = dict(_sequences(Weapon(**profile)))
+			self.assertEqual(set(names for names, outcome in self.table.combinations(weapon_type)),set(applied))
+			for names, weapon in applied.items():
+				self.assertTrue(self.table.legal(weapon_type,list(names)))
+				outcome = self.table.outcome(weapon_type,names)
+				self.assertEqual((outcome.range,outcome.reach,outcome.accuracy,outcome.ap),(weapon.range,weapon.reach,weapon.accuracy,weapon.ap))
+				self.assertEqual(list(outcome.special),weapon.special)
+				self.assertEqual({level:list(outcome.modifications[level]) for level in MOD_LEVELS},weapon.modifications)
+		self.assertFalse(self.table.legal("Pistol",["Bolt-Thrower"]))
+		self.assertIsNone(self.table.outcome("Long Arm",["Auto Targeter","Resin Tank"]))
+		self.assertIsNone(self.table.outcome("Trebuchet",[]))
+
+	def test_compatible(self):
+		for weapon_type in self.model:
+			for level in (None,) + MOD_LEVELS:
+				expected = tuple(m for m in self.catalog.values() if (level is None or m.level == level) and weapon_type in m.prerequisites)
+				self.assertEqual(self.table.compatible(weapon_type,level),expected)
+
+	def test_past_the_slot_limits(self):
+		# edited by hand: answered by Modification.fits
+		weapon = Weapon(**self.model["Long Arm"])
+		weapon.modifications["A"] += ["Double-Barrel","Gene-Lock","Stealth Mod","Breacher Muzzle"]
+		self.assertEqual(self.table.options(weapon),tuple(m for m in self.catalog.values() if m.fits(weapon)))
+		self.assertEqual(self.table.options(weapon,"A"),())
+
+
+if __name__ == '__main__':
+	unittest.main()